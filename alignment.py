@@ -0,0 +1,265 @@
+"""
+Pairwise sequence alignment for the Advanced Molecular Suite.
+
+Global (Needleman-Wunsch) and local (Smith-Waterman) alignment with affine
+gaps (Gotoh). A gap of length L costs `gap_open + (L - 1) * gap_extend`.
+
+The DP matrix is filled one row at a time with NumPy. The diagonal and
+vertical moves are plain vector operations. The horizontal (gap) moves
+along a row are resolved with a running maximum (np.maximum.accumulate)
+instead of a cell-by-cell loop, which is the NumPy form of the striped
+"lazy-F" trick. Options:
+
+* `band=w` keeps only diagonals within w of the main one (similar
+  sequences), so time and memory are O(n * w)
+* `align_score()` keeps only the current row, O(m) memory, for inputs
+  too long to trace back
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+# =========================
+# CONFIGURATION
+# =========================
+MATCH = 2
+MISMATCH = -3
+GAP_OPEN = 5
+GAP_EXTEND = 2
+MAX_TRACEBACK_CELLS = 25_000_000   # larger problems fall back to score-only in the app
+
+NEG = -(1 << 40)   # "minus infinity" that cannot overflow int64 after a few subtractions
+
+# Traceback codes: 2 bits for where H came from, plus one bit each for E/F extension
+DIAG, EGAP, FGAP, STOP = 0, 1, 2, 3
+E_EXTEND, F_EXTEND = 4, 8
+
+
+@dataclass
+class Alignment:
+    score: int
+    aligned_a: str
+    aligned_b: str
+    start_a: int   # 0-based, end exclusive, in the original sequences
+    end_a: int
+    start_b: int
+    end_b: int
+    mode: str
+
+    @property
+    def length(self):
+        return len(self.aligned_a)
+
+    @property
+    def matches(self):
+        return sum(x == y for x, y in zip(self.aligned_a, self.aligned_b))
+
+    @property
+    def gaps(self):
+        return self.aligned_a.count("-") + self.aligned_b.count("-")
+
+    @property
+    def identity(self):
+        return self.matches / self.length * 100 if self.length else 0.0
+
+    def midline(self):
+        return "".join(
+            "|" if x == y else (" " if "-" in (x, y) else ".")
+            for x, y in zip(self.aligned_a, self.aligned_b)
+        )
+
+
+# =========================
+# DYNAMIC PROGRAMMING
+# =========================
+def _encode(seq):
+    return np.frombuffer(seq.upper().encode("ascii", "replace"), dtype=np.uint8)
+
+
+def _diagonal_range(n, m, band):
+    """Allowed j - i offsets: everything, or `band` around the path between the two corners."""
+    if band is None:
+        return -n, m
+    return min(0, m - n) - band, max(0, m - n) + band
+
+
+def _window(values, start, lo, hi):
+    """Columns lo..hi of a row stored from column `start`, NEG outside it."""
+    out = np.empty(hi - lo + 1, dtype=np.int64)
+    a, b = max(lo, start), min(hi, start + len(values) - 1)
+    if a > b:
+        out[:] = NEG
+        return out
+    out[:a - lo] = NEG
+    out[a - lo:b - lo + 1] = values[a - start:b - start + 1]
+    out[b - lo + 1:] = NEG
+    return out
+
+
+def _fill(a, b, local, match, mismatch, gap_open, gap_extend, band, keep_trace):
+    """
+    Run the Gotoh recurrences row by row.
+
+    Returns (score, end_i, end_j, trace); trace is a list of (first column,
+    uint8 codes) per row, or None when `keep_trace` is False.
+    """
+    if gap_extend > gap_open:
+        raise ValueError("gap_extend must not exceed gap_open")
+    n, m = len(a), len(b)
+    A = _encode(a)
+    B = np.concatenate(([0], _encode(b)))   # 1-based, so column j compares with B[j]
+    dmin, dmax = _diagonal_range(n, m, band)
+    # Query profile: one precomputed substitution row per distinct letter of `a`
+    letters, rows = np.unique(A, return_inverse=True)
+    profile = np.where(B[None, :] == letters[:, None], match, mismatch).astype(np.int64)
+    ramp = np.arange(m + 1, dtype=np.int64) * gap_extend
+
+    # Row 0
+    hi = min(m, dmax)
+    cols = np.arange(0, hi + 1)
+    if local:
+        H = np.zeros(hi + 1, dtype=np.int64)
+        codes = np.full(hi + 1, STOP, dtype=np.uint8)
+    else:
+        H = np.where(cols == 0, 0, -gap_open - (cols - 1) * gap_extend).astype(np.int64)
+        codes = np.where(cols == 0, STOP, EGAP | np.where(cols > 1, E_EXTEND, 0)).astype(np.uint8)
+    F = np.full(hi + 1, NEG, dtype=np.int64)
+    prev_lo = 0
+    trace = [(0, codes)] if keep_trace else None
+    best = (0, 0, 0)
+
+    for i in range(1, n + 1):
+        lo, hi = max(0, i + dmin), min(m, i + dmax)
+        width = hi - lo + 1
+
+        # Vertical gap (F) and diagonal move, from the previous row
+        up_H = _window(H, prev_lo, lo, hi)
+        up_F = _window(F, prev_lo, lo, hi)
+        F_open, F_ext = up_H - gap_open, up_F - gap_extend
+        F = np.maximum(F_open, F_ext)
+        diag = _window(H, prev_lo, lo - 1, hi - 1)
+        if lo == 0:
+            diag[0] = NEG   # column 0 has no diagonal predecessor
+        D = diag + profile[rows[i - 1], lo:hi + 1]
+        Hp = np.maximum(D, F)
+        if local:
+            Hp = np.maximum(Hp, 0)
+
+        # Horizontal gap (E): E[j] = max_k<j (Hp[k] - open - (j - 1 - k) * extend), as a running max
+        E = np.empty(width, dtype=np.int64)
+        E[0] = NEG
+        if width > 1:
+            running = np.maximum.accumulate(Hp + ramp[lo:hi + 1])
+            E[1:] = running[:-1] - (gap_open - gap_extend) - ramp[lo + 1:hi + 1]
+        H = np.maximum(Hp, E)
+
+        if keep_trace:
+            source = np.where(H == D, DIAG, np.where(H == E, EGAP, FGAP))
+            if local:
+                source = np.where(H <= 0, STOP, source)
+            e_ext = np.zeros(width, dtype=bool)
+            e_ext[1:] = (E[:-1] - gap_extend) >= (H[:-1] - gap_open)
+            codes = (source | np.where(e_ext, E_EXTEND, 0) | np.where(F_ext >= F_open, F_EXTEND, 0)).astype(np.uint8)
+            trace.append((lo, codes))
+        if local:
+            j = int(np.argmax(H))
+            if H[j] > best[0]:
+                best = (int(H[j]), i, lo + j)
+        prev_lo = lo
+
+    if local:
+        return best[0], best[1], best[2], trace
+    if m - prev_lo >= len(H):
+        raise ValueError("band too narrow to reach the end of both sequences")
+    return int(H[m - prev_lo]), n, m, trace
+
+
+def _traceback(a, b, trace, i, j, local):
+    out_a, out_b = [], []
+    state = None   # None = H, else EGAP / FGAP
+    while i > 0 or j > 0:
+        lo, codes = trace[i]
+        code = int(codes[j - lo])
+        if state is None:
+            source = code & 3
+            if source == STOP:
+                break
+            if source == DIAG:
+                out_a.append(a[i - 1])
+                out_b.append(b[j - 1])
+                i, j = i - 1, j - 1
+            else:
+                state = source
+        elif state == EGAP:
+            out_a.append("-")
+            out_b.append(b[j - 1])
+            j -= 1
+            state = EGAP if code & E_EXTEND else None
+        else:
+            out_a.append(a[i - 1])
+            out_b.append("-")
+            i -= 1
+            state = FGAP if code & F_EXTEND else None
+    if not local and (i or j):
+        raise RuntimeError("traceback did not reach the origin")
+    return "".join(reversed(out_a)), "".join(reversed(out_b)), i, j
+
+
+# =========================
+# OPERATIONS
+# =========================
+def parse_sequence(text):
+    """Sequence letters from pasted text, dropping FASTA headers, whitespace and digits."""
+    lines = [line for line in text.splitlines() if not line.startswith(">")]
+    return "".join(ch for ch in "".join(lines) if ch.isalpha() or ch == "*").upper()
+
+
+def format_blocks(alignment, width=60):
+    """Alignment as text blocks (query / midline / subject) with 1-based coordinates."""
+    mid = alignment.midline()
+    blocks = []
+    pos_a, pos_b = alignment.start_a, alignment.start_b
+    for k in range(0, alignment.length, width):
+        row_a, row_b = alignment.aligned_a[k:k + width], alignment.aligned_b[k:k + width]
+        step_a, step_b = len(row_a) - row_a.count("-"), len(row_b) - row_b.count("-")
+        blocks.append(
+            f"Seq A {pos_a + 1:>7} {row_a} {pos_a + step_a}\n"
+            f"      {'':>7} {mid[k:k + width]}\n"
+            f"Seq B {pos_b + 1:>7} {row_b} {pos_b + step_b}"
+        )
+        pos_a, pos_b = pos_a + step_a, pos_b + step_b
+    return "\n\n".join(blocks)
+
+
+def align(a, b, mode="global", match=MATCH, mismatch=MISMATCH, gap_open=GAP_OPEN,
+          gap_extend=GAP_EXTEND, band=None):
+    """Optimal global or local alignment of two sequences, with the aligned strings."""
+    if mode not in ("global", "local"):
+        raise ValueError(f"Unknown alignment mode: {mode}")
+    a, b = a.upper(), b.upper()
+    local = mode == "local"
+    score, end_i, end_j, trace = _fill(a, b, local, match, mismatch, gap_open, gap_extend, band, True)
+    aligned_a, aligned_b, start_i, start_j = _traceback(a, b, trace, end_i, end_j, local)
+    return Alignment(score, aligned_a, aligned_b, start_i, end_i, start_j, end_j, mode)
+
+
+def align_score(a, b, mode="global", match=MATCH, mismatch=MISMATCH, gap_open=GAP_OPEN,
+                gap_extend=GAP_EXTEND, band=None):
+    """
+    Optimal score only, in linear memory.
+
+    Returns (score, end_a, end_b); the end positions matter for local mode.
+    """
+    if mode not in ("global", "local"):
+        raise ValueError(f"Unknown alignment mode: {mode}")
+    score, end_i, end_j, _ = _fill(a.upper(), b.upper(), mode == "local", match, mismatch,
+                                   gap_open, gap_extend, band, False)
+    return score, end_i, end_j
+
+
+def traceback_cells(n, m, band=None):
+    """Traceback cells `align` would store, to decide between full and score-only mode."""
+    if band is None:
+        return (n + 1) * (m + 1)
+    dmin, dmax = _diagonal_range(n, m, band)
+    return (n + 1) * min(m + 1, dmax - dmin + 1)
@@ -1,6 +1,8 @@
 
 import streamlit as st
 import pandas as pd
+import io
+import json
 import os
 import easyocr
 from deep_translator import GoogleTranslator
@@ -8,15 +10,33 @@ import requests
 import wikipedia
 import datetime
 import plotly.express as px
+import plotly.graph_objects as go
 import datetime
 import pytz
 import numpy as np
-import matplotlib.pyplot as plt
+import structure_store
+import structure_analysis
+import structure_lod
+import biophysics
+import image_pipeline
+import ocr_ingest
+import image_cache
+import cache_backend
+import knowledge_index
+import sequence_tools
+import alignment
+import sequence_index
+import metrics
+import reference_bundle
 # ==========================================
 # 1. AUTO-ADAPTING UI (MOBILE + DESKTOP)
 # ==========================================
 st.set_page_config(page_title="Bio-Tech Smart Textbook", layout="wide")
 
+# Per-rerun timings (see metrics.py); /metrics is served only if BIO_METRICS_PORT is set
+metrics.start_rerun()
+metrics.start_server()
+
 def inject_responsive_design():
     st.markdown("""
     <style>
@@ -117,7 +137,7 @@ inject_responsive_design()
 # =========================
 # SIDEBAR: BIO-VERIFY PANEL
 # =========================
-with st.sidebar:
+with st.sidebar, metrics.section("sidebar_panel"):
 
     # Title
     st.title("🛡️ Bio-Verify 2026")
@@ -154,7 +174,33 @@ with st.sidebar:
     st.divider()
 
     # --- STATUS BADGES ---
-    st.success("✅ Live API Connection: Active")
+    SEARCH_MODE_LABELS = {"auto": "Auto (live, bundle if slow)", "live": "Live only", "offline": "Offline bundle"}
+    search_mode = st.selectbox(
+        "🔌 Global Search source",
+        reference_bundle.SEARCH_MODES,
+        index=reference_bundle.SEARCH_MODES.index(reference_bundle.DEFAULT_SEARCH_MODE),
+        format_func=SEARCH_MODE_LABELS.get,
+        key="search_mode",
+    )
+    bundle = reference_bundle.open_bundle()
+    reference_bundle.start_background_refresh()
+    degraded = [s for s in ("wikipedia", "ncbi") if reference_bundle.GUARD.degraded(s)]
+    if search_mode == "offline":
+        if bundle is None:
+            st.error("📦 Offline mode: no reference bundle built")
+        else:
+            st.info("📦 Offline Reference Bundle: Active")
+    elif degraded:
+        st.warning(f"⚠️ Slow upstream ({', '.join(degraded)}): serving offline bundle")
+    else:
+        st.success("✅ Live API Connection: Active")
+    if bundle is not None:
+        bundle_stats = bundle.stats()
+        updated = bundle_stats["updated"]
+        st.caption(
+            "Bundle: " + ", ".join(f"{n} {src}" for src, n in bundle_stats["documents"].items())
+            + (f" · updated {datetime.datetime.fromtimestamp(updated):%d %b %Y}" if updated else "")
+        )
     st.info("Verified Data Sources: NCBI, Wikipedia, Google")
 
     st.divider()
@@ -177,36 +223,134 @@ with st.sidebar:
 def load_ocr():
     return easyocr.Reader(['en'])
 
-reader = load_ocr()
+with metrics.section("ocr_init"):
+    reader = load_ocr()
 
 @st.cache_data
 def get_text_from_image(img_path):
     if img_path and os.path.exists(img_path):
+        # Diagrams processed by `python ocr_ingest.py` are served from the OCR store
+        stored = ocr_ingest.lookup_text(img_path)
+        if stored is not None:
+            return stored
         try:
-            text = reader.readtext(img_path, detail=0)
-            return " ".join(text).lower()
+            return ocr_image_text(img_path, ocr_ingest.file_sha256(img_path))
         except Exception:
             return ""
     return ""
 
+@cache_backend.cached("ocr")
+def ocr_image_text(img_path, sha256):
+    # The file hash is part of the shared-cache key, so edited diagrams are re-read
+    text = reader.readtext(img_path, detail=0)
+    return " ".join(text).lower()
+
 # =========================
 # LOAD KNOWLEDGE BASE
 # =========================
-@st.cache_data
+@st.cache_resource
 def load_knowledge_base():
+    # One shared (read-only) DataFrame per process; sessions keep only row positions into it
     # Looking for either filename
     for file in ["knowledge_base.csv", "knowledge.csv"]:
         if os.path.exists(file):
             try:
-                df = pd.read_csv(file)
-                df.columns = df.columns.str.strip()
-                df = df.dropna(how='all')
-                return df
+                stat = os.stat(file)
+                return read_knowledge_csv(file, stat.st_mtime_ns, stat.st_size)
             except Exception:
                 continue
-    return pd.DataFrame(columns=["Topic", "Section", "Explanation", "Image", "Ten_Points", "Detailed_Explanation"])
+    return pd.DataFrame(columns=knowledge_index.KB_COLUMNS)
+
+@cache_backend.cached("knowledge_base")
+def read_knowledge_csv(file, mtime_ns, size):
+    # Parsed once for all replicas; a changed file (mtime/size) gets a new key
+    return knowledge_index.load_csv(file)
+
+@st.cache_resource
+def load_related_topics():
+    # Top-k neighbour table built once at load time; replicas share it through the shared cache
+    kb = load_knowledge_base()
+    return cache_backend.get_cache().get_or_compute(
+        "related_topics", (knowledge_index.content_key(kb), knowledge_index.RELATED_TOP_K),
+        lambda: knowledge_index.build_related_index(kb),
+    )
+
+@st.cache_resource
+def load_script_index():
+    # Phonetic postings for Devanagari / romanized queries, shared like the related-topics table
+    kb = load_knowledge_base()
+    return cache_backend.get_cache().get_or_compute(
+        "script_index", (knowledge_index.content_key(kb),),
+        lambda: knowledge_index.build_script_index(kb),
+    )
+
+with metrics.section("knowledge_base"):
+    knowledge_df = load_knowledge_base()
+    related_topics = load_related_topics()
+    script_index = load_script_index()
+
+# =========================
+# EXTERNAL LOOKUPS (SHARED CACHE)
+# =========================
+@cache_backend.cached("wikipedia", ttl=7 * 24 * 3600)
+@metrics.external("wikipedia")
+def wikipedia_lookup(query):
+    search_results = wikipedia.search(query, results=5)
+    if not search_results:
+        return None
+    target_title = search_results[0]
+    try:
+        page = wikipedia.page(target_title, auto_suggest=False)
+        summary = wikipedia.summary(target_title, sentences=4, auto_suggest=False)
+    except wikipedia.exceptions.DisambiguationError as e:
+        return {"options": e.options[:3]}
+    return {"title": page.title, "summary": summary, "url": page.url}
+
+@cache_backend.cached("ncbi", ttl=24 * 3600)
+@metrics.external("ncbi")
+def ncbi_search(db, term):
+    url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
+    res = requests.get(url, params={"db": db, "term": term, "retmode": "json", "retmax": 5}, timeout=15).json()
+    return res.get("esearchresult", {}).get("idlist", [])
+
+@cache_backend.cached("translation")
+@metrics.external("translator")
+def translate_text(text, target="hi"):
+    return GoogleTranslator(source="auto", target=target).translate(text)
+
+# =========================
+# STRUCTURE STORE (3D VIEWER)
+# =========================
+@st.cache_resource(max_entries=32)
+def load_pdb_structure(pdb_id):
+    # Parsed once per server process (failures are not cached, so a later rerun retries)
+    return structure_store.load_structure(pdb_id)
 
-knowledge_df = load_knowledge_base()
+def get_pdb_structure(pdb_id):
+    try:
+        return load_pdb_structure(structure_store.normalize_pdb_id(pdb_id))
+    except Exception:
+        return None
+
+@st.cache_resource(max_entries=32)
+def analyze_pdb_structure(pdb_id):
+    # Dihedrals, DSSP-like secondary structure and MW/pI, computed once per structure
+    return structure_analysis.analyze_structure(load_pdb_structure(pdb_id))
+
+@st.cache_resource(max_entries=32)
+def find_pdb_pockets(pdb_id):
+    # Ligand contacts or buried cavities, found with a KD-tree over atom coordinates
+    return structure_analysis.find_pockets(load_pdb_structure(pdb_id))
+
+@st.cache_resource(max_entries=64)
+def get_pdb_representation(pdb_id, full_detail=False):
+    # Decimated model (polymer only / CA trace) for large structures, within the payload budget
+    return structure_lod.build_representation(load_pdb_structure(pdb_id), full_detail=full_detail)
+
+@st.cache_resource(max_entries=32)
+def get_pdb_surface(pdb_id):
+    # Coarse surface mesh computed once on the server instead of in the browser
+    return structure_lod.coarse_surface(load_pdb_structure(pdb_id))
 
 # =========================
 # SESSION STATE
@@ -246,7 +390,7 @@ tabs = st.tabs([
 # =========================
 # TAB 1: 🚀 HOME (LAUNCHPAD)
 # =========================
-with tabs[0]:
+with tabs[0], metrics.section("home"):
     # Header Section
     st.markdown("""
         <div class="bio-card" style="text-align: center; border: none; background: transparent; box-shadow: none;">
@@ -332,7 +476,7 @@ with tabs[0]:
 # =========================
 # TAB 1: 📖 READER (Previously tabs[0])
 # =========================
-with tabs[1]:
+with tabs[1], metrics.section("reader"):
     if knowledge_df.empty:
         st.warning("⚠️ Knowledge base is empty. Please check your CSV file.")
     else:
@@ -373,9 +517,9 @@ with tabs[1]:
 
 
         
-        # Define current row and save to session state
+        # Define current row; session state keeps only its position in the shared KB
         row = knowledge_df.iloc[st.session_state.page_index]
-        st.session_state['selected_row'] = row
+        st.session_state['selected_row_id'] = st.session_state.page_index
         
         # Layout: Text on Left, Diagram Spoiler on Right
         left, right = st.columns([2, 1])
@@ -405,15 +549,12 @@ with tabs[1]:
         with st.expander("📘 Detailed Analysis & Mechanism"):
             st.write(row.get("Detailed_Explanation", "No extra details available."))
         if st.button("Add to Research Report", icon="➕", use_container_width=False):
-                if 'report_list' not in st.session_state:
-                    st.session_state['report_list'] = []
+                if 'report_ids' not in st.session_state:
+                    st.session_state['report_ids'] = []
                 
                 # Check if already added
-                if row['Topic'] not in [item['Topic'] for item in st.session_state['report_list']]:
-                    st.session_state['report_list'].append({
-                        "Topic": row['Topic'],
-                        "Notes": row['Explanation']
-                    })
+                if st.session_state.page_index not in st.session_state['report_ids']:
+                    st.session_state['report_ids'].append(st.session_state.page_index)
                     st.toast(f"Added {row['Topic']} to report!", icon="✅")
                 else:
                     st.warning("Topic already in report.")
@@ -422,19 +563,30 @@ with tabs[1]:
             with st.expander("🖼️ View Topic Diagram", expanded=False):
                 img_path = str(row.get("Image", ""))
                 if img_path and os.path.exists(img_path):
-                    st.image(img_path, use_container_width=True, caption=f"Visual: {row.get('Topic')}")
+                    # Diagram sits in a 1/3-width column: a 640 px WebP is plenty
+                    st.image(image_cache.resized_image(img_path, 640), use_container_width=True, caption=f"Visual: {row.get('Topic')}")
                 else:
                     st.info("No diagram available.")
 
+            # --- RELATED TOPICS (lookup in the precomputed neighbour table) ---
+            related = related_topics.related(st.session_state.page_index)
+            if related:
+                st.markdown("**🔗 Related Topics**")
+                for pos, score in related:
+                    if st.button(knowledge_df.iloc[pos].get("Topic", "Untitled"), key=f"related_{pos}",
+                                 use_container_width=True, help=f"Similarity {score:.2f}"):
+                        st.session_state.page_index = pos
+                        st.rerun()
+
 
 # =========================
 # TAB 2: 🧠 10 POINTS (Previously tabs[1])
 # =========================
-with tabs[2]:
+with tabs[2], metrics.section("ten_points"):
     st.header("🧠 10 Key Exam Points")
     
-    if 'selected_row' in st.session_state:
-        current_row = st.session_state['selected_row']
+    if st.session_state.get('selected_row_id', len(knowledge_df)) < len(knowledge_df):
+        current_row = knowledge_df.iloc[st.session_state['selected_row_id']]
         st.info(f"Topic: **{current_row.get('Topic', 'Selected Topic')}**")
         
         # --- NEW: STUDY MODE TOGGLE ---
@@ -472,7 +624,7 @@ with tabs[2]:
 # =========================
 # TAB 3: 🧪 DNA LAB (Previously tabs[2])
 # =========================
-with tabs[3]:
+with tabs[3], metrics.section("dna_lab"):
     st.header("🧪 DNA Interactive Lab")
     st.info("Transform and prepare your genomic sequences for analysis.")
     
@@ -488,25 +640,20 @@ with tabs[3]:
     label = ""
 
     if c1.button("🧹 Clean Sequence", use_container_width=True):
-        result_text = "".join([char for char in raw_input if char.upper() in "ATGC"]).upper()
+        result_text = sequence_tools.clean_sequence(raw_input)
         result_type = "success"
         label = "Cleaned DNA Sequence:"
 
     if c2.button("🧬 Transcribe", use_container_width=True):
-        cleaned = "".join([char for char in raw_input if char.upper() in "ATGC"]).upper()
-        result_text = cleaned.replace("T", "U")
+        cleaned = sequence_tools.clean_sequence(raw_input)
+        result_text = sequence_tools.transcribe(cleaned)
         result_type = "warning"
         label = "mRNA Transcript (T → U):"
 
     if c3.button("🎲 Random Mutation", use_container_width=True):
-        cleaned = "".join([char for char in raw_input if char.upper() in "ATGC"]).upper()
+        cleaned = sequence_tools.clean_sequence(raw_input)
         if cleaned:
-            import random
-            list_seq = list(cleaned)
-            idx = random.randint(0, len(list_seq)-1)
-            old, new = list_seq[idx], random.choice([b for b in "ATGC" if b != list_seq[idx]])
-            list_seq[idx] = new
-            result_text = "".join(list_seq)
+            result_text, idx, old, new = sequence_tools.random_mutation(cleaned)
             result_type = "error"
             label = f"Mutation Alert: Position {idx} changed from {old} to {new}"
 
@@ -533,69 +680,54 @@ with tabs[3]:
 # =========================
 # TAB 4: INTERNAL SEARCH (Fixed & Enhanced)
 # =========================
-with tabs[4]:
+with tabs[4], metrics.section("search"):
     st.header("🔍 Smart Textbook Search")
-    st.info("Search across text content and diagram labels (via OCR).")
+    st.info("Search across text content and diagram labels (via OCR). "
+            "Hindi queries work in Devanagari or Roman script (e.g. 'प्लाज्मिड', 'plasmid').")
     
     # Search input
     query = st.text_input("Enter a term to search (e.g., 'DNA', 'Polymerase')...")
     
     if query:
-        query_lower = query.lower()
         found = False
         
-        # Loop through the dataframe
-        for i, r in knowledge_df.iterrows():
-            # 1. Check Text (using 'Topic' and 'Explanation' columns)
-            # We use .get() to prevent crashes if a column is missing
-            topic_val = str(r.get('Topic', '')).lower()
-            expl_val = str(r.get('Explanation', '')).lower()
-            
-            txt_match = query_lower in topic_val or query_lower in expl_val
-            
-            # 2. Check Image via OCR
+        # Text matches are vectorized over the DataFrame; OCR text comes from the caches
+        for i, r, txt_match, ocr_match in knowledge_index.search(knowledge_df, query, get_text_from_image,
+                                                                        script_index=script_index):
             img_path = str(r.get('Image', ''))
-            img_text = ""
-            if img_path and img_path != 'nan':
-                img_text = get_text_from_image(img_path).lower()
-            
-            ocr_match = query_lower in img_text
-            
-            # If we find a match in either Text or OCR
-            if txt_match or ocr_match:
-                found = True
-                with st.expander(f"📖 {r.get('Topic', 'Untitled')} (Page {i+1})", expanded=True):
-                    col_text, col_img = st.columns([2, 1])
+            found = True
+            with st.expander(f"📖 {r.get('Topic', 'Untitled')} (Page {i+1})", expanded=True):
+                col_text, col_img = st.columns([2, 1])
+                
+                with col_text:
+                    if txt_match:
+                        st.markdown("🎯 **Found in Text**")
+                    if ocr_match:
+                        st.markdown("👁️ **Found in Diagram (OCR)**")
+                    
+                    # Show a preview of the explanation
+                    preview_text = str(r.get('Explanation', 'No content available'))
+                    st.write(preview_text[:300] + "...") 
                     
-                    with col_text:
-                        if txt_match:
-                            st.markdown("🎯 **Found in Text**")
-                        if ocr_match:
-                            st.markdown("👁️ **Found in Diagram (OCR)**")
+                    # Button to jump to the Reader tab
+                    if st.button(f"Go to Page {i+1}", key=f"search_btn_{i}"):
+                        st.session_state.page_index = i
+                        # This ensures the app switches focus to the reader's index
+                        st.rerun()
                         
-                        # Show a preview of the explanation
-                        preview_text = str(r.get('Explanation', 'No content available'))
-                        st.write(preview_text[:300] + "...") 
+                with col_img:
+                    if img_path and os.path.exists(img_path):
+                        st.image(image_cache.resized_image(img_path, 320), caption="Related Diagram", use_container_width=True)
+                    else:
+                        st.caption("No image available")
                         
-                        # Button to jump to the Reader tab
-                        if st.button(f"Go to Page {i+1}", key=f"search_btn_{i}"):
-                            st.session_state.page_index = i
-                            # This ensures the app switches focus to the reader's index
-                            st.rerun()
-                            
-                    with col_img:
-                        if img_path and os.path.exists(img_path):
-                            st.image(img_path, caption="Related Diagram", use_container_width=True)
-                        else:
-                            st.caption("No image available")
-                            
         if not found:
             st.warning(f"No results found for '{query}'. Try checking the 'Global Bio-Search' tab!")
 
 # =========================
 # TAB 5: GLOBAL BIO-SEARCH
 # =========================
-with tabs[5]:
+with tabs[5], metrics.section("global_search"):
     st.header("🌐 Global Bio-Intelligence")
     st.caption("Search results are now matched for accuracy (Google-style logic)")
     
@@ -605,18 +737,26 @@ with tabs[5]:
     if user_input:
         with st.spinner(f"Searching for '{user_input}'..."):
             try:
-                search_results = wikipedia.search(user_input, results=5)
-                if not search_results:
-                    st.error("❌ No results found on Wikipedia.")
+                result, result_source = reference_bundle.GUARD.call(
+                    "wikipedia",
+                    lambda: wikipedia_lookup(user_input),
+                    lambda: bundle.wikipedia_lookup(user_input) if bundle else None,
+                    search_mode,
+                )
+                if result is None:
+                    if result_source == "offline":
+                        st.error("❌ Not in the offline reference bundle.")
+                    else:
+                        st.error("❌ No results found on Wikipedia.")
+                elif "options" in result:
+                    st.warning(f"Too many matches. Did you mean: {', '.join(result['options'])}?")
                 else:
-                    target_title = search_results[0]
-                    page = wikipedia.page(target_title, auto_suggest=False)
-                    summary = wikipedia.summary(target_title, sentences=4, auto_suggest=False)
+                    summary = result["summary"]
                     
                     # --- NEW RESEARCH CARD UI ---
                     st.markdown(f"""
                         <div style="background-color: #f0f2f6; padding: 20px; border-radius: 10px; border-left: 5px solid #1e468a;">
-                            <h3 style="margin-top: 0;">📚 Research Snapshot: {page.title}</h3>
+                            <h3 style="margin-top: 0;">📚 Research Snapshot: {result['title']}</h3>
                             <p style="font-size: 1.1rem; line-height: 1.6;">{summary}</p>
                         </div>
                     """, unsafe_allow_html=True)
@@ -625,23 +765,27 @@ with tabs[5]:
                     st.write("") 
                     m1, m2, m3 = st.columns(3)
                     with m1:
-                        st.info(f"🔗 **Source:** Wikipedia")
+                        if result_source == "offline":
+                            st.info(f"📦 **Source:** Wikipedia (offline bundle)")
+                        else:
+                            st.info(f"🔗 **Source:** Wikipedia")
                     with m2:
                         # Simple logic to count words as a 'complexity' metric
                         word_count = len(summary.split())
                         st.info(f"📊 **Complexity:** {word_count} words")
                     with m3:
-                        st.info(f"📅 **Last Updated:** Today")
+                        if result_source == "offline" and bundle_stats["updated"]:
+                            st.info(f"📅 **Last Updated:** {datetime.datetime.fromtimestamp(bundle_stats['updated']):%d %b %Y}")
+                        else:
+                            st.info(f"📅 **Last Updated:** Today")
 
                     col1, col2 = st.columns(2)
                     with col1:
-                        st.link_button("📖 Read Full Article", page.url, use_container_width=True)
+                        st.link_button("📖 Read Full Article", result["url"], use_container_width=True)
                     with col2:
                         google_url = f"https://www.google.com/search?q={user_input.replace(' ', '+')}+biology+research+gate"
                         st.link_button("🔬 Search ResearchGate", google_url, use_container_width=True)
                         
-            except wikipedia.exceptions.DisambiguationError as e:
-                st.warning(f"Too many matches. Did you mean: {', '.join(e.options[:3])}?")
             except Exception as e:
                 st.error("Could not fetch detailed summary. Try a more specific term.")
 
@@ -654,10 +798,23 @@ with tabs[5]:
         if s_query:
             with st.spinner("Searching NCBI..."):
                 try:
-                    url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-                    res = requests.get(url, params={"db": s_type, "term": s_query, "retmode": "json", "retmax": 5}).json()
-                    ids = res.get("esearchresult", {}).get("idlist", [])
-                    if ids:
+                    ids, ids_source = reference_bundle.GUARD.call(
+                        "ncbi",
+                        lambda: ncbi_search(s_type, s_query),
+                        lambda: bundle.pubmed_search(s_query) if bundle and s_type == "pubmed" else None,
+                        search_mode,
+                    )
+                    if ids_source == "offline":
+                        if ids:
+                            st.caption("📦 PubMed abstracts from the offline reference bundle:")
+                            for record in ids:
+                                st.markdown(f"✅ **[{record['title']}]({record['url']})** (PMID {record['key']})")
+                                st.caption(record["snippet"])
+                        elif s_type != "pubmed":
+                            st.warning(f"The offline bundle only covers PubMed, not {s_type}.")
+                        else:
+                            st.warning("No records in the offline reference bundle.")
+                    elif ids:
                         st.caption("🛡️ Verified Technical Records found:")
                         for rid in ids:
                             st.write(f"✅ **Record {rid}:** [View Official NCBI Data](https://www.ncbi.nlm.nih.gov/{s_type}/{rid})")
@@ -671,38 +828,37 @@ with tabs[5]:
 # =========================
 # TAB 6: HINDI HELPER
 # =========================
-with tabs[6]:
+with tabs[6], metrics.section("hindi_helper"):
     st.header("🇮🇳 Hindi Helper")
     txt = st.text_area("Paste English text to translate to Hindi:")
     if st.button("Translate"):
         if txt.strip():
             try:
-                translated = GoogleTranslator(source="auto", target="hi").translate(txt)
+                translated = translate_text(txt, "hi")
                 st.info(translated)
             except Exception as e:
                 st.error("Translation Error.")
 # ==========================================
 # TAB 7: SEQUENCE ANALYZER
 # ==========================================
-with tabs[7]:
+with tabs[7], metrics.section("molecular_suite"):
     st.header("🧬 Advanced Molecular Suite")
     raw_seq = st.text_area("Paste DNA Sequence:", "ATGGCCATTGTAATGGGCCGCTGAAAGGGTACCCGATAG", key="dna_input_area").upper().strip()
     
     if raw_seq:
-        # ... (keep your length and GC calculation lines here) ...
         seq_len = len(raw_seq)
-        gc_count = raw_seq.count('G') + raw_seq.count('C')
-        gc_content = (gc_count / seq_len) * 100 if seq_len > 0 else 0
+        counts = sequence_tools.base_counts(raw_seq)
+        gc_content = sequence_tools.gc_content(raw_seq)
         
         # 1. Metrics and Chart (Indented inside the IF)
         col1, col2, col3 = st.columns(3)
         col1.metric("Length", f"{seq_len} bp")
         col2.metric("GC Content", f"{gc_content:.1f}%")
-        mw = (raw_seq.count('A')*313.2) + (raw_seq.count('T')*304.2) + (raw_seq.count('C')*289.2) + (raw_seq.count('G')*329.2)
+        mw = sequence_tools.molecular_weight(raw_seq)
         col3.metric("Mol. Weight", f"{mw:,.1f} Da")
         df = pd.DataFrame({
                 'Nucleotide': ['A', 'T', 'G', 'C'],
-                'Count': [raw_seq.count('A'), raw_seq.count('T'), raw_seq.count('G'), raw_seq.count('C')]
+                'Count': [counts['A'], counts['T'], counts['G'], counts['C']]
             })
             
         fig = px.bar(df, x='Nucleotide', y='Count', color='Nucleotide',
@@ -714,20 +870,14 @@ with tabs[7]:
         c1, c2 = st.columns(2)
         with c1:
                with st.expander("🔗 Complementary Strand", expanded=True):
-                    pairs = {"A": "T", "T": "A", "G": "C", "C": "G"}
-                    comp = "".join([pairs.get(b, "N") for b in raw_seq])
+                    comp = sequence_tools.complement(raw_seq)
                     st.code(f"3'- {comp} -5'")
 
 
         
         with c2:
             with st.expander("🧪 Protein Translation", expanded=True):
-                # FULL CODON MAP
-                codon_map = {'ATA':'I', 'ATC':'I', 'ATT':'I', 'ATG':'M', 'ACA':'T', 'ACC':'T', 'ACG':'T', 'ACT':'T', 'AAC':'N', 'AAT':'N', 'AAA':'K', 'AAG':'K', 'AGC':'S', 'AGT':'S', 'AGA':'R', 'AGG':'R', 'CTA':'L', 'CTC':'L', 'CTG':'L', 'CTT':'L', 'CCA':'P', 'CCC':'P', 'CCG':'P', 'CCT':'P', 'CAC':'H', 'CAT':'H', 'CAA':'Q', 'CAG':'Q', 'CGA':'R', 'CGC':'R', 'CGG':'R', 'CGT':'R', 'GTA':'V', 'GTC':'V', 'GTG':'V', 'GTT':'V', 'GCA':'A', 'GCC':'A', 'GCG':'A', 'GCT':'A', 'GAC':'D', 'GAT':'D', 'GAA':'E', 'GAG':'E', 'GGA':'G', 'GGC':'G', 'GGG':'G', 'GGT':'G', 'TCA':'S', 'TCC':'S', 'TCG':'S', 'TCT':'S', 'TTC':'F', 'TTT':'F', 'TTA':'L', 'TTG':'L', 'TAC':'Y', 'TAT':'Y', 'TAA':'_', 'TAG':'_', 'TGC':'C', 'TGT':'C', 'TGA':'_', 'TGG':'W'}
-                protein = ""
-                for i in range(0, len(raw_seq)-2, 3):
-                    codon = raw_seq[i:i+3]
-                    protein += codon_map.get(codon, '?')
+                protein = sequence_tools.translate(raw_seq)
                 # THIS LINE BELOW puts it INSIDE the box
                 st.write(f"**Protein:** `{protein}`")
 
@@ -738,6 +888,90 @@ with tabs[7]:
             st.info("ℹ️ Low GC Content: AT-rich region.")
         else:
             st.success("✅ Balanced GC Content: Normal distribution.")
+
+    # 4. Pairwise alignment of the sequence above against a second one
+    @st.cache_data(max_entries=32)
+    def align_sequences(seq_a, seq_b, mode, match, mismatch, gap_open, gap_extend, band):
+        # Long inputs only get a score: a full traceback would need n*m bytes
+        scoring = dict(match=match, mismatch=mismatch, gap_open=gap_open, gap_extend=gap_extend, band=band)
+        if alignment.traceback_cells(len(seq_a), len(seq_b), band) > alignment.MAX_TRACEBACK_CELLS:
+            return None, alignment.align_score(seq_a, seq_b, mode, **scoring)
+        return alignment.align(seq_a, seq_b, mode, **scoring), None
+
+    st.divider()
+    st.subheader("🧷 Pairwise Alignment")
+    seq_b_text = st.text_area("Second sequence (plain or FASTA):", "ATGGCCATTGTTATGGGCCGCTGAAAGGTACCCGATAG", key="align_input_b")
+    a1, a2, a3 = st.columns(3)
+    align_mode = a1.radio("Mode", ["global", "local"], horizontal=True, key="align_mode",
+                          format_func={"global": "Global (Needleman-Wunsch)", "local": "Local (Smith-Waterman)"}.get)
+    band_width = a2.number_input("Band (0 = full matrix)", min_value=0, max_value=10_000, value=0, step=10, key="align_band",
+                                 help="Only explore diagonals this far from the main one. Much faster for similar sequences.")
+    with a3.popover("⚙️ Scoring"):
+        s_match = st.number_input("Match", value=alignment.MATCH, step=1, key="align_match")
+        s_mismatch = st.number_input("Mismatch", value=alignment.MISMATCH, step=1, key="align_mismatch")
+        s_open = st.number_input("Gap open", min_value=1, value=alignment.GAP_OPEN, step=1, key="align_open")
+        s_extend = st.number_input("Gap extend", min_value=0, max_value=int(s_open), value=min(alignment.GAP_EXTEND, int(s_open)), step=1, key="align_extend")
+
+    seq_a, seq_b = alignment.parse_sequence(raw_seq), alignment.parse_sequence(seq_b_text)
+    if seq_a and seq_b and st.button("Align Sequences", key="align_run"):
+        with st.spinner("Aligning..."):
+            result, score_only = align_sequences(seq_a, seq_b, align_mode, int(s_match), int(s_mismatch),
+                                                 int(s_open), int(s_extend), int(band_width) or None)
+        if result is None:
+            score, end_a, end_b = score_only
+            st.metric("Score", score)
+            st.info(f"ℹ️ {len(seq_a):,} x {len(seq_b):,} bp is too large for a full traceback; showing the optimal score only"
+                    + (f" (best local hit ends at A:{end_a:,}, B:{end_b:,})." if align_mode == "local" else ".")
+                    + " Set a band to get the full alignment of similar sequences.")
+        else:
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Score", result.score)
+            m2.metric("Identity", f"{result.identity:.1f}%")
+            m3.metric("Gaps", result.gaps)
+            m4.metric("Aligned Length", result.length)
+            if result.length:
+                st.code(alignment.format_blocks(result), language=None)
+            else:
+                st.warning("No positive-scoring local alignment found.")
+
+    # 5. Search the sequence above against the local k-mer database
+    @st.cache_resource
+    def load_sequence_db(directory):
+        # Memory-mapped once per server process, so sessions share the pages
+        return sequence_index.SequenceIndex(directory)
+
+    st.divider()
+    st.subheader("🔎 Local Database Search")
+    if not sequence_index.index_exists(sequence_index.INDEX_DIR):
+        st.info(f"No local sequence database found. Build one from a FASTA file with "
+                f"`python sequence_index.py build vectors.fasta -o {sequence_index.INDEX_DIR}`.")
+    else:
+        sequence_db = load_sequence_db(sequence_index.INDEX_DIR)
+        st.caption(f"{len(sequence_db.names):,} records · {sequence_db.total_bases:,} bp · k = {sequence_db.k}")
+        query_seq = sequence_tools.clean_sequence(alignment.parse_sequence(raw_seq))
+        if len(query_seq) < sequence_db.k:
+            st.warning(f"Enter at least {sequence_db.k} bp of DNA to search the database.")
+        elif st.button("Search Local Database", key="seqdb_run"):
+            with st.spinner("Seeding and extending hits..."):
+                db_hits = sequence_db.search(query_seq)
+            if not db_hits:
+                st.warning("No significant hits in the local database.")
+            else:
+                st.dataframe(pd.DataFrame([{
+                    "Record": h.record,
+                    "Description": h.description,
+                    "Strand": h.strand,
+                    "Score": h.score,
+                    "Identity %": round(h.identity, 1),
+                    "Query Cover %": round(h.coverage, 1),
+                    "Query": f"{h.query_start + 1}-{h.query_end}",
+                    "Subject": f"{h.subject_start + 1}-{h.subject_end}",
+                    "E-value": f"{h.evalue:.2g}",
+                    "Seeds": h.seeds,
+                } for h in db_hits]), use_container_width=True, hide_index=True)
+                best_hit = db_hits[0]
+                with st.expander(f"Best hit: {best_hit.record} ({best_hit.strand} strand)"):
+                    st.code(alignment.format_blocks(best_hit.alignment), language=None)
 # Insert this at the top of your Tab 8 code
 st.markdown("""
 <style>
@@ -768,7 +1002,7 @@ st.markdown("""
 # ==========================================
 # TAB 8: 🔬 BIO-NEXUS STRUCTURE ENGINE
 # ==========================================
-with tabs[8]:
+with tabs[8], metrics.section("viewer_3d"):
     try:
         from stmol import showmol
         import py3Dmol
@@ -806,25 +1040,43 @@ with tabs[8]:
         """, unsafe_allow_html=True)
 
         # 2. RENDER ENGINE (With Mechanobiology Logic)
-        def render_advanced_protein(pdb_id, style_type, color_type, remove_water=False, show_surface=False, spin=True, dark_mode=True, force_mode=False):
-            view = py3Dmol.view(query=f'pdb:{pdb_id}')
+        def render_advanced_protein(pdb_id, style_type, color_type, remove_water=False, show_surface=False, spin=True, dark_mode=True, force_mode=False, structure=None, highlight=None, rep=None):
+            if structure is not None:
+                # Serve the cached (possibly decimated) model instead of making the browser refetch it
+                rep = rep or {"level": "full", "text": structure.text, "fmt": structure.fmt}
+                view = py3Dmol.view()
+                view.addModel(rep["text"], rep["fmt"])
+            else:
+                view = py3Dmol.view(query=f'pdb:{pdb_id}')
             bg_color = '#0e1117' if dark_mode else 'white'
             view.setBackgroundColor(bg_color)
             
             # If Force Mode is on, we override color to show "Tension" (hot pink to blue)
             final_color = "hotpink" if force_mode else color_type
             
-            view.setStyle({style_type: {
+            style = {
                 'color': final_color,
                 'specular': '#ffffff',
                 'shininess': 100,
                 'thickness': 0.4
-            }})
+            }
+            if rep and rep["level"] == "trace" and style_type == "cartoon":
+                style['style'] = 'trace'
+            view.setStyle({style_type: style})
             
             if remove_water:
                 view.removeSelection({'resn': 'HOH'})
             if show_surface:
-                view.addSurface(py3Dmol.VDW, {'opacity': 0.3, 'colorscheme': final_color})
+                if rep and rep["level"] != "full":
+                    # Large structure: precomputed coarse mesh instead of a browser-side VDW surface
+                    surface = get_pdb_surface(structure.pdb_id)
+                    if surface is not None:
+                        view.addCustom(structure_lod.surface_shape_spec(surface, color="#00d4ff" if dark_mode else "gray"))
+                else:
+                    view.addSurface(py3Dmol.VDW, {'opacity': 0.3, 'colorscheme': final_color})
+            for sel in highlight or []:
+                # Binding-pocket residues drawn as sticks on top of the main style
+                view.addStyle(sel, {'stick': {'colorscheme': 'orangeCarbon', 'radius': 0.3}})
                 
             view.zoomTo()
             view.spin(spin)
@@ -853,13 +1105,26 @@ with tabs[8]:
         
         # DATABASE LOGIC (C. elegans focus for NCBS)
         pdb_data = {
-            "1BNA": {"chains": "2", "res": "24", "type": "DNA B-Form", "helix": 0.0, "sheet": 0.0},
-            "1A8M": {"chains": "4", "res": "574", "type": "Hemoglobin", "helix": 0.72, "sheet": 0.12},
-            "1WBD": {"chains": "1", "res": "450", "type": "C. elegans Myosin", "helix": 0.65, "sheet": 0.15},
-            "2SPY": {"chains": "2", "res": "280", "type": "Spectrin (NCBS Model)", "helix": 0.88, "sheet": 0.05}
+            "1BNA": {"type": "DNA B-Form"},
+            "1A8M": {"type": "Hemoglobin"},
+            "1WBD": {"type": "C. elegans Myosin"},
+            "2SPY": {"type": "Spectrin (NCBS Model)"}
         }
 
-        stats = pdb_data.get(target_pdb.upper(), {"chains": "1", "res": "Unknown", "type": "Protein", "helix": 0.5, "sheet": 0.2})
+        stats = dict(pdb_data.get(target_pdb.upper(), {"type": "Protein"}))
+        structure = get_pdb_structure(target_pdb)
+        analysis = None
+        if structure is not None:
+            # Real counts and secondary structure computed from the cached model
+            analysis = analyze_pdb_structure(structure.pdb_id)
+            stats["chains"] = str(structure.n_chains)
+            stats["res"] = str(structure.n_residues)
+            stats["helix"] = analysis["helix"]
+            stats["sheet"] = analysis["sheet"]
+            if target_pdb.upper() not in pdb_data:
+                stats["type"] = structure.classification
+        else:
+            stats.update({"chains": "?", "res": "Unknown", "helix": 0.0, "sheet": 0.0})
 
         with col_side:
             # NCBS Lab Special Feature
@@ -880,6 +1145,8 @@ with tabs[8]:
 
             st.markdown("### 📡 Intelligence")
             st.caption(f"Classification: {stats['type']}")
+            if structure is None:
+                st.caption("⚠️ Structure not in local store; streaming from RCSB.")
             
             m1, m2 = st.columns(2)
             m1.metric("Chains", stats['chains'])
@@ -888,6 +1155,7 @@ with tabs[8]:
             st.divider()
             
             st.markdown("### Structure Analysis")
+            st.progress(stats['helix'], text=f"Helices: {int(stats['helix']*100)}%")
             st.progress(stats['sheet'], text=f"Beta Sheets: {int(stats['sheet']*100)}%")
             st.markdown("<br>", unsafe_allow_html=True) # Adds a small gap
             if target_pdb.upper() in ["1WBD", "2SPY"]:
@@ -899,13 +1167,37 @@ with tabs[8]:
         with col_main:
             if 'show_surf' not in st.session_state: 
                 st.session_state.show_surf = False
+            if 'show_pocket' not in st.session_state:
+                st.session_state.show_pocket = False
+            if 'full_detail_id' not in st.session_state:
+                st.session_state.full_detail_id = None
+
+            # Full detail was requested for one entry only; other entries keep the level-of-detail budget
+            rep = None
+            full_detail = structure is not None and st.session_state.full_detail_id == structure.pdb_id
+            if structure is not None:
+                rep = get_pdb_representation(structure.pdb_id, full_detail=full_detail)
+
+            pockets = []
+            highlight = None
+            if st.session_state.show_pocket and structure is not None:
+                pockets = find_pdb_pockets(structure.pdb_id)
+                if pockets:
+                    highlight = structure_analysis.pocket_selections(structure, pockets[0]["residues"])
             
             # Call Render Function
             render_advanced_protein(
                 target_pdb, style_choice, color_choice, 
                 remove_water=water_flag, show_surface=st.session_state.show_surf,
-                spin=spin_flag, dark_mode=dark_mode, force_mode=lab_mode
+                spin=spin_flag, dark_mode=dark_mode, force_mode=lab_mode,
+                structure=structure, highlight=highlight, rep=rep
             )
+            if rep is not None and rep["level"] != "full":
+                stride_note = f", every {rep['stride']} residues" if rep["stride"] > 1 else ""
+                st.caption(f"⚡ Level of detail: {structure_lod.LEVEL_LABELS[rep['level']]}{stride_note} | {rep['bytes'] / 1024:,.0f} KB")
+                if not full_detail and st.button("🔍 Load Full Detail", key="nexus_full_detail"):
+                    st.session_state.full_detail_id = structure.pdb_id
+                    st.rerun()
             
             st.write("### Quick Actions")
             b1, b2, b3 = st.columns(3)
@@ -915,14 +1207,33 @@ with tabs[8]:
                     st.rerun()
             with b2:
                 if st.button("🎯 Highlight Active Site", use_container_width=True, key="nexus_btn2"):
-                    st.toast("Scanning Binding Pockets...")
+                    if structure is None:
+                        st.toast("Structure not in local store; pocket scan unavailable.")
+                    else:
+                        st.session_state.show_pocket = not st.session_state.show_pocket
+                        st.rerun()
+
+            if st.session_state.show_pocket and structure is not None:
+                if pockets:
+                    top = pockets[0]
+                    volume = f" | ~{top['volume']:.0f} Å³" if top['volume'] else ""
+                    st.success(f"🎯 {top['source']}{volume} | {len(top['residues'])} lining residues")
+                    st.caption(", ".join(structure_analysis.describe_residues(structure, top['residues'])[:40]))
+                else:
+                    st.info("No binding pockets detected in this structure.")
             with b3:
                 if st.button("🧪 Predict Properties", use_container_width=True, key="nexus_btn3"):
-                    st.info("Calculated MW: 64.5 kDa | pI: 6.8")
+                    if analysis is None:
+                        st.warning("Structure not in local store; properties unavailable.")
+                    else:
+                        pi_text = f"{analysis['pi']:.2f}" if analysis['pi'] is not None else "n/a"
+                        st.info(f"Calculated MW: {analysis['mw'] / 1000:.1f} kDa | pI: {pi_text}")
 
             with st.expander("🧬 Sequence Map"):
-                sequences = {"1BNA": "CGCGAATTCGCG", "1A8M": "VLSPADKT...", "1WBD": "MGDSEMAVFG...", "2SPY": "MEEKKDE..."}
-                current_seq = sequences.get(target_pdb.upper(), "SEQUENCE DATA NOT IN CACHE")
+                if structure is not None and structure.sequences:
+                    current_seq = "\n".join(f">Chain {cid}\n{seq}" for cid, seq in structure.sequences.items())
+                else:
+                    current_seq = "SEQUENCE DATA NOT IN CACHE"
                 st.code(current_seq, wrap_lines=True)
 
     except Exception as e:
@@ -938,26 +1249,23 @@ with tabs[8]:
 # =========================
 # SIDEBAR: RESEARCH REPORT
 # =========================
-with st.sidebar:
+with st.sidebar, metrics.section("sidebar_report"):
     st.divider()
     st.header("📋 My Research Report")
     
-    if 'report_list' in st.session_state and st.session_state['report_list']:
-        for idx, item in enumerate(st.session_state['report_list']):
-            st.write(f"{idx+1}. {item['Topic']}")
+    report_ids = [i for i in st.session_state.get('report_ids', []) if i < len(knowledge_df)]
+    if report_ids:
+        for idx, row_id in enumerate(report_ids):
+            st.write(f"{idx+1}. {knowledge_df.iloc[row_id].get('Topic', 'Untitled')}")
         
         if st.button("🗑️ Clear Report"):
-            st.session_state['report_list'] = []
+            st.session_state['report_ids'] = []
             st.rerun()
             
-        # Create the download string
-        full_report = "BIO-VERIFY RESEARCH REPORT\n" + "="*25 + "\n\n"
-        for item in st.session_state['report_list']:
-            full_report += f"TOPIC: {item['Topic']}\n{item['Notes']}\n\n" + "-"*20 + "\n"
-            
+        # The report text is only built when the download is clicked
         st.download_button(
             label="📥 Download Full Report",
-            data=full_report,
+            data=lambda ids=tuple(report_ids): knowledge_index.build_report(knowledge_index.report_items(knowledge_df, ids)),
             file_name="Bio_Research_Report.txt",
             mime="text/plain",
             use_container_width=True
@@ -967,15 +1275,11 @@ with st.sidebar:
 # =========================
 # TAB 10: 🔬 NCBS RESEARCH 
 # =========================
-with tabs[9]:
-    # --- INTERNAL FUNCTIONS (You can move these to the top of your file later) ---
-    def calculate_fret_efficiency(distance_nm, r0_nm=5.4):
-        return 1 / (1 + (distance_nm / r0_nm)**6)
-
-    def simulate_recoil(time_array, tension_level):
-        viscosity = 0.5 
-        tau = viscosity / tension_level 
-        return (1 - np.exp(-time_array / tau))
+with tabs[9], metrics.section("ncbs_research"):
+    @st.cache_data(max_entries=16)
+    def fit_recoil_csv(csv_bytes):
+        # All curves are fitted together in one batched least-squares pass
+        return biophysics.fit_recoil_table(pd.read_csv(io.BytesIO(csv_bytes)))
 
     st.markdown("<h2 style='color: #00d4ff;'>🔬 NCBS Research Intelligence Hub</h2>", unsafe_allow_html=True)
     
@@ -1029,56 +1333,122 @@ with tabs[9]:
     with analysis_tab1:
         st.write("**Molecular Strain (FRET)**")
         dist = st.slider("Stretch Distance (nm)", 2.0, 10.0, 5.4, key="fret_slider")
-        d_range = np.linspace(2, 10, 50)
-        e_range = [calculate_fret_efficiency(d) * 100 for d in d_range]
-        current_eff = calculate_fret_efficiency(dist) * 100
+        r0 = st.slider("Förster Radius R₀ (nm)", 3.0, 8.0, biophysics.DEFAULT_R0_NM, step=0.1, key="fret_r0")
+        # Curve is memoized per R₀; only the marker moves while the slider is dragged
+        d_range, e_range = biophysics.fret_curve(r0)
+        current_eff = float(biophysics.fret_efficiency(dist, r0)) * 100
         
-        fig, ax = plt.subplots(figsize=(4, 3))
-        fig.patch.set_alpha(0.0) 
-        ax.set_facecolor('none')
-        label_color = '#333333' 
-        ax.plot(d_range, e_range, color='#00d4ff', linewidth=3)
-        ax.scatter([dist], [current_eff], color='red', s=80, zorder=5)
-        ax.set_ylabel("Efficiency (%)", color=label_color, fontsize=10)
-        ax.set_xlabel("Distance (nm)", color=label_color, fontsize=10)
-        ax.tick_params(colors=label_color, labelsize=8)
-        st.pyplot(fig)
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=d_range, y=e_range, mode="lines", line=dict(color="#00d4ff", width=3), name="E(r)"))
+        fig.add_trace(go.Scatter(x=[dist], y=[current_eff], mode="markers", marker=dict(color="red", size=12), name="Current"))
+        fig.update_layout(height=280, margin=dict(l=10, r=10, t=10, b=10), showlegend=False,
+                          xaxis_title="Distance (nm)", yaxis_title="Efficiency (%)",
+                          paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
+        st.plotly_chart(fig, use_container_width=True)
 
     with analysis_tab2:
         st.write("**Tissue Tension Analysis**")
         tension = st.select_slider("Applied Tension", options=[0.2, 0.8, 1.5], key="tension_slider")
-        t_axis = np.linspace(0, 2, 50)
-        recoil_dist = simulate_recoil(t_axis, tension)
+        t_axis, recoil_dist = biophysics.recoil_curve(tension)
         st.line_chart(pd.DataFrame({"Recoil (μm)": recoil_dist}, index=t_axis), height=150)
-        st.metric("Recoil Velocity", f"{tension/0.5} μm/s")
+        st.metric("Recoil Velocity", f"{float(biophysics.recoil_velocity(tension)):.1f} μm/s")
+
+        with st.expander("🗺️ Tension Sweep"):
+            sweep_t, sweep_tension, sweep_grid = biophysics.recoil_grid(tuple(np.round(np.linspace(0.1, 2.0, 40), 3)))
+            heatmap = px.imshow(sweep_grid, x=sweep_t, y=sweep_tension, origin="lower", aspect="auto",
+                                labels=dict(x="Time (s)", y="Tension", color="Recoil (μm)"), height=250)
+            st.plotly_chart(heatmap, use_container_width=True)
+
+        with st.expander("📂 Batch Fit Measured Recoils"):
+            st.caption("CSV in long format (cut, time, recoil) or wide format (time + one column per cut).")
+            recoil_csv = st.file_uploader("Recoil Time Series", type=["csv"], key="recoil_csv")
+            if recoil_csv is not None:
+                try:
+                    fit_table = fit_recoil_csv(recoil_csv.getvalue())
+                    if fit_table.empty:
+                        st.warning("No valid (time, recoil) points found in this file.")
+                    else:
+                        f1, f2 = st.columns(2)
+                        f1.metric("Cuts Fitted", f"{int(fit_table['Fitted'].sum())} / {len(fit_table)}")
+                        f2.metric("Median τ", f"{fit_table['Tau (s)'].median():.3f} s")
+                        unfitted = int((~fit_table["Fitted"]).sum())
+                        if unfitted:
+                            st.caption(f"{unfitted} cut(s) have fewer than {biophysics.FIT_MIN_POINTS} "
+                                       "points after the cut (t > 0) and were not fitted.")
+                        st.dataframe(fit_table, height=220, use_container_width=True)
+                        st.download_button("📥 Download Fit Table", fit_table.to_csv(index=False),
+                                           file_name="recoil_fits.csv", mime="text/csv")
+                except Exception as e:
+                    st.error(f"Could not fit recoil data: {e}")
 
     with analysis_tab3:
         st.write("**Image Processing Pipeline**")
+
+        # Uploads are copied to disk so the tiled analysis can memory-map them; large stacks
+        # belong in the server data directory (BIO_IMAGE_DATA_DIR) rather than in an upload
+        uploaded_tiff = st.file_uploader("Upload TIFF Stack", type=["tif", "tiff"], key="tiff_upload")
+        server_tiff = None
+        if image_pipeline.DATA_DIR:
+            server_tiff = st.text_input("...or a TIFF in the server data directory", key="tiff_server_path",
+                                        placeholder="confocal/stack.tif")
+        tiff_path = None
+        if uploaded_tiff is not None:
+            tiff_path = image_pipeline.save_upload(uploaded_tiff)
+        elif server_tiff:
+            tiff_path = image_pipeline.resolve_data_path(server_tiff)
+            if tiff_path is None or not tiff_path.lower().endswith((".tif", ".tiff")):
+                tiff_path = None
+                st.warning("No such TIFF in the data directory.")
+        # Delete this session's previous upload copy once it is replaced or removed
+        previous_upload = st.session_state.get("tiff_upload_copy")
+        if previous_upload and previous_upload != tiff_path:
+            image_pipeline.discard_upload(previous_upload)
+        st.session_state.tiff_upload_copy = tiff_path if uploaded_tiff is not None else None
         
-        # Simulated Image Processing Steps
         tool_choice = st.selectbox("Select Tool", ["OpenCV (cv2)", "Scikit-Image (skimage)", "CellProfiler Logic"])
         
         if tool_choice == "OpenCV (cv2)":
             st.info("Using **cv2.Canny()** for edge detection and **cv2.findContours()** to identify cell boundaries.")
-            st.button("Run Edge Detection")
+            if st.button("Run Edge Detection") and tiff_path:
+                st.image(image_pipeline.preview_edges(tiff_path), caption="Canny edges (first plane, downsampled)",
+                         use_container_width=True)
             
         elif tool_choice == "Scikit-Image (skimage)":
             st.info("Using **skimage.filters.otsu** for thresholding and **skimage.measure.regionprops** for geometry.")
-            st.button("Calculate Cell Area")
+            if st.button("Calculate Cell Area") and tiff_path:
+                regions = image_pipeline.preview_regions(tiff_path)
+                st.metric("Cells in First Tile", len(regions))
+                if len(regions):
+                    st.metric("Mean Cell Area", f"{regions['area'].mean():.0f} px")
             
         elif tool_choice == "CellProfiler Logic":
-            st.info("Simulating a pipeline: [IdentifyPrimaryObjects] -> [MeasureObjectIntensity] -> [ExportToSpreadsheet]")
-            st.button("Run Pipeline")
+            st.info("Pipeline: [IdentifyPrimaryObjects] -> [MeasureObjectIntensity] -> [ExportToSpreadsheet]")
+            if st.button("Run Pipeline") and tiff_path:
+                regions = image_pipeline.preview_regions(tiff_path)
+                st.dataframe(regions, height=200, use_container_width=True)
+                st.download_button("📥 Export Spreadsheet", regions.to_csv(index=False),
+                                   file_name="first_tile_objects.csv", mime="text/csv")
+
+        if tiff_path is None:
+            st.caption("Upload a TIFF stack to enable the tools.")
+
+        threshold_mode = st.radio("Threshold", list(image_pipeline.THRESHOLD_MODES),
+                                  format_func=image_pipeline.THRESHOLD_MODES.get, horizontal=True,
+                                  help="Per-tile Otsu adapts to uneven illumination; it never goes below "
+                                       "the stack-wide level, so background-only tiles stay empty.")
 
         # Progress Bar for "Analysis"
-        if st.button("🚀 Analyze Raw TIFF"):
+        if st.button("🚀 Analyze Raw TIFF", disabled=tiff_path is None):
             progress_bar = st.progress(0)
-            for i in range(101):
-                import time
-                time.sleep(0.01)
-                progress_bar.progress(i)
+            # Progress is reported by the worker pool as tiles finish
+            def report_progress(done, total):
+                progress_bar.progress(done / total, text=f"Tile {done} / {total}")
+            result = image_pipeline.analyze_stack(tiff_path, threshold_mode=threshold_mode,
+                                                  progress=report_progress)
             st.success("Analysis Complete!")
-            st.json({"Mean_Intensity": 142.5, "Cell_Count": 12, "Avg_Strain": "8.4 pN"})
+            st.json(result["summary"])
+            st.download_button("📥 Download Cell Measurements", result["cells"].to_csv(index=False),
+                               file_name="cell_measurements.csv", mime="text/csv")
 
 
     # Bottom Pitch
@@ -1096,12 +1466,12 @@ with tabs[9]:
 # =========================
 # SIDEBAR: RESEARCH TIP
 # =========================
-with st.sidebar:
+with st.sidebar, metrics.section("sidebar_tip"):
     st.divider()
     st.markdown("### 💡 Research Tip")
     tips = [
         "Always verify GC content for primer design stability.",
-        "Use NCBI BLAST to compare your sequences against known databases.",
+        "Use NCBI BLAST to compare your sequences against known databases, or the Molecular Suite's Pairwise Alignment for two sequences.",
         "CRISPR-Cas9 efficiency depends on the choice of Guide RNA (gRNA).",
         "Restriction enzymes work best at specific pH and temperature buffers."
     ]
@@ -1109,5 +1479,49 @@ with st.sidebar:
     import datetime
     tip_index = datetime.datetime.now().day % len(tips)
     st.info(tips[tip_index])
+
+    # Developer panels: server-side opt-in only (BIO_DEV_PANEL=1), never from the URL
+    if metrics.DEV_PANEL:
+        with st.expander("🗄️ Shared Cache Stats"):
+            cache_stats = cache_backend.get_cache().stats()
+            if cache_stats:
+                st.dataframe(pd.DataFrame(cache_stats).T, use_container_width=True)
+            else:
+                st.caption("No shared-cache lookups yet.")
+
+        with st.expander("⏱️ Performance Metrics"):
+            st.markdown("**This rerun**")
+            st.dataframe(pd.DataFrame(
+                [{"Section": name, "ms": round(seconds * 1000, 1)} for name, seconds in metrics.last_rerun_sections()]
+            ), use_container_width=True, hide_index=True)
+
+            st.markdown("**Since server start**")
+            metric_rows = metrics.REGISTRY.snapshot()
+            if metric_rows:
+                st.dataframe(pd.DataFrame([{
+                    "Metric": row["name"].replace("bio_", "").replace("_seconds", ""),
+                    "Labels": ", ".join(f"{k}={v}" for k, v in row["labels"].items()),
+                    "Count": row["count"],
+                    "Mean (ms)": round(row["mean"] * 1000, 1),
+                    "p95 (ms)": round(row["p95"] * 1000, 1),
+                    "Max (ms)": round(row["max"] * 1000, 1),
+                } for row in metric_rows]), use_container_width=True, hide_index=True)
+            st.markdown("**Session memory**")
+            state_sizes = metrics.state_sizes(st.session_state.to_dict())
+            st.caption(f"This session: {sum(size for _, _, size in state_sizes) / 1024:.1f} KB in {len(state_sizes)} keys")
+            st.dataframe(pd.DataFrame(state_sizes, columns=["Key", "Type", "Bytes"]),
+                         use_container_width=True, hide_index=True)
+            if st.button("Measure all sessions", key="dev_all_sessions"):
+                all_sessions = metrics.all_sessions_state_bytes()
+                if all_sessions is None:
+                    st.caption("Session list is only available when running under `streamlit run`.")
+                else:
+                    st.caption(f"{len(all_sessions)} active sessions, "
+                               f"{sum(all_sessions) / 1024:.1f} KB of session state in total")
+            c_prom, c_json = st.columns(2)
+            c_prom.download_button("Prometheus", metrics.REGISTRY.prometheus_text(), "metrics.prom", "text/plain")
+            c_json.download_button("JSON", json.dumps(metric_rows, indent=2), "metrics.json", "application/json")
     
     st.caption("© 2026 Bio-Verify | Developed for Genomic Research")
+
+metrics.finish_rerun()
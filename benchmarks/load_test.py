@@ -0,0 +1,423 @@
+"""
+Headless multi-session load test for app.py.
+
+Each simulated user is a separate Streamlit AppTest session. Every session
+runs a scripted journey: page through the Reader, search, run the Molecular
+Suite, open the 3D Viewer and ask Wikipedia. AppTest swaps a process-global
+runtime in and out on every run, so sessions cannot share a process safely.
+Concurrency therefore comes from worker processes, like several app
+replicas sharing one cache. Each worker runs its sessions one after another.
+External services (Wikipedia, NCBI, RCSB, Google Translate) and the EasyOCR
+model are replaced by local stubs with a configurable delay, so the run
+measures the app itself and never touches the network. RCSB serves synthetic
+mmCIF complexes (one larger than the level-of-detail budget), so the 3D
+Viewer step parses, decimates and scans real structures.
+
+Reported: throughput (reruns/s, journeys/s), p50/p99 rerun latency overall
+and per step, per-session memory (RSS growth and session-state size) and
+the slowest sections from metrics.py.
+
+Usage (from the repository root):
+    python benchmarks/load_test.py --sessions 50 --workers 8
+    python benchmarks/load_test.py --sessions 20 --external-latency 300 --json load.json
+"""
+import argparse
+import functools
+import json
+import os
+import pickle
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+
+# Keep the load test's shared cache and OCR store away from the real ones
+_tmpdir = tempfile.TemporaryDirectory(prefix="bio_load_")
+os.environ.setdefault("BIO_CACHE_URL", "sqlite:///" + os.path.join(_tmpdir.name, "cache.sqlite"))
+os.environ.setdefault("BIO_OCR_STORE", os.path.join(_tmpdir.name, "ocr_index.sqlite"))
+os.environ.setdefault("BIO_STRUCTURE_CACHE", os.path.join(_tmpdir.name, "pdb"))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+# AppTest runs without a server runtime; silence the per-session warnings about it
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+SEARCH_TERMS = ["DNA", "enzyme", "membrane", "protein", "glycolysis", "ribosome", "kinase", "lipid"]
+# Synthetic stand-ins served for these IDs: (chains, residues per chain)
+PDB_FIXTURES = {"1CRN": (1, 46), "1UBQ": (1, 76), "1A8M": (2, 230), "4HHB": (8, 600)}
+PDB_IDS = list(PDB_FIXTURES)
+
+
+# =========================
+# EXTERNAL SERVICE STUBS
+# =========================
+class _Delay:
+    seconds = 0.0
+
+    @classmethod
+    def wait(cls):
+        if cls.seconds:
+            time.sleep(cls.seconds)
+
+
+class _StubResponse:
+    def __init__(self, payload=None, status_code=200, text=""):
+        self._payload = payload or {}
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} (load-test stub)")
+
+
+def _stub_requests_get(url, params=None, **kwargs):
+    _Delay.wait()
+    if "eutils.ncbi.nlm.nih.gov" in url:
+        term = (params or {}).get("term", "")
+        ids = [str(abs(hash((term, i))) % 10_000_000) for i in range(5)]
+        return _StubResponse({"esearchresult": {"idlist": ids}})
+    if "files.rcsb.org" in url:
+        pdb_id = os.path.basename(url).split(".")[0].upper()
+        if pdb_id in PDB_FIXTURES:
+            return _StubResponse(text=_structure_fixture(pdb_id))
+    # Anything else: behave like a missing resource
+    return _StubResponse(status_code=404)
+
+
+@functools.lru_cache(maxsize=None)
+def _structure_fixture(pdb_id):
+    import synthetic
+    chains, residues = PDB_FIXTURES[pdb_id]
+    return synthetic.make_structure_cif(pdb_id, chains, residues, seed=sum(map(ord, pdb_id)))
+
+
+class _StubPage:
+    def __init__(self, title):
+        self.title = title
+        self.url = f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"
+
+
+class _StubTranslator:
+    def __init__(self, source="auto", target="hi"):
+        self.target = target
+
+    def translate(self, text):
+        _Delay.wait()
+        return f"[{self.target}] {text}"
+
+
+class _StubReader:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def readtext(self, image, detail=1):
+        _Delay.wait()
+        words = ["DNA", "polymerase", "primer"]
+        if detail == 0:
+            return words
+        return [([[0, 20 * k], [90, 20 * k], [90, 20 * k + 18], [0, 20 * k + 18]], word, 0.9)
+                for k, word in enumerate(words)]
+
+
+def install_stubs(external_latency_s=0.0):
+    """Patch the external-service entry points the app and its modules call."""
+    import deep_translator
+    import requests
+    import wikipedia
+
+    _Delay.seconds = external_latency_s
+    requests.get = _stub_requests_get
+
+    def search(query, results=10):
+        _Delay.wait()
+        return [query.title()] if query.strip() else []
+
+    def page(title, auto_suggest=True):
+        _Delay.wait()
+        return _StubPage(title)
+
+    def summary(title, sentences=0, auto_suggest=True):
+        _Delay.wait()
+        return f"{title} is a topic in molecular biology (load-test stub)."
+
+    wikipedia.search, wikipedia.page, wikipedia.summary = search, page, summary
+    deep_translator.GoogleTranslator = _StubTranslator
+    try:
+        import easyocr
+        easyocr.Reader = _StubReader
+    except ImportError:
+        # The app imports easyocr at the top; provide a module so it can start
+        import types
+        sys.modules["easyocr"] = types.SimpleNamespace(Reader=_StubReader)
+
+
+def share_script_bytecode():
+    """
+    Compile app.py once per worker, as the server's script cache does.
+
+    AppTest builds a fresh ScriptCache on every run, which would add a full
+    compile of app.py to every measured rerun.
+    """
+    from streamlit.runtime.scriptrunner import script_cache
+
+    original = script_cache.ScriptCache.get_bytecode
+    compiled = {}
+    lock = threading.Lock()
+
+    def get_bytecode(self, script_path):
+        key = (script_path, os.stat(script_path).st_mtime_ns)
+        with lock:
+            if key not in compiled:
+                compiled[key] = original(self, script_path)
+            return compiled[key]
+
+    script_cache.ScriptCache.get_bytecode = get_bytecode
+
+
+# =========================
+# JOURNEYS
+# =========================
+def _button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+
+def _text_input(at, label):
+    return next(t for t in at.text_input if t.label == label)
+
+
+def journey_steps(rng):
+    """[(step name, action(at))]; each action sets widgets before the timed rerun."""
+    term = rng.choice(SEARCH_TERMS)
+    dna = "".join(rng.choice("ATGC") for _ in range(rng.choice([60, 600, 6000])))
+    return [
+        ("open", lambda at: None),
+        ("reader_next", lambda at: _button(at, "NEXT ➡").click()),
+        ("reader_next", lambda at: _button(at, "NEXT ➡").click()),
+        ("reader_prev", lambda at: _button(at, "⬅ PREV").click()),
+        ("search", lambda at: _text_input(at, "Enter a term to search (e.g., 'DNA', 'Polymerase')...").input(term)),
+        ("molecular_suite", lambda at: at.text_area(key="dna_input_area").input(dna)),
+        ("viewer_3d", lambda at: at.text_input(key="nexus_pdb").input(rng.choice(PDB_IDS))),
+        ("viewer_pockets", lambda at: at.button(key="nexus_btn2").click()),
+        ("global_search", lambda at: _text_input(at, "Search for any topic (e.g., DNA, MITOSIS, CRISPR):").input(term)),
+    ]
+
+
+# =========================
+# RUNNER
+# =========================
+def rss_bytes():
+    """Current resident set size (Linux /proc, else peak RSS from getrusage)."""
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def session_state_bytes(at):
+    """Pickled size of the user-visible session state (what a session keeps between reruns)."""
+    total = 0
+    for value in at.session_state._state.filtered_state.values():
+        try:
+            total += len(pickle.dumps(value))
+        except Exception:
+            pass
+    return total
+
+
+def run_session(session_id, timeout, seed):
+    """Run one journey; returns (result dict, AppTest)."""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed + session_id)
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    timings, errors = [], []
+    start = time.perf_counter()
+    for step, action in journey_steps(rng):
+        try:
+            action(at)
+        except (StopIteration, KeyError):
+            errors.append(f"{step}: widget not found")
+            continue
+        step_start = time.perf_counter()
+        try:
+            at.run()
+        except Exception as e:
+            errors.append(f"{step}: {e}")
+            continue
+        timings.append((step, time.perf_counter() - step_start))
+        errors.extend(f"{step}: {e.value}" for e in at.exception)
+    result = {
+        "session": session_id,
+        "timings": timings,
+        "errors": errors,
+        "duration": time.perf_counter() - start,
+        "state_bytes": session_state_bytes(at),
+    }
+    return result, at
+
+
+_worker = {}
+
+
+def _init_worker(external_latency_s, timeout, seed):
+    install_stubs(external_latency_s)
+    share_script_bytecode()
+    # Warm-up session: imports, model loads and st.cache_* fills are not user latency
+    warm, _ = run_session(-1, timeout, seed)
+    import metrics
+    metrics.REGISTRY.reset()
+    _worker.update(timeout=timeout, seed=seed, alive=[], warm_errors=warm["errors"], rss_start=rss_bytes())
+
+
+def _worker_session(session_id):
+    import metrics
+    result, at = run_session(session_id, _worker["timeout"], _worker["seed"])
+    # Sessions stay alive so the worker's RSS reflects all of them at once
+    _worker["alive"].append(at)
+    result.update(
+        pid=os.getpid(),
+        rss_start=_worker["rss_start"],
+        rss=rss_bytes(),
+        worker_sessions=len(_worker["alive"]),
+        warm_errors=_worker["warm_errors"],
+        metrics=metrics.REGISTRY.snapshot(),
+    )
+    return result
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def _latest_per_worker(results):
+    latest = {}
+    for r in results:
+        if r["worker_sessions"] >= latest.get(r["pid"], {}).get("worker_sessions", 0):
+            latest[r["pid"]] = r
+    return list(latest.values())
+
+
+def merged_sections(results, limit=8):
+    """Section histograms summed over workers: [(section, mean ms, p95 ms)], slowest first."""
+    import metrics
+    merged = {}
+    for r in _latest_per_worker(results):
+        for row in r["metrics"]:
+            if row["name"] != "bio_section_seconds":
+                continue
+            h = merged.setdefault(row["labels"]["section"], metrics.Histogram())
+            h.counts = [a + b for a, b in zip(h.counts, row["buckets"].values())]
+            h.count += row["count"]
+            h.total += row["sum"]
+            h.max = max(h.max, row["max"])
+    ordered = sorted(merged.items(), key=lambda item: item[1].total, reverse=True)[:limit]
+    return [(name, h.total / h.count * 1000, h.quantile(0.95) * 1000) for name, h in ordered if h.count]
+
+
+def summarize(results, wall):
+    latencies = [t for r in results for _, t in r["timings"]]
+    by_step = {}
+    for r in results:
+        for step, t in r["timings"]:
+            by_step.setdefault(step, []).append(t)
+    workers = _latest_per_worker(results)
+    sessions = len(results)
+    rss_growth = sum(w["rss"] - w["rss_start"] for w in workers)
+    return {
+        "sessions": sessions,
+        "workers": len(workers),
+        "wall_s": wall,
+        "reruns": len(latencies),
+        "reruns_per_s": len(latencies) / wall if wall else 0.0,
+        "journeys_per_s": sessions / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "steps": {
+            step: {"count": len(ts), "p50_ms": percentile(ts, 50) * 1000, "p99_ms": percentile(ts, 99) * 1000}
+            for step, ts in by_step.items()
+        },
+        "worker_rss_mb": [w["rss"] / 2 ** 20 for w in workers],
+        "rss_per_session_mb": rss_growth / sessions / 2 ** 20 if sessions else 0.0,
+        "session_state_kb": statistics.mean(r["state_bytes"] for r in results) / 1024 if results else 0.0,
+        "sections": merged_sections(results),
+        "errors": sorted({e for r in results for e in r["errors"]}),
+        "warm_up_errors": sorted({e for r in results for e in r["warm_errors"]}),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless multi-session load test for app.py.")
+    parser.add_argument("--sessions", type=int, default=20, help="Simulated users (one journey each)")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes (concurrent sessions)")
+    parser.add_argument("--external-latency", type=float, default=0.0,
+                        help="Delay (ms) added to every stubbed external call")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-rerun timeout (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the summary to this file")
+    args = parser.parse_args(argv)
+
+    workers = max(1, min(args.workers, args.sessions))
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(args.external_latency / 1000, args.timeout, args.seed))
+    with pool:
+        # Start (and warm up) every worker before the clock starts
+        list(pool.map(time.sleep, [0.5] * workers))
+        start = time.perf_counter()
+        futures = [pool.submit(_worker_session, session_id) for session_id in range(args.sessions)]
+        results = []
+        for future in as_completed(futures):
+            results.append(future.result())
+            print(f"\rsessions {len(results)}/{args.sessions}", end="", flush=True)
+        wall = time.perf_counter() - start
+    print()
+    summary = summarize(results, wall)
+
+    print(f"{summary['sessions']} sessions x {len(journey_steps(random.Random(0)))} steps on "
+          f"{summary['workers']} workers, external latency {args.external_latency:.0f} ms")
+    print(f"Throughput: {summary['reruns_per_s']:.2f} reruns/s, {summary['journeys_per_s']:.2f} journeys/s "
+          f"({summary['wall_s']:.1f} s wall)")
+    print(f"Rerun latency: p50 {summary['p50_ms']:.0f} ms, p99 {summary['p99_ms']:.0f} ms")
+    for step, stats in summary["steps"].items():
+        print(f"  {step:<16} n={stats['count']:<4} p50 {stats['p50_ms']:>7.0f} ms   p99 {stats['p99_ms']:>7.0f} ms")
+    print(f"Memory: {summary['rss_per_session_mb']:.1f} MB RSS/session "
+          f"(workers at {', '.join(f'{mb:.0f}' for mb in summary['worker_rss_mb'])} MB), "
+          f"session state {summary['session_state_kb']:.1f} KB/session")
+    print("Slowest sections (mean / p95 ms):")
+    for name, mean_ms, p95_ms in summary["sections"]:
+        print(f"  {name:<16} {mean_ms:>7.0f} {p95_ms:>7.0f}")
+    if summary["warm_up_errors"]:
+        print("Warm-up errors:", *summary["warm_up_errors"], sep="\n  ")
+    if summary["errors"]:
+        print("Errors:", *summary["errors"], sep="\n  ")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(summary, handle, indent=2)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    # Workers must unpickle tasks from an importable module: AppTest replaces
+    # __main__ with app.py inside each worker
+    import load_test
+    sys.exit(load_test.main())
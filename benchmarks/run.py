@@ -0,0 +1,359 @@
+"""
+Benchmark suite for the app's hot paths.
+
+Covers knowledge-base loading and search, OCR-index lookups, the sequence
+tools (1 kb - 100 Mb), pairwise alignment (against a naive Python DP),
+k-mer database build and search,
+FRET/recoil curve generation and report building.
+Results are compared with `benchmarks/baseline.json`; a case whose median
+time grows past the tolerance fails the run, so regressions are caught
+before deploy.
+
+Usage (from the repository root):
+    python benchmarks/run.py                 # run and compare with the baseline
+    python benchmarks/run.py --full          # include the 100 Mb sequence cases
+    python benchmarks/run.py -k sequence     # only cases whose name contains "sequence"
+    python benchmarks/run.py --save          # record the current timings as the baseline
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import alignment  # noqa: E402
+import biophysics  # noqa: E402
+import knowledge_index  # noqa: E402
+import ocr_ingest  # noqa: E402
+import sequence_index  # noqa: E402
+import sequence_tools  # noqa: E402
+import synthetic  # noqa: E402
+
+# =========================
+# CONFIGURATION
+# =========================
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_TOLERANCE = 1.5      # fail when median > baseline median * tolerance
+MIN_REPEAT_TIME = 0.05       # s, each repeat loops the case at least this long
+REPEATS = 5
+
+SEQUENCE_SIZES = {"1kb": 1_000, "100kb": 100_000, "10Mb": 10_000_000}
+FULL_SEQUENCE_SIZES = {"100Mb": 100_000_000}
+KB_SIZES = {"100": 100, "1k": 1_000, "10k": 10_000}
+
+CASES = []
+
+
+def case(name, full=False):
+    """Register a benchmark; the decorated function builds inputs and returns the timed callable."""
+    def decorator(setup):
+        CASES.append({"name": name, "setup": setup, "full": full})
+        return setup
+    return decorator
+
+
+# =========================
+# CASES
+# =========================
+_tmpdir = tempfile.TemporaryDirectory(prefix="bio_bench_")
+
+
+def _kb_csv_bytes(n_rows):
+    buffer = io.StringIO()
+    synthetic.make_knowledge_base(n_rows).to_csv(buffer, index=False)
+    return buffer.getvalue().encode("utf-8")
+
+
+for _label, _rows in KB_SIZES.items():
+    @case(f"kb.load[{_label}]")
+    def _kb_load(rows=_rows):
+        data = _kb_csv_bytes(rows)
+        return lambda: knowledge_index.load_csv(io.BytesIO(data))
+
+    @case(f"kb.search[{_label}]")
+    def _kb_search(rows=_rows):
+        df = synthetic.make_knowledge_base(rows)
+        ocr_texts = {f"{i}.jpg": " ".join(synthetic.WORDS[i % 7::3]) for i in range(50)}
+        return lambda: knowledge_index.search(df, "phosphorylation", ocr_texts.get)
+
+
+for _label, _rows in (("1k", 1_000), ("10k", 10_000)):
+    @case(f"kb.related_index[{_label}]")
+    def _related_index(rows=_rows):
+        df = synthetic.make_zipf_knowledge_base(rows)
+        return lambda: knowledge_index.build_related_index(df)
+
+
+@case("kb.related_lookup[10k]")
+def _related_lookup():
+    index = knowledge_index.build_related_index(synthetic.make_zipf_knowledge_base(10_000))
+    return lambda: [index.related(pos) for pos in range(0, 10_000, 10)]
+
+
+for _label, _rows in (("1k", 1_000), ("10k", 10_000)):
+    @case(f"kb.script_index[{_label}]")
+    def _script_index(rows=_rows):
+        df = synthetic.make_zipf_knowledge_base(rows)
+        return lambda: knowledge_index.build_script_index(df)
+
+
+@case("kb.search_translit[10k]")
+def _search_translit():
+    df = synthetic.make_zipf_knowledge_base(10_000)
+    index = knowledge_index.build_script_index(df)
+    return lambda: knowledge_index.search(df, "फॉस्फोरिलेशन", script_index=index)
+
+
+@case("ocr.lookup[20 images]")
+def _ocr_lookup():
+    store, paths = synthetic.make_ocr_fixture(os.path.join(_tmpdir.name, "ocr"))
+    return lambda: [ocr_ingest.lookup_text(path, store) for path in paths]
+
+
+def _sequence_cases(sizes, full):
+    for label, length in sizes.items():
+        @case(f"sequence.clean[{label}]", full)
+        def _clean(length=length):
+            raw = synthetic.random_dna(length, noise=0.05)
+            return lambda: sequence_tools.clean_sequence(raw)
+
+        @case(f"sequence.transcribe[{label}]", full)
+        def _transcribe(length=length):
+            seq = synthetic.random_dna(length)
+            return lambda: sequence_tools.transcribe(seq)
+
+        @case(f"sequence.complement[{label}]", full)
+        def _complement(length=length):
+            seq = synthetic.random_dna(length)
+            return lambda: sequence_tools.complement(seq)
+
+        @case(f"sequence.gc[{label}]", full)
+        def _gc(length=length):
+            seq = synthetic.random_dna(length)
+            return lambda: sequence_tools.gc_content(seq)
+
+        @case(f"sequence.translate[{label}]", full)
+        def _translate(length=length):
+            seq = synthetic.random_dna(length)
+            return lambda: sequence_tools.translate(seq)
+
+
+_sequence_cases(SEQUENCE_SIZES, False)
+_sequence_cases(FULL_SEQUENCE_SIZES, True)
+
+
+def naive_align_score(a, b, local=False, match=alignment.MATCH, mismatch=alignment.MISMATCH,
+                      gap_open=alignment.GAP_OPEN, gap_extend=alignment.GAP_EXTEND):
+    """Textbook cell-by-cell Gotoh DP (two rows), the reference the NumPy version is measured against."""
+    neg = float("-inf")
+    m = len(b)
+    H = [0] * (m + 1) if local else [0] + [-gap_open - (j - 1) * gap_extend for j in range(1, m + 1)]
+    F = [neg] * (m + 1)
+    best = 0
+    for i in range(1, len(a) + 1):
+        h_diag, H[0] = H[0], 0 if local else -gap_open - (i - 1) * gap_extend
+        F[0] = neg
+        e = neg
+        for j in range(1, m + 1):
+            e = max(H[j - 1] - gap_open, e - gap_extend)
+            F[j] = max(H[j] - gap_open, F[j] - gap_extend)
+            h = max(h_diag + (match if a[i - 1] == b[j - 1] else mismatch), e, F[j])
+            if local:
+                h = max(h, 0)
+                best = max(best, h)
+            h_diag, H[j] = H[j], h
+    return best if local else H[m]
+
+
+@case("align.naive_python[300bp]")
+def _align_naive():
+    a = synthetic.random_dna(300)
+    b = synthetic.mutate_dna(a, 0.1, seed=1)
+    return lambda: naive_align_score(a, b)
+
+
+for _label, _length in (("300bp", 300), ("1kb", 1_000)):
+    @case(f"align.global[{_label}]")
+    def _align_global(length=_length):
+        a = synthetic.random_dna(length)
+        b = synthetic.mutate_dna(a, 0.1, seed=1)
+        return lambda: alignment.align(a, b)
+
+    @case(f"align.local[{_label}]")
+    def _align_local(length=_length):
+        a = synthetic.random_dna(length)
+        b = synthetic.random_dna(length // 4, seed=2) + synthetic.mutate_dna(a[:length // 2], 0.1, seed=1)
+        return lambda: alignment.align(a, b, "local")
+
+
+@case("align.banded[10kb, band 100]")
+def _align_banded():
+    a = synthetic.random_dna(10_000)
+    b = synthetic.mutate_dna(a, 0.05, seed=1)
+    return lambda: alignment.align(a, b, band=100)
+
+
+@case("align.score_only[5kb]")
+def _align_score_only():
+    a = synthetic.random_dna(5_000)
+    b = synthetic.mutate_dna(a, 0.1, seed=1)
+    return lambda: alignment.align_score(a, b)
+
+
+def _sequence_db():
+    directory = os.path.join(_tmpdir.name, "seqdb")
+    fasta = os.path.join(_tmpdir.name, "seqdb.fa")
+    if not os.path.exists(fasta):
+        synthetic.write_fasta(fasta)
+        sequence_index.build_index(fasta, directory)
+    return fasta, directory
+
+
+@case("seqdb.build[4.5Mb]")
+def _seqdb_build():
+    fasta, _ = _sequence_db()
+    out = os.path.join(_tmpdir.name, "seqdb_build")
+    return lambda: sequence_index.build_index(fasta, out)
+
+
+for _label, _length in (("1kb", 1_000), ("5kb", 5_000)):
+    @case(f"seqdb.search[{_label} query, 4.5Mb]")
+    def _seqdb_search(length=_length):
+        fasta, directory = _sequence_db()
+        longest = max((seq for _, _, seq in sequence_index.read_fasta(fasta)), key=len)
+        query = synthetic.mutate_dna(longest[:length], 0.1, seed=1)
+        index = sequence_index.SequenceIndex(directory)
+        return lambda: index.search(query)
+
+
+@case("biophysics.fret_curve")
+def _fret_curve():
+    # __wrapped__ skips the lru_cache so generation itself is measured
+    return lambda: biophysics.fret_curve.__wrapped__(5.4, 2.0, 10.0, 500)
+
+
+@case("biophysics.recoil_curve")
+def _recoil_curve():
+    return lambda: biophysics.recoil_curve.__wrapped__(1.0, points=500)
+
+
+@case("biophysics.recoil_grid[200 tensions]")
+def _recoil_grid():
+    tensions = tuple(float(t) for t in range(1, 201))
+    return lambda: biophysics.recoil_grid.__wrapped__(tensions, points=500)
+
+
+for _n in (10, 1_000):
+    @case(f"report.build[{_n} items]")
+    def _report(n=_n):
+        items = synthetic.report_items(n)
+        return lambda: knowledge_index.build_report(items)
+
+
+# =========================
+# RUNNER
+# =========================
+def time_case(func):
+    """Median/min seconds per call, looping so every repeat lasts MIN_REPEAT_TIME."""
+    func()  # warm-up (imports, lazy tables)
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= MIN_REPEAT_TIME or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < MIN_REPEAT_TIME / 10 else 2
+    repeats = REPEATS if elapsed < 1 else 3
+    per_call = [t / number for t in timer.repeat(repeat=repeats, number=number)]
+    return {"median": statistics.median(per_call), "min": min(per_call), "loops": number}
+
+
+def machine_info():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def run(selected, baseline, tolerance):
+    """Time every selected case; returns (results, regressions)."""
+    reference = (baseline or {}).get("results", {})
+    results, regressions = {}, []
+    for item in selected:
+        timing = time_case(item["setup"]())
+        results[item["name"]] = timing
+        line = f"{item['name']:<40} {format_time(timing['median']):>10}"
+        if item["name"] in reference:
+            ratio = timing["median"] / reference[item["name"]]["median"]
+            line += f"   x{ratio:.2f} vs baseline"
+            if ratio > tolerance:
+                line += "   REGRESSION"
+                regressions.append((item["name"], ratio))
+        else:
+            line += "   (new)"
+        print(line, flush=True)
+    return results, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app's hot paths.")
+    parser.add_argument("-k", dest="pattern", default="", help="Only run cases whose name contains this")
+    parser.add_argument("--full", action="store_true", help="Include the 100 Mb sequence cases")
+    parser.add_argument("--save", action="store_true", help="Write the timings to the baseline file")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare with / save to")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown factor before a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    selected = [c for c in CASES if args.pattern in c["name"] and (args.full or not c["full"])]
+    baseline = load_baseline(args.baseline)
+    if baseline and baseline.get("machine") != machine_info():
+        print("Note: baseline was recorded on a different machine/interpreter; ratios are indicative only.")
+
+    results, regressions = run(selected, None if args.save else baseline, args.tolerance)
+
+    if args.save:
+        # Keep cases that were not re-run (e.g. --full ones) from the previous baseline
+        merged = dict((baseline or {}).get("results", {}))
+        merged.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as handle:
+            json.dump({"machine": machine_info(), "results": merged}, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        print(f"Saved {len(results)} timings to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over x{args.tolerance}:")
+        for name, ratio in regressions:
+            print(f"  {name}: x{ratio:.2f}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Synthetic inputs for the benchmark suite.
+
+Everything is generated from a fixed seed so timings are comparable between
+runs and against the stored baseline.
+"""
+import os
+import random
+
+import numpy as np
+import pandas as pd
+
+from knowledge_index import KB_COLUMNS
+
+# Vocabulary the generated explanations are drawn from
+WORDS = (
+    "enzyme substrate kinetics membrane transport gradient protein folding helix sheet "
+    "ligand receptor signaling pathway kinase phosphorylation glycolysis citric acid cycle "
+    "oxidative phosphorylation mitochondria chloroplast replication transcription translation "
+    "ribosome codon promoter operon chromatin histone nucleosome lipid bilayer channel pump "
+    "equilibrium entropy free energy catalysis allosteric inhibitor cofactor vitamin hormone"
+).split()
+
+
+_SYLLABLES = ("bio", "cyt", "gen", "lip", "nuc", "pro", "ase", "ine", "ol", "ox", "phos", "rib", "tox", "zym")
+
+
+def vocabulary(size=5000, seed=0):
+    """WORDS plus made-up technical terms, most common first (for Zipf sampling)."""
+    rng = random.Random(seed)
+    extra = {"".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))) + str(i) for i in range(size)}
+    return list(WORDS) + sorted(extra)
+
+
+def _knowledge_frame(n_rows, rng, words, topic_words, words_per_row):
+    # `words(k)` draws k words; every generator consumes `rng` in the same order
+    rows = []
+    for i in range(n_rows):
+        topic = f"{rng.choice(WORDS).title()} {' '.join(words(topic_words))} {i}"
+        explanation = " ".join(words(words_per_row))
+        points = "\n".join(f"{p + 1}. {' '.join(words(8))}" for p in range(10))
+        rows.append({
+            "Topic": topic,
+            "Section": f"{i // 20 + 1}.{i % 20 + 1}",
+            "Explanation": explanation,
+            "Image": f"{i % 50}.jpg" if i % 3 == 0 else "",
+            "Ten_Points": points,
+            "Detailed_Explanation": explanation * 2,
+        })
+    return pd.DataFrame(rows, columns=KB_COLUMNS)
+
+
+def make_knowledge_base(n_rows, seed=0, words_per_row=60):
+    """DataFrame with the app's knowledge-base columns and `n_rows` topics."""
+    rng = random.Random(seed)
+
+    def words(k):
+        return [rng.choice(WORDS) for _ in range(k)]
+
+    return _knowledge_frame(n_rows, rng, words, 1, words_per_row)
+
+
+def make_zipf_knowledge_base(n_rows, seed=0, words_per_row=60):
+    """
+    Like make_knowledge_base(), but words follow a Zipf distribution over a few
+    thousand terms, like real textbook prose: a few very common words and a
+    long tail of rare ones. Used by the index cases, which depend on term
+    statistics.
+    """
+    rng = random.Random(seed)
+    vocab = vocabulary(seed=seed)
+    cum_weights = np.cumsum(1 / np.arange(1, len(vocab) + 1)).tolist()
+
+    def words(k):
+        return rng.choices(vocab, cum_weights=cum_weights, k=k)
+
+    return _knowledge_frame(n_rows, rng, words, 2, words_per_row)
+
+
+def write_knowledge_csv(path, n_rows, seed=0):
+    make_knowledge_base(n_rows, seed).to_csv(path, index=False)
+    return path
+
+
+def random_dna(length, seed=0, noise=0.0):
+    """Random upper-case DNA; `noise` is the fraction of non-ATGC characters (spaces, digits)."""
+    rng = np.random.default_rng(seed)
+    data = np.frombuffer(b"ATGC", dtype=np.uint8)[rng.integers(0, 4, length)]
+    if noise:
+        junk = np.frombuffer(b" \n0123456789", dtype=np.uint8)
+        positions = rng.random(length) < noise
+        data = data.copy()
+        data[positions] = junk[rng.integers(0, len(junk), int(positions.sum()))]
+    return data.tobytes().decode("ascii")
+
+
+def mutate_dna(seq, rate=0.05, seed=0):
+    """Copy of `seq` with a `rate` fraction of positions substituted, deleted or followed by an insertion."""
+    rng = np.random.default_rng(seed)
+    draws = rng.random(len(seq))
+    bases = rng.choice(list("ATGC"), len(seq))
+    out = []
+    for ch, x, base in zip(seq, draws, bases):
+        if x < rate / 3:
+            continue
+        if x < 2 * rate / 3:
+            out.append(base)
+        elif x < rate:
+            out.append(ch + base)
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def write_fasta(path, n_records=400, seed=0, min_length=2_000, max_length=20_000):
+    """FASTA of random records (~4.5 Mb with the defaults); returns {name: sequence}."""
+    rng = np.random.default_rng(seed)
+    records = {}
+    with open(path, "w", encoding="utf-8") as handle:
+        for r in range(n_records):
+            seq = random_dna(int(rng.integers(min_length, max_length)), seed=seed * 100_003 + r + 1)
+            records[f"vec{r}"] = seq
+            handle.write(f">vec{r} synthetic vector {r}\n")
+            handle.write("\n".join(seq[i:i + 70] for i in range(0, len(seq), 70)) + "\n")
+    return records
+
+
+def report_items(n_items, seed=0):
+    """Research-report entries as stored in st.session_state['report_list']."""
+    rng = random.Random(seed)
+    return [
+        {"Topic": f"Topic {i}", "Notes": " ".join(rng.choice(WORDS) for _ in range(120))}
+        for i in range(n_items)
+    ]
+
+
+def make_ocr_fixture(directory, n_images=20, size=(800, 600)):
+    """
+    Write `n_images` PNG diagrams and an OCR store indexing them.
+
+    Returns (store_path, image_paths).
+    """
+    import cv2
+    import ocr_ingest
+
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(0)
+    store = os.path.join(directory, "ocr_index.sqlite")
+    conn = ocr_ingest.connect(store)
+    paths = []
+    for i in range(n_images):
+        path = os.path.join(directory, f"diagram_{i}.png")
+        image = (rng.random((size[1], size[0])) * 255).astype(np.uint8)
+        cv2.imwrite(path, image)
+        ocr_ingest.save_result(conn, {
+            "path": ocr_ingest.store_key(path), "sha256": ocr_ingest.file_sha256(path),
+            "text": " ".join(WORDS[(i + k) % len(WORDS)] for k in range(40)), "confidence": 0.9,
+            "detections": 40, "width": size[0], "height": size[1], "preprocess_ms": 0.0, "ocr_ms": 0.0,
+        })
+        paths.append(path)
+    conn.commit()
+    conn.close()
+    return store, paths
+
+
+_ATOM_SITE_HEADER = """loop_
+_atom_site.group_PDB
+_atom_site.id
+_atom_site.type_symbol
+_atom_site.label_atom_id
+_atom_site.label_alt_id
+_atom_site.label_comp_id
+_atom_site.label_asym_id
+_atom_site.label_seq_id
+_atom_site.pdbx_PDB_ins_code
+_atom_site.Cartn_x
+_atom_site.Cartn_y
+_atom_site.Cartn_z
+_atom_site.occupancy
+_atom_site.B_iso_or_equiv
+_atom_site.auth_seq_id
+_atom_site.auth_comp_id
+_atom_site.auth_asym_id
+_atom_site.auth_atom_id
+_atom_site.pdbx_PDB_model_num"""
+_BACKBONE = (("N", "N", (-1.2, 0.6, -0.8)), ("CA", "C", (0.0, 0.0, 0.0)), ("C", "C", (1.3, 0.7, 0.6)),
+             ("O", "O", (1.5, 1.9, 0.5)), ("CB", "C", (-0.3, -1.5, 0.2)))
+_AMINO_ACIDS = ("ALA", "GLY", "LEU", "SER", "VAL", "GLU", "LYS", "ASP", "THR", "ILE")
+
+
+def make_structure_cif(pdb_id="1SYN", n_chains=2, residues_per_chain=150, seed=0):
+    """
+    mmCIF text for a synthetic complex: helical protein chains, a bound ligand
+    (ATP) between them, ions, a buffer molecule and waters.
+
+    Small enough to build per request, but large ones still exceed the 3D
+    Viewer's level-of-detail budget.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+
+    def add(group, element, atom, comp, chain, seq, xyz):
+        label_seq = seq if group == "ATOM" else "."
+        rows.append(f"{group} {len(rows) + 1} {element} {atom} . {comp} {chain} {label_seq} ? "
+                    f"{xyz[0]:.3f} {xyz[1]:.3f} {xyz[2]:.3f} 1.00 20.00 {seq} {comp} {chain} {atom} 1")
+
+    # Chains are alpha helices (1.5 Å rise, 100° per residue) on a ring around the origin
+    for c in range(n_chains):
+        chain = chr(ord("A") + c % 26) * (1 + c // 26)
+        angle = 2 * np.pi * c / n_chains
+        axis = np.array([np.cos(angle), np.sin(angle), 0.0]) * (9.0 if n_chains > 1 else 0.0)
+        for i in range(residues_per_chain):
+            theta = np.radians(100 * i)
+            ca = axis + (2.3 * np.cos(theta), 2.3 * np.sin(theta), 1.5 * i - 0.75 * residues_per_chain)
+            comp = _AMINO_ACIDS[int(rng.integers(len(_AMINO_ACIDS)))]
+            for atom, element, offset in _BACKBONE:
+                if atom == "CB" and comp == "GLY":
+                    continue
+                add("ATOM", element, atom, comp, chain, i + 1, ca + offset + rng.normal(0, 0.1, 3))
+
+    # Ligand in the groove between the first chains, buffer and ion further out, waters on the surface
+    ligand_center = np.array([4.5, 2.0, 0.0]) if n_chains > 1 else np.array([4.0, 0.0, 0.0])
+    for k, element in enumerate("NCCNCNCNCOCOCCOPOOOPOOOPOOO"):
+        add("HETATM", element, f"{element}{k + 1}", "ATP", "A", 900,
+            ligand_center + rng.normal(0, 1.4, 3))
+    for k, element in enumerate("CCCOOO"):
+        add("HETATM", element, f"{element}{k + 1}", "GOL", "A", 901, (14.0, 0.0, 5.0) + rng.normal(0, 0.8, 3))
+    add("HETATM", "ZN", "ZN", "ZN", "A", 902, (-12.0, 3.0, 2.0))
+    add("HETATM", "NA", "NA", "NA", "A", 903, (12.0, -6.0, -4.0))
+    for w in range(max(10, n_chains * residues_per_chain // 10)):
+        direction = rng.normal(0, 1, 3)
+        add("HETATM", "O", "O", "HOH", "A", 1000 + w, direction / np.linalg.norm(direction) * 16.0)
+
+    return f"data_{pdb_id}\n{_ATOM_SITE_HEADER}\n" + "\n".join(rows) + "\n#\n"
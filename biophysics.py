@@ -0,0 +1,245 @@
+"""
+Vectorized biophysics models for the NCBS Research hub.
+
+All model functions take NumPy arrays (or scalars) and broadcast, so a whole
+curve or a 2-D parameter grid is a single array expression. The curve builders
+are memoized per parameter set and return read-only arrays that can be shared
+safely between Streamlit sessions.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# =========================
+# DEFAULT PARAMETERS
+# =========================
+DEFAULT_R0_NM = 5.4         # Förster radius of the sensor pair
+DEFAULT_VISCOSITY = 0.5     # Kelvin-Voigt dashpot (arbitrary units)
+DEFAULT_AMPLITUDE = 1.0     # Final recoil distance (μm)
+
+
+# =========================
+# MODELS (ARRAY IN, ARRAY OUT)
+# =========================
+def fret_efficiency(distance_nm, r0_nm=DEFAULT_R0_NM):
+    """Förster equation E = 1 / (1 + (r / R0)^6)."""
+    distance_nm = np.asarray(distance_nm, dtype=float)
+    r0_nm = np.asarray(r0_nm, dtype=float)
+    return 1.0 / (1.0 + (distance_nm / r0_nm) ** 6)
+
+
+def recoil_tau(tension, viscosity=DEFAULT_VISCOSITY):
+    """Kelvin-Voigt retardation time tau = viscosity / tension."""
+    return np.asarray(viscosity, dtype=float) / np.asarray(tension, dtype=float)
+
+
+def kelvin_voigt_recoil(time_s, tension, viscosity=DEFAULT_VISCOSITY, amplitude=DEFAULT_AMPLITUDE):
+    """Recoil distance d(t) = A * (1 - exp(-t / tau)) after a laser cut."""
+    time_s = np.asarray(time_s, dtype=float)
+    return amplitude * -np.expm1(-time_s / recoil_tau(tension, viscosity))
+
+
+def recoil_velocity(tension, viscosity=DEFAULT_VISCOSITY, amplitude=DEFAULT_AMPLITUDE):
+    """Initial recoil velocity A / tau."""
+    return np.asarray(amplitude, dtype=float) / recoil_tau(tension, viscosity)
+
+
+# =========================
+# PARAMETER SWEEPS
+# =========================
+def fret_sweep(distances_nm, r0s_nm):
+    """Efficiency grid with shape (len(r0s_nm), len(distances_nm))."""
+    return fret_efficiency(np.asarray(distances_nm)[None, :], np.asarray(r0s_nm)[:, None])
+
+
+def recoil_sweep(time_s, tensions, viscosity=DEFAULT_VISCOSITY, amplitude=DEFAULT_AMPLITUDE):
+    """Recoil grid with shape (len(tensions), len(time_s))."""
+    return kelvin_voigt_recoil(np.asarray(time_s)[None, :], np.asarray(tensions)[:, None], viscosity, amplitude)
+
+
+# =========================
+# MEMOIZED CURVES
+# =========================
+def _frozen(*arrays):
+    for array in arrays:
+        array.setflags(write=False)
+    return arrays
+
+
+@lru_cache(maxsize=256)
+def fret_curve(r0_nm=DEFAULT_R0_NM, d_min=2.0, d_max=10.0, points=50):
+    """(distance, efficiency %) arrays for plotting."""
+    distances = np.linspace(d_min, d_max, points)
+    return _frozen(distances, fret_efficiency(distances, r0_nm) * 100)
+
+
+@lru_cache(maxsize=256)
+def recoil_curve(tension, viscosity=DEFAULT_VISCOSITY, amplitude=DEFAULT_AMPLITUDE, t_max=2.0, points=50):
+    """(time, recoil distance) arrays for plotting."""
+    times = np.linspace(0, t_max, points)
+    return _frozen(times, kelvin_voigt_recoil(times, tension, viscosity, amplitude))
+
+
+@lru_cache(maxsize=64)
+def recoil_grid(tensions, viscosity=DEFAULT_VISCOSITY, amplitude=DEFAULT_AMPLITUDE, t_max=2.0, points=50):
+    """(time, tensions, recoil grid) for a tuple of tensions."""
+    times = np.linspace(0, t_max, points)
+    tension_array = np.asarray(tensions, dtype=float)
+    return _frozen(times, tension_array, recoil_sweep(times, tension_array, viscosity, amplitude))
+
+
+# =========================
+# BATCH RECOIL FITTING
+# =========================
+FIT_RATE_GRID = 160          # candidate 1/tau values scanned before refinement
+FIT_REFINE_STEPS = 12
+FIT_CHUNK = 256              # curves per chunk, bounds the (curves x rates x points) scan
+FIT_MIN_POINTS = 2           # points after the cut (t > 0) needed to fit amplitude and rate
+
+
+def recoil_curves_from_frame(df):
+    """
+    Turn a recoil table into padded arrays (names, times, values, mask).
+
+    Accepts long format (`cut`, `time`, `recoil` columns) or wide format (a
+    `time` column plus one column per cut).
+    """
+    columns = {c.lower().strip(): c for c in df.columns}
+    time_col = columns.get("time") or columns.get("t") or columns.get("time_s")
+    if time_col is None:
+        raise ValueError("CSV needs a 'time' column.")
+    id_col = columns.get("cut") or columns.get("cut_id") or columns.get("id")
+    value_col = columns.get("recoil") or columns.get("distance") or columns.get("recoil_um")
+
+    if id_col is not None and value_col is not None:
+        long = df[[id_col, time_col, value_col]].dropna()
+        long = long.sort_values([id_col, time_col])
+        names = long[id_col].astype(str).unique()
+        codes = pd.Categorical(long[id_col].astype(str), categories=names).codes
+        # Position of each sample within its curve
+        positions = long.groupby(id_col, sort=False).cumcount().to_numpy()
+        shape = (len(names), int(positions.max()) + 1 if len(positions) else 0)
+        times = np.zeros(shape)
+        values = np.zeros(shape)
+        mask = np.zeros(shape, dtype=bool)
+        times[codes, positions] = long[time_col].to_numpy(dtype=float)
+        values[codes, positions] = long[value_col].to_numpy(dtype=float)
+        mask[codes, positions] = True
+    else:
+        curve_cols = [c for c in df.columns if c != time_col]
+        names = np.asarray([str(c) for c in curve_cols])
+        values = df[curve_cols].to_numpy(dtype=float).T
+        times = np.broadcast_to(df[time_col].to_numpy(dtype=float), values.shape).copy()
+        mask = ~np.isnan(values) & ~np.isnan(times)
+        values = np.where(mask, values, 0.0)
+        times = np.where(mask, times, 0.0)
+    return names, times, values, mask
+
+
+def _fit_chunk(times, values, mask):
+    n_points = mask.sum(axis=1)
+    dt = np.diff(np.sort(np.where(mask, times, np.nan), axis=1), axis=1)
+    t_span = np.where(mask, times, 0).max()
+    positive_dt = dt[dt > 0]
+    dt_min = positive_dt.min() if positive_dt.size else t_span
+    rates = np.logspace(np.log10(0.05 / t_span), np.log10(20 / dt_min), FIT_RATE_GRID)
+
+    # Coarse scan: for a fixed rate the best amplitude is linear least squares
+    basis = -np.expm1(-rates[None, :, None] * times[:, None, :]) * mask[:, None, :]
+    fy = np.einsum("nkm,nm->nk", basis, values)
+    ff = np.einsum("nkm,nkm->nk", basis, basis)
+    sse = np.sum(values ** 2, axis=1)[:, None] - fy ** 2 / np.maximum(ff, 1e-300)
+    best = np.argmin(sse, axis=1)
+    log_k = np.log(rates[best])
+    amp = fy[np.arange(len(best)), best] / np.maximum(ff[np.arange(len(best)), best], 1e-300)
+
+    # Gauss-Newton refinement of (amplitude, log rate) for all curves at once
+    for _ in range(FIT_REFINE_STEPS):
+        k = np.exp(log_k)[:, None]
+        decay = np.exp(-k * times)
+        f = (1 - decay) * mask
+        resid = (values - amp[:, None] * f) * mask
+        j_amp = f
+        j_logk = amp[:, None] * times * decay * k * mask
+        a11 = np.sum(j_amp * j_amp, axis=1) + 1e-12
+        a12 = np.sum(j_amp * j_logk, axis=1)
+        a22 = np.sum(j_logk * j_logk, axis=1) + 1e-12
+        b1 = np.sum(j_amp * resid, axis=1)
+        b2 = np.sum(j_logk * resid, axis=1)
+        det = a11 * a22 - a12 ** 2
+        ok = np.abs(det) > 1e-18
+        step_amp = np.where(ok, (a22 * b1 - a12 * b2) / np.where(ok, det, 1), 0)
+        step_logk = np.where(ok, (a11 * b2 - a12 * b1) / np.where(ok, det, 1), 0)
+        amp = amp + step_amp
+        log_k = log_k + np.clip(step_logk, -1, 1)
+
+    k = np.exp(log_k)
+    fitted = amp[:, None] * -np.expm1(-k[:, None] * times)
+    resid = (values - fitted) * mask
+    sse = np.sum(resid ** 2, axis=1)
+    means = np.sum(values * mask, axis=1) / np.maximum(n_points, 1)
+    sst = np.sum(((values - means[:, None]) * mask) ** 2, axis=1)
+    return {
+        "tau": 1 / k,
+        "amplitude": amp,
+        "initial_velocity": amp * k,
+        "r_squared": np.where(sst > 0, 1 - sse / np.where(sst > 0, sst, 1), np.nan),
+        "rmse": np.sqrt(sse / np.maximum(n_points, 1)),
+        "n_points": n_points,
+    }
+
+
+def fit_kelvin_voigt_batch(times, values, mask=None):
+    """
+    Least-squares fit of d(t) = A * (1 - exp(-t / tau)) to many curves at once.
+
+    `times`/`values` are (n_curves, n_points) arrays (padded where `mask` is
+    False). Pre-cut samples (t < 0) are ignored. Returns a dict of per-curve
+    arrays: tau, amplitude, initial_velocity (A / tau), r_squared, rmse,
+    n_points and `fitted`, which is False (with NaN fit values) for curves with
+    fewer than FIT_MIN_POINTS samples after the cut.
+    """
+    times = np.asarray(times, dtype=float)
+    values = np.asarray(values, dtype=float)
+    mask = np.ones(values.shape, dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+    # The model starts at the cut; earlier samples would drag tau to nonsense
+    mask = mask & (times >= 0)
+    fitted = (mask & (times > 0)).sum(axis=1) >= FIT_MIN_POINTS
+
+    results = {key: np.full(len(values), np.nan)
+               for key in ("tau", "amplitude", "initial_velocity", "r_squared", "rmse")}
+    rows = np.flatnonzero(fitted)
+    for start in range(0, len(rows), FIT_CHUNK):
+        idx = rows[start:start + FIT_CHUNK]
+        chunk = _fit_chunk(times[idx], values[idx], mask[idx])
+        for key, column in results.items():
+            column[idx] = chunk[key]
+    results["n_points"] = mask.sum(axis=1)
+    results["fitted"] = fitted
+    return results
+
+
+RECOIL_FIT_COLUMNS = ["Cut", "Tau (s)", "Initial Velocity (μm/s)", "Amplitude (μm)", "R²", "RMSE (μm)", "Points",
+                      "Fitted"]
+
+
+def fit_recoil_table(df):
+    """Fit every curve in a recoil CSV table and return one result row per cut (none if nothing is valid)."""
+    names, times, values, mask = recoil_curves_from_frame(df)
+    # Cuts without a single valid (time, recoil) point cannot be fitted
+    valid = mask.any(axis=1)
+    if not valid.any():
+        return pd.DataFrame(columns=RECOIL_FIT_COLUMNS)
+    names, times, values, mask = names[valid], times[valid], values[valid], mask[valid]
+    fits = fit_kelvin_voigt_batch(times, values, mask)
+    return pd.DataFrame({
+        "Cut": names,
+        "Tau (s)": fits["tau"],
+        "Initial Velocity (μm/s)": fits["initial_velocity"],
+        "Amplitude (μm)": fits["amplitude"],
+        "R²": fits["r_squared"],
+        "RMSE (μm)": fits["rmse"],
+        "Points": fits["n_points"],
+        "Fitted": fits["fitted"],
+    })
@@ -0,0 +1,283 @@
+"""
+Shared cache backend used by every app replica.
+
+`st.cache_data` / `st.cache_resource` only live inside one process, so each
+replica used to redo OCR, CSV parsing and external lookups. Values cached
+here go to a backend that all replicas can reach:
+
+* SQLite file (default, `.cache/app_cache.sqlite`) for replicas on one host
+* Redis (`BIO_CACHE_URL=redis://host:6379/0`) for replicas on several hosts
+
+The Redis backend accepts any client with redis-py's `get`/`set`/`delete`
+methods, so a local stand-in can be injected in tests.
+
+Values are pickled, and unpickling runs code, so anyone who can write to the
+backend can run code in the app. Keep the SQLite file private to the app user
+and Redis on a trusted network. Setting BIO_CACHE_SECRET signs every value
+with HMAC-SHA256; entries with a missing or wrong signature are ignored. A
+Redis backend is refused without a secret.
+
+If the configured backend cannot be created or reached, a warning is logged
+and the process falls back to an in-memory cache instead of failing.
+"""
+import functools
+import hashlib
+import hmac
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# CONFIGURATION
+# =========================
+CACHE_URL = os.environ.get("BIO_CACHE_URL", "sqlite:///" + os.path.join(".cache", "app_cache.sqlite"))
+KEY_PREFIX = "bioverify:"
+CACHE_SECRET = os.environ.get("BIO_CACHE_SECRET", "").encode("utf-8")
+
+
+# =========================
+# BACKENDS
+# =========================
+class SQLiteCache:
+    """Pickled values in a WAL-mode SQLite file, safe for several processes."""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)   # private: values are unpickled
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+            conn.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared across threads (Streamlit runs one per session)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return row[0]
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires = now + ttl if ttl else None
+        with self._conn() as conn:
+            # Expired rows are never read again; drop them so the file does not grow without bound
+            conn.execute("DELETE FROM cache WHERE expires < ?", (now,))
+            conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)", (key, value, expires))
+
+    def delete(self, key):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM cache")
+
+
+class RedisCache:
+    """Wraps a redis-py compatible client."""
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url):
+        import redis  # optional dependency, only needed for multi-host deployments
+        client = redis.Redis.from_url(url)
+        client.ping()   # fail here, not on every lookup, when the server is unreachable
+        return cls(client)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{KEY_PREFIX}*"):
+            self.client.delete(key)
+
+
+class MemoryCache:
+    """Process-local dict, the fallback when the configured backend is unusable."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value, expires = self._data.get(key, (None, None))
+            if expires is not None and expires < time.time():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def backend_from_url(url, secret=None):
+    secret = CACHE_SECRET if secret is None else secret
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        # Anyone who can write to a shared server could plant a pickle that runs code here
+        if not secret:
+            raise ValueError("A Redis cache requires BIO_CACHE_SECRET to sign entries")
+        return RedisCache.from_url(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteCache(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported cache URL: {url}")
+
+
+# =========================
+# SERIALIZATION
+# =========================
+_DIGEST_SIZE = hashlib.sha256().digest_size
+
+
+def dumps(value, secret=None):
+    """Pickle `value`, prefixed with its HMAC-SHA256 when a secret is configured."""
+    secret = CACHE_SECRET if secret is None else secret
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if secret:
+        return hmac.new(secret, data, hashlib.sha256).digest() + data
+    return data
+
+
+def loads(raw, secret=None):
+    """Inverse of dumps(); refuses to unpickle a value whose signature does not match."""
+    secret = CACHE_SECRET if secret is None else secret
+    if secret:
+        mac, data = raw[:_DIGEST_SIZE], raw[_DIGEST_SIZE:]
+        if not hmac.compare_digest(mac, hmac.new(secret, data, hashlib.sha256).digest()):
+            raise ValueError("shared cache entry has a bad signature")
+        raw = data
+    return pickle.loads(raw)
+
+
+# =========================
+# SHARED CACHE + STATS
+# =========================
+class SharedCache:
+    """Namespaced get-or-compute cache with per-namespace hit/miss counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0, "errors": 0})
+        self._lock = threading.Lock()
+
+    def _count(self, namespace, field):
+        with self._lock:
+            self._stats[namespace][field] += 1
+
+    @staticmethod
+    def make_key(namespace, *parts):
+        digest = hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}{namespace}:{digest}"
+
+    def get_or_compute(self, namespace, parts, compute, ttl=None):
+        key = self.make_key(namespace, *parts)
+        start = time.perf_counter()
+        try:
+            raw = self.backend.get(key)
+        except Exception:
+            # A down backend must never take the app with it: treat as a miss
+            self._count(namespace, "errors")
+            raw = None
+        if raw is not None:
+            try:
+                value = loads(raw)
+            except Exception:
+                # Unsigned, tampered or stale-format entry: recompute and overwrite it
+                self._count(namespace, "errors")
+            else:
+                self._count(namespace, "hits")
+                metrics.observe_cache_lookup(namespace, "hit", time.perf_counter() - start)
+                return value
+
+        self._count(namespace, "misses")
+        metrics.observe_cache_lookup(namespace, "miss", time.perf_counter() - start)
+        value = compute()
+        try:
+            self.backend.set(key, dumps(value), ttl)
+        except Exception:
+            self._count(namespace, "errors")
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {ns: dict(counts) for ns, counts in self._stats.items()}
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Process-wide SharedCache for BIO_CACHE_URL, created on first use. Falls back
+    to an in-memory cache (with a logged warning) if that backend is unusable.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            try:
+                backend = backend_from_url(CACHE_URL)
+            except Exception as e:
+                logger.warning("Shared cache %s unavailable (%s); using an in-process cache", CACHE_URL, e)
+                backend = MemoryCache()
+            _shared = SharedCache(backend)
+        return _shared
+
+
+def set_backend(backend):
+    """Swap the backend (e.g. for a local Redis stand-in in tests)."""
+    global _shared
+    with _shared_lock:
+        _shared = SharedCache(backend)
+    return _shared
+
+
+def cached(namespace, ttl=None):
+    """
+    Decorator memoizing a function's result in the shared cache.
+
+    Arguments must have a stable repr(); exceptions are not cached.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            parts = (func.__module__, func.__qualname__, args, sorted(kwargs.items()))
+            return get_cache().get_or_compute(namespace, parts, lambda: func(*args, **kwargs), ttl)
+        return wrapper
+    return decorator
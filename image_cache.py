@@ -0,0 +1,82 @@
+"""
+Resized-image cache for diagrams shown in the Reader and Search tabs.
+
+Each diagram is resized once per width bucket and re-encoded as WebP. Files
+are keyed on the source file's hash, so an edited diagram gets new
+derivatives automatically. Pages then send the smallest adequate file
+instead of the full-size original.
+"""
+import hashlib
+import os
+import tempfile
+from functools import lru_cache
+
+from PIL import Image, ImageOps
+
+# =========================
+# CONFIGURATION
+# =========================
+CACHE_DIR = os.environ.get("BIO_IMAGE_CACHE", os.path.join(".cache", "images"))
+WIDTH_BUCKETS = (320, 640, 1024, 1600)
+WEBP_QUALITY = 80
+
+
+@lru_cache(maxsize=1024)
+def _file_hash(path, mtime, size):
+    # mtime/size are part of the cache key so edited files are re-hashed
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def file_hash(path):
+    stat = os.stat(path)
+    return _file_hash(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def pick_bucket(width):
+    """Smallest bucket at least `width` px wide (the largest bucket otherwise)."""
+    for bucket in WIDTH_BUCKETS:
+        if bucket >= width:
+            return bucket
+    return WIDTH_BUCKETS[-1]
+
+
+def derivative_path(path, bucket, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, f"{file_hash(path)}_{bucket}.webp")
+
+
+def resized_image(path, width, cache_dir=None):
+    """
+    Path to a WebP copy of `path` no wider than the bucket for `width`.
+
+    The derivative is generated on first use; images are never upscaled. Falls
+    back to the original file if it cannot be converted.
+    """
+    bucket = pick_bucket(width)
+    target = derivative_path(path, bucket, cache_dir)
+    if os.path.exists(target):
+        return target
+    try:
+        with Image.open(path) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.width > bucket:
+                height = round(image.height * bucket / image.width)
+                image = image.resize((bucket, height), Image.LANCZOS)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Write to a unique temp file first so other sessions (threads too) never read a partial file
+            fd, tmp_target = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(target))
+            try:
+                with os.fdopen(fd, "wb") as handle:
+                    image.save(handle, "WEBP", quality=WEBP_QUALITY, method=4)
+                os.replace(tmp_target, target)
+            except BaseException:
+                os.remove(tmp_target)
+                raise
+        return target
+    except Exception:
+        return path
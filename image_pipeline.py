@@ -0,0 +1,307 @@
+"""
+Tiled image-analysis pipeline for large (multi-page) TIFF stacks.
+
+Stacks are memory-mapped (or read one page at a time when the TIFF is
+compressed), split into overlapping tiles and processed on a process pool:
+Otsu thresholding, Canny edges and regionprops per tile. Only per-region
+measurements travel back to the caller, so the analysis never loads a whole
+stack into RAM, and progress is reported from the real work.
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+import cv2
+import numpy as np
+import pandas as pd
+import tifffile
+from skimage.filters import threshold_otsu
+from skimage.measure import label, regionprops_table
+
+# =========================
+# CONFIGURATION
+# =========================
+TILE_SIZE = 1024
+TILE_HALO = 32              # px overlap so cells on tile borders are measured whole
+MIN_CELL_AREA = 20          # px, smaller objects are treated as noise
+SAMPLE_STRIDE = 8           # px stride for the global intensity sample
+MAX_SAMPLE_PAGES = 16
+CANNY_LOW, CANNY_HIGH = 50, 150
+DEFAULT_WORKERS = int(os.environ.get("BIO_IMAGE_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+DATA_DIR = os.environ.get("BIO_IMAGE_DATA_DIR", "")     # server-side stacks; unset disables path input
+UPLOAD_DIR = os.environ.get("BIO_IMAGE_UPLOADS", os.path.join(tempfile.gettempdir(), "bio_tiff_uploads"))
+UPLOAD_TTL = float(os.environ.get("BIO_UPLOAD_TTL", 6 * 3600))   # s an untouched upload copy is kept
+THRESHOLD_MODES = {
+    "tile": "Per-tile Otsu",        # follows uneven illumination across the field
+    "global": "Stack-wide Otsu",
+}
+
+
+# =========================
+# STACK ACCESS
+# =========================
+@lru_cache(maxsize=4)
+def _open_stack(path):
+    """Return an array-like of shape (pages, height, width[, samples])."""
+    with tifffile.TiffFile(path) as tif:
+        series = tif.series[0]
+        shape, axes = series.shape, series.axes
+    try:
+        data = tifffile.memmap(path, mode="r")
+    except ValueError:
+        # Compressed or non-contiguous TIFF: fall back to reading single pages on demand
+        data = _PageReader(path)
+    if isinstance(data, np.ndarray):
+        has_samples = axes.endswith("S") and shape[-1] in (3, 4)
+        plane_ndim = 3 if has_samples else 2
+        # Collapse time/z/channel axes into one page axis
+        data = data.reshape((-1,) + data.shape[-plane_ndim:])
+    return data
+
+
+class _PageReader:
+    """Minimal page-indexed view over a TIFF that cannot be memory-mapped."""
+
+    def __init__(self, path):
+        self.path = path
+        with tifffile.TiffFile(path) as tif:
+            self.n_pages = len(tif.pages)
+            page_shape = tif.pages[0].shape
+            self.planar = tif.pages[0].axes.startswith("S")
+        # Separate-plane samples are served interleaved, like a memory-mapped RGB page
+        self.page_shape = page_shape[1:] + page_shape[:1] if self.planar else page_shape
+        self.ndim = 1 + len(self.page_shape)
+        self.shape = (self.n_pages,) + tuple(self.page_shape)
+
+    def __len__(self):
+        return self.n_pages
+
+    def __getitem__(self, index):
+        page, *rest = index if isinstance(index, tuple) else (index,)
+        plane = _read_page(self.path, page)
+        if self.planar:
+            plane = np.moveaxis(plane, 0, -1)
+        return plane[tuple(rest)] if rest else plane
+
+
+@lru_cache(maxsize=2)
+def _read_page(path, page):
+    return tifffile.imread(path, key=page)
+
+
+def stack_info(path):
+    stack = _open_stack(path)
+    return {"pages": stack.shape[0], "height": stack.shape[1], "width": stack.shape[2],
+            "dtype": str(_read_plane_region(stack, 0, slice(0, 1), slice(0, 1)).dtype)}
+
+
+def _read_plane_region(stack, page, rows, cols):
+    region = np.asarray(stack[page, rows, cols])
+    if region.ndim == 3:
+        # RGB(A) samples: analyze luminance
+        region = region[..., :3].mean(axis=-1)
+    return region
+
+
+# =========================
+# TILING
+# =========================
+def iter_tiles(n_pages, height, width, tile_size=TILE_SIZE):
+    """(page, row0, col0, row1, col1) tile cores covering the stack."""
+    for page in range(n_pages):
+        for r0 in range(0, height, tile_size):
+            for c0 in range(0, width, tile_size):
+                yield page, r0, c0, min(r0 + tile_size, height), min(c0 + tile_size, width)
+
+
+def global_statistics(path):
+    """Otsu threshold and intensity range from a strided sample of the stack."""
+    stack = _open_stack(path)
+    n_pages = stack.shape[0]
+    pages = np.unique(np.linspace(0, n_pages - 1, min(n_pages, MAX_SAMPLE_PAGES)).astype(int))
+    sample = np.concatenate([
+        _read_plane_region(stack, p, slice(None, None, SAMPLE_STRIDE), slice(None, None, SAMPLE_STRIDE)).ravel()
+        for p in pages
+    ]).astype(np.float64)
+    lo, hi = np.percentile(sample, [0.5, 99.99])
+    threshold = threshold_otsu(sample) if sample.min() < sample.max() else float(sample.max())
+    return {"threshold": float(threshold), "low": float(lo), "high": float(max(hi, lo + 1))}
+
+
+# =========================
+# PER-TILE WORK
+# =========================
+def analyze_tile(path, tile, stats, threshold_mode="tile"):
+    """Threshold, edges and region measurements for one tile (runs in a worker)."""
+    page, r0, c0, r1, c1 = tile
+    stack = _open_stack(path)
+    height, width = stack.shape[1], stack.shape[2]
+    hr0, hc0 = max(r0 - TILE_HALO, 0), max(c0 - TILE_HALO, 0)
+    hr1, hc1 = min(r1 + TILE_HALO, height), min(c1 + TILE_HALO, width)
+    image = _read_plane_region(stack, page, slice(hr0, hr1), slice(hc0, hc1)).astype(np.float32)
+
+    threshold = stats["threshold"]
+    if threshold_mode == "tile" and image.min() < image.max():
+        # Local Otsu, but never below the stack-wide level so empty tiles stay empty
+        threshold = max(float(threshold_otsu(image)), threshold)
+    mask = image > threshold
+
+    scaled = np.clip((image - stats["low"]) / (stats["high"] - stats["low"]) * 255, 0, 255).astype(np.uint8)
+    edges = cv2.Canny(scaled, CANNY_LOW, CANNY_HIGH)
+    core = (slice(r0 - hr0, r1 - hr0), slice(c0 - hc0, c1 - hc0))
+
+    regions = regionprops_table(label(mask), intensity_image=image,
+                                properties=("area", "intensity_mean", "centroid"))
+    regions = pd.DataFrame(regions).rename(columns={
+        "intensity_mean": "mean_intensity", "centroid-0": "row", "centroid-1": "col"})
+    regions = regions[regions["area"] >= MIN_CELL_AREA]
+    regions["row"] += hr0
+    regions["col"] += hc0
+    # A cell belongs to the tile whose core contains its centroid
+    in_core = (regions["row"] >= r0) & (regions["row"] < r1) & (regions["col"] >= c0) & (regions["col"] < c1)
+    regions = regions[in_core]
+    regions.insert(0, "page", page)
+
+    return {
+        "regions": regions,
+        "pixels": (r1 - r0) * (c1 - c0),
+        "foreground": int(mask[core].sum()),
+        "edges": int(np.count_nonzero(edges[core])),
+    }
+
+
+# =========================
+# PIPELINE
+# =========================
+def analyze_stack(path, workers=None, threshold_mode="tile", tile_size=TILE_SIZE, progress=None):
+    """
+    Run the tiled pipeline over a TIFF file on disk.
+
+    `threshold_mode` is a THRESHOLD_MODES key. `progress(done, total)` is
+    called as tiles finish. Returns a dict with a summary and a DataFrame of
+    per-cell measurements.
+    """
+    if threshold_mode not in THRESHOLD_MODES:
+        raise ValueError(f"Unknown threshold mode: {threshold_mode}")
+    info = stack_info(path)
+    stats = global_statistics(path)
+    tiles = list(iter_tiles(info["pages"], info["height"], info["width"], tile_size))
+    workers = workers or DEFAULT_WORKERS
+
+    results = []
+    if workers <= 1 or len(tiles) == 1:
+        for done, tile in enumerate(tiles, start=1):
+            results.append(analyze_tile(path, tile, stats, threshold_mode))
+            if progress:
+                progress(done, len(tiles))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(analyze_tile, path, tile, stats, threshold_mode) for tile in tiles]
+            for done, future in enumerate(as_completed(futures), start=1):
+                results.append(future.result())
+                if progress:
+                    progress(done, len(tiles))
+
+    cells = pd.concat([r["regions"] for r in results], ignore_index=True)
+    cells = cells.sort_values(["page", "row", "col"], ignore_index=True)
+    pixels = sum(r["pixels"] for r in results)
+    summary = {
+        "Pages": info["pages"],
+        "Image_Size": f"{info['width']} x {info['height']}",
+        "Tiles": len(tiles),
+        "Threshold_Mode": THRESHOLD_MODES[threshold_mode],
+        "Otsu_Threshold": round(stats["threshold"], 2),   # stack-wide level (floor for per-tile levels)
+        "Cell_Count": int(len(cells)),
+        "Mean_Cell_Area_px": round(float(cells["area"].mean()), 1) if len(cells) else 0.0,
+        "Mean_Intensity": round(float(cells["mean_intensity"].mean()), 2) if len(cells) else 0.0,
+        "Foreground_Fraction": round(sum(r["foreground"] for r in results) / pixels, 4),
+        "Edge_Density": round(sum(r["edges"] for r in results) / pixels, 4),
+    }
+    return {"summary": summary, "cells": cells}
+
+
+# =========================
+# QUICK PREVIEWS
+# =========================
+def preview_plane(path, max_side=768):
+    """Downsampled first plane (float32) for the quick single-tool previews."""
+    stack = _open_stack(path)
+    step = max(1, int(np.ceil(max(stack.shape[1], stack.shape[2]) / max_side)))
+    return _read_plane_region(stack, 0, slice(None, None, step), slice(None, None, step)).astype(np.float32)
+
+
+def preview_edges(path):
+    """Canny edge map of the downsampled first plane."""
+    stats = global_statistics(path)
+    plane = preview_plane(path)
+    scaled = np.clip((plane - stats["low"]) / (stats["high"] - stats["low"]) * 255, 0, 255).astype(np.uint8)
+    return cv2.Canny(scaled, CANNY_LOW, CANNY_HIGH)
+
+
+def preview_regions(path):
+    """Full-resolution region measurements for the first tile of the first plane."""
+    info = stack_info(path)
+    first_tile = next(iter_tiles(1, info["height"], info["width"]))
+    return analyze_tile(path, first_tile, global_statistics(path))["regions"]
+
+
+def save_upload(uploaded_file, directory=UPLOAD_DIR, chunk_size=16 * 1024 * 1024):
+    """
+    Copy an upload to disk so the analysis can memory-map it.
+
+    Streamlit itself still holds the upload in memory for the session; the
+    copy only keeps the tiled analysis from loading the stack a second time.
+    """
+    os.makedirs(directory, exist_ok=True)
+    prune_uploads(directory)
+    # Prefix with the upload id so a re-upload never reuses a stale memory map
+    prefix = getattr(uploaded_file, "file_id", "upload")
+    path = os.path.join(directory, f"{prefix}_{os.path.basename(uploaded_file.name)}")
+    if os.path.exists(path) and os.path.getsize(path) == uploaded_file.size:
+        os.utime(path)   # still in use: keep it out of prune_uploads
+        return path
+    uploaded_file.seek(0)
+    with open(path, "wb") as handle:
+        while True:
+            chunk = uploaded_file.read(chunk_size)
+            if not chunk:
+                break
+            handle.write(chunk)
+    return path
+
+
+def discard_upload(path):
+    """Delete an upload copy (replaced or removed by its session)."""
+    _open_stack.cache_clear()   # drop memory maps so the disk space is released
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def prune_uploads(directory=UPLOAD_DIR, max_age=UPLOAD_TTL):
+    """Delete upload copies untouched for `max_age` seconds, left by sessions that ended or expired."""
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def resolve_data_path(path, root=DATA_DIR):
+    """Real path of a file inside the server data directory, or None for anything outside it."""
+    if not root or not path:
+        return None
+    root = os.path.realpath(root)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root or not os.path.isfile(full):
+        return None
+    return full
@@ -0,0 +1,414 @@
+"""
+Knowledge-base helpers shared by the Reader, Search and Research Report.
+
+Kept free of Streamlit so the same code paths can be benchmarked and reused
+by command-line tools.
+"""
+import bisect
+import hashlib
+import re
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from indic_transliteration import sanscript
+
+# =========================
+# LOADING
+# =========================
+KB_COLUMNS = ["Topic", "Section", "Explanation", "Image", "Ten_Points", "Detailed_Explanation"]
+
+
+def load_csv(file):
+    df = pd.read_csv(file)
+    df.columns = df.columns.str.strip()
+    df = df.dropna(how='all')
+    return df
+
+
+def content_key(df):
+    """Stable hash of a KB's columns and cells, for caching things derived from it."""
+    digest = hashlib.sha256("|".join(map(str, df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+# =========================
+# SEARCH
+# =========================
+def _lower_column(df, column):
+    if column not in df.columns:
+        return pd.Series([""] * len(df), index=df.index)
+    return df[column].fillna("").astype(str).str.lower()
+
+
+def search(df, query, ocr_text=None, script_index=None):
+    """
+    Substring search over Topic/Explanation and (optionally) diagram OCR text.
+
+    `ocr_text(img_path)` returns the lower-cased OCR text of a diagram. With a
+    `script_index` (build_script_index), Devanagari queries, and Romanized ones
+    with no substring match, also match their transliterations. Returns a list
+    of (position, row, txt_match, ocr_match) for every matching row.
+    """
+    query_lower = query.lower()
+    txt_match = (
+        _lower_column(df, "Topic").str.contains(query_lower, regex=False)
+        | _lower_column(df, "Explanation").str.contains(query_lower, regex=False)
+    ).to_numpy()
+    # Phonetic matches are looser than substring ones, so they only answer Devanagari queries
+    # and queries the substring search finds nothing for
+    if script_index is not None and len(script_index.keys) and (
+            _DEVANAGARI_RE.search(query) or not txt_match.any()):
+        txt_match = txt_match.copy()
+        txt_match[script_index.match(query)] = True
+
+    # fillna first: pandas' string dtype keeps missing values as NaN through astype(str)
+    images = df["Image"].fillna("").astype(str).to_numpy() if "Image" in df.columns else [""] * len(df)
+    hits = []
+    for pos, img_path in enumerate(images):
+        ocr_match = False
+        if ocr_text is not None and img_path and img_path != 'nan':
+            ocr_match = query_lower in ocr_text(img_path).lower()
+        if txt_match[pos] or ocr_match:
+            hits.append((pos, df.iloc[pos], bool(txt_match[pos]), ocr_match))
+    return hits
+
+
+# =========================
+# CROSS-SCRIPT INDEX
+# =========================
+# Every token, Devanagari or Roman, is reduced to one Roman "phonetic key". So
+# प्रोटीन / proTIna / proṭīna / protein share postings, and queries never call a
+# translator at runtime.
+SCRIPT_INDEX_COLUMNS = ["Topic", "Explanation"]   # the columns search() scans
+TRANSLATED_SUFFIX = "_Hindi"     # pre-translated columns, e.g. Topic_Hindi (see translate_columns)
+MIN_PREFIX_LENGTH = 3            # shorter query keys must match a whole token
+
+_WORD_RE = re.compile(r"[\w\u0900-\u097F]+")
+_DEVANAGARI_RE = re.compile(r"[\u0900-\u097F]")
+_DEVANAGARI_CONSONANT_RE = re.compile(r"[\u0915-\u0939\u0958-\u095F]$")
+# English spellings -> the way Hindi writes the sound (transformation -> ट्रांसफॉर्मेशन)
+_SPELLING_RULES = [
+    (re.compile(p), r) for p, r in [
+        (r"tion", "shan"), (r"sion", "shan"), (r"ph", "f"), (r"ck", "k"), (r"chr", "kr"),
+        (r"ch", "c"), (r"x", "ks"), (r"q", "k"), (r"c(?=[eiy])", "s"), (r"c", "k"),
+        (r"ee", "i"), (r"oo", "u"), (r"w", "v"), (r"z", "j"),
+        (r"([bcdgjklmnprtvy])h", r"\1"),     # aspirates: students drop or add the h (not sh)
+        (r"(.)\1+", r"\1"),                 # doubled letters / geminates
+    ]
+]
+
+
+def _devanagari_to_roman(token):
+    # candra o (ॉ / ऑ, English loanwords) -> o
+    token = token.replace("\u0949", "\u094B").replace("\u0911", "\u0913")
+    if _DEVANAGARI_CONSONANT_RE.search(token):
+        token += "\u094D"                       # Hindi drops the final inherent 'a'
+    return sanscript.transliterate(token, sanscript.DEVANAGARI, sanscript.IAST)
+
+
+def phonetic_keys(tokens):
+    """
+    Script-independent keys for a Series of tokens: Devanagari via IAST, then
+    diacritics, case and spelling variants folded.
+    """
+    # object dtype keeps Python `re` semantics (lookahead, backreferences); Arrow strings use RE2
+    tokens = tokens.astype(object)
+    devanagari = tokens.str.contains(_DEVANAGARI_RE)
+    if devanagari.any():
+        tokens = tokens.where(~devanagari, tokens[devanagari].map(_devanagari_to_roman))
+    tokens = tokens.str.replace("[\u1e41\u1e43]", "n", regex=True)   # anusvara (ṃ/ṁ) sounds as n
+    tokens = tokens.str.replace("[\u015b\u1e63]", "sh", regex=True)  # श/ष (ś/ṣ) as English writes them
+    tokens = tokens.str.normalize("NFKD").str.lower().str.replace(r"[^a-z0-9]", "", regex=True)
+    for pattern, replacement in _SPELLING_RULES:
+        tokens = tokens.str.replace(pattern, replacement, regex=True)
+    return tokens
+
+
+def phonetic_key(token):
+    return phonetic_keys(pd.Series([token], dtype=object)).iloc[0]
+
+
+def phonetic_skeletons(keys):
+    """Consonant outlines of keys (vowels and y dropped, s/z/j merged), used when keys differ."""
+    return keys.str[:1] + keys.str[1:].str.replace(r"[aeiouy]", "", regex=True).str.replace("j", "s")
+
+
+def _prefix_range(sorted_keys, key):
+    """Slice of `sorted_keys` starting with `key` (whole-key match only for short keys)."""
+    lo = bisect.bisect_left(sorted_keys, key)
+    if len(key) < MIN_PREFIX_LENGTH:
+        return lo, lo + int(lo < len(sorted_keys) and sorted_keys[lo] == key)
+    return lo, bisect.bisect_left(sorted_keys, key + "\x7f")
+
+
+@dataclass
+class ScriptIndex:
+    keys: list            # sorted phonetic keys
+    key_rows: list        # row positions (np.ndarray) per key
+    skeletons: list       # sorted consonant skeletons
+    skeleton_rows: list   # row positions per skeleton
+
+    def match(self, query):
+        """Row positions matching every query word, by key prefix or else by skeleton prefix."""
+        words = pd.Series(_WORD_RE.findall(query), dtype=object)
+        if words.empty:
+            return np.zeros(0, dtype=np.int64)
+        keys = phonetic_keys(words)
+        keys = keys[keys != ""]
+        rows = None
+        for key, skeleton in zip(keys, phonetic_skeletons(keys)):
+            lo, hi = _prefix_range(self.keys, key)
+            postings = self.key_rows[lo:hi]
+            if not postings and len(skeleton) >= MIN_PREFIX_LENGTH:   # 2-letter outlines match too much
+                lo, hi = _prefix_range(self.skeletons, skeleton)
+                postings = self.skeleton_rows[lo:hi]
+            if not postings:
+                return np.zeros(0, dtype=np.int64)
+            found = np.unique(np.concatenate(postings))
+            rows = found if rows is None else np.intersect1d(rows, found)
+        return np.zeros(0, dtype=np.int64) if rows is None else rows
+
+
+def _script_columns(df):
+    return [c for c in df.columns if c in SCRIPT_INDEX_COLUMNS or str(c).endswith(TRANSLATED_SUFFIX)]
+
+
+def build_script_index(df):
+    """Postings from phonetic keys (and skeletons) to KB rows, over text and *_Hindi columns."""
+    columns = _script_columns(df)
+    if not columns:
+        return ScriptIndex([], [], [], [])
+    text = df[columns[0]].fillna("").astype(str)
+    for column in columns[1:]:
+        text = text + " " + df[column].fillna("").astype(str)
+    text.index = np.arange(len(df))
+    tokens = text.str.findall(_WORD_RE).explode().dropna()
+    pairs = pd.DataFrame({"row": tokens.index.to_numpy(), "token": tokens.to_numpy()})
+    pairs = pairs.drop_duplicates()
+    # Transliterate each distinct token once
+    unique_tokens = pd.Series(pairs["token"].unique(), dtype=object)
+    pairs["key"] = pairs["token"].map(dict(zip(unique_tokens, phonetic_keys(unique_tokens))))
+    pairs = pairs[pairs["key"] != ""].drop_duplicates(["row", "key"])
+    unique_keys = pd.Series(pairs["key"].unique(), dtype=object)
+    pairs["skeleton"] = pairs["key"].map(dict(zip(unique_keys, phonetic_skeletons(unique_keys))))
+
+    rows = pairs["row"].to_numpy()
+    return ScriptIndex(*_postings(pairs["key"], rows), *_postings(pairs["skeleton"], rows))
+
+
+def _postings(labels, rows):
+    """(sorted distinct labels, sorted unique rows per label) without a per-group apply."""
+    codes, uniques = pd.factorize(labels, sort=True)
+    if not len(codes):
+        return [], []
+    order = np.lexsort((rows, codes))
+    codes, rows = codes[order], rows[order]
+    keep = np.ones(len(codes), dtype=bool)
+    keep[1:] = (codes[1:] != codes[:-1]) | (rows[1:] != rows[:-1])
+    codes, rows = codes[keep], rows[keep]
+    return list(uniques), np.split(rows, np.flatnonzero(np.diff(codes)) + 1)
+
+
+def translate_columns(df, translate, columns=("Topic",), suffix=TRANSLATED_SUFFIX):
+    """
+    Add pre-translated `<column>_Hindi` columns with `translate(text)`, once per distinct value.
+
+    Run offline (the result is saved with the KB), so search never calls a translator.
+    """
+    out = df.copy()
+    for column in columns:
+        values = out[column].fillna("").astype(str)
+        translated = {v: (translate(v) if v.strip() else "") for v in values.unique()}
+        out[column + suffix] = values.map(translated)
+    return out
+
+
+# =========================
+# RESEARCH REPORT
+# =========================
+def report_items(df, row_ids):
+    """Report entries for knowledge-base row positions, read from the shared KB on demand."""
+    for pos in row_ids:
+        if 0 <= pos < len(df):
+            row = df.iloc[pos]
+            yield {"Topic": row.get("Topic", "Untitled"), "Notes": row.get("Explanation", "")}
+
+
+def build_report(items):
+    """Plain-text research report from an iterable of {'Topic', 'Notes'} items."""
+    parts = ["BIO-VERIFY RESEARCH REPORT\n" + "=" * 25 + "\n\n"]
+    for item in items:
+        parts.append(f"TOPIC: {item['Topic']}\n{item['Notes']}\n\n" + "-" * 20 + "\n")
+    return "".join(parts)
+
+
+# =========================
+# RELATED TOPICS (TF-IDF)
+# =========================
+RELATED_TEXT_COLUMNS = {"Topic": 3, "Explanation": 1, "Ten_Points": 1, "Detailed_Explanation": 1}
+SECTION_WEIGHT = 2           # topics in the same (sub)section of the book are related
+MAX_DF = 0.2                 # on large KBs, ignore terms found in more than 20% of topics
+MAX_DF_MIN_ROWS = 1000
+RELATED_TOP_K = 5
+SIMILARITY_BLOCK_CELLS = 20_000_000   # dense scores per block (~80 MB of float32)
+QUERY_TERMS = 24             # strongest terms per topic used to find candidates
+CANDIDATE_DF_CAP = 0.01      # candidate terms appear in at most 1% of topics...
+CANDIDATE_MIN_DF_CAP = 50    # ...or 50 topics, whichever is larger
+CANDIDATE_FACTOR = 4         # candidates per topic re-scored exactly (k * factor)
+
+STOP_WORDS = frozenset("""
+a an and are as at be been but by can do does for from has have in into is it its of on or
+that the their there these this those to was were which while with within without than then
+also other such each both more most only used using use via its they them we our you your
+""".split())
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+@dataclass
+class RelatedIndex:
+    """Top-k nearest topics per knowledge-base row (positions and cosine scores)."""
+    neighbors: np.ndarray    # (n_rows, k) int32, -1 where there is no neighbour
+    scores: np.ndarray       # (n_rows, k) float32
+
+    def related(self, pos, min_score=0.02):
+        """[(position, score)] for a row, best first."""
+        if not 0 <= pos < len(self.neighbors):
+            return []
+        return [
+            (int(n), float(sc)) for n, sc in zip(self.neighbors[pos], self.scores[pos])
+            if n >= 0 and sc >= min_score
+        ]
+
+
+def _stem(token):
+    # Plural folding only ("enzymes" -> "enzyme", "bacs" -> "bac"); keeps "dna", "class"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def _section_terms(section):
+    """Hierarchical section prefixes as pseudo-terms: 4.12.1 -> sec:4, sec:4.12, sec:4.12.1."""
+    parts = [p for p in re.split(r"[.\s]+", str(section).strip()) if p and p != "nan"]
+    return [f"sec:{'.'.join(parts[:i + 1])}" for i in range(len(parts))]
+
+
+def _row_terms(df):
+    """(row positions, terms, weights) for every token and section pseudo-term (df has a RangeIndex)."""
+    rows, terms, weights = [], [], []
+    for column, weight in RELATED_TEXT_COLUMNS.items():
+        if column not in df.columns:
+            continue
+        tokens = df[column].fillna("").astype(str).str.lower().str.findall(_TOKEN_RE).explode().dropna()
+        rows.append(tokens.index.to_numpy(dtype=np.int64))
+        terms.append(tokens.to_numpy(dtype=object))
+        weights.append(np.full(len(tokens), weight, dtype=np.float32))
+    if "Section" in df.columns:
+        sections = df["Section"].map(_section_terms).explode().dropna()
+        rows.append(sections.index.to_numpy(dtype=np.int64))
+        terms.append(sections.to_numpy(dtype=object))
+        weights.append(np.full(len(sections), SECTION_WEIGHT, dtype=np.float32))
+    if not rows:
+        return np.zeros(0, np.int64), np.zeros(0, object), np.zeros(0, np.float32)
+    return np.concatenate(rows), np.concatenate(terms), np.concatenate(weights)
+
+
+def tfidf_matrix(df):
+    """L2-normalised TF-IDF CSR matrix (rows = KB rows) with sublinear term frequency."""
+    n_rows = len(df)
+    # Positional index so exploded tokens carry their row position
+    df = df.reset_index(drop=True)
+    rows, raw_terms, weights = _row_terms(df)
+
+    # Stop-word removal and stemming run once per distinct token, not per occurrence
+    codes, uniques = pd.factorize(raw_terms)
+    kept = np.array([len(t) > 1 and t not in STOP_WORDS for t in uniques], dtype=bool)
+    stems, stem_ids = np.unique(
+        np.array([t if t.startswith("sec:") else _stem(t) for t in uniques], dtype=object), return_inverse=True
+    )
+    keep = kept[codes]
+    rows, terms, weights = rows[keep], stem_ids[codes[keep]], weights[keep]
+
+    matrix = sparse.csr_matrix((weights, (rows, terms)), shape=(n_rows, len(stems)), dtype=np.float32)
+    matrix.sum_duplicates()
+    if not matrix.nnz:
+        return matrix
+    doc_freq = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    if n_rows >= MAX_DF_MIN_ROWS:
+        # Terms in most topics say little about relatedness but make the similarity product dense
+        matrix = matrix[:, np.flatnonzero(doc_freq <= MAX_DF * n_rows)]
+        doc_freq = doc_freq[doc_freq <= MAX_DF * n_rows]
+    idf = np.log((1 + n_rows) / (1 + doc_freq)).astype(np.float32) + 1
+    matrix.data = (1 + np.log(matrix.data)) * idf[matrix.indices]
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    matrix = sparse.diags(1 / np.where(norms > 0, norms, 1)).dot(matrix).tocsr()
+    return matrix.astype(np.float32)
+
+
+def _top_per_row(matrix, n):
+    """(rows, columns, rank within row, values) of each CSR row's `n` largest entries."""
+    row_ids = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    if not len(row_ids):
+        return row_ids, row_ids, row_ids, matrix.data
+    # One float sort key: the row id, minus the value scaled into [0, 1) (largest value first)
+    span = max(float(np.abs(matrix.data).max()), 1e-30) * 2
+    order = np.argsort(row_ids - matrix.data.astype(np.float64) / span - 0.5, kind="stable")
+    rank = np.arange(len(order)) - matrix.indptr[row_ids[order]]
+    keep = order[rank < n]
+    return row_ids[keep], matrix.indices[keep], rank[rank < n], matrix.data[keep]
+
+
+def _candidate_queries(matrix):
+    """Each topic's strongest terms among those rare enough to keep the candidate search sparse."""
+    doc_freq = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    cap = max(CANDIDATE_MIN_DF_CAP, int(CANDIDATE_DF_CAP * matrix.shape[0]))
+    rare = matrix @ sparse.diags((doc_freq <= cap).astype(np.float32))
+    rare.eliminate_zeros()
+    rows, cols, _, values = _top_per_row(rare.tocsr(), QUERY_TERMS)
+    return sparse.csr_matrix((values, (rows, cols)), shape=matrix.shape)
+
+
+def build_related_index(df, k=RELATED_TOP_K):
+    """
+    Precompute each row's top-k most similar rows (cosine over TF-IDF).
+
+    Candidates come from each topic's strongest reasonably rare terms, so the
+    block-wise product stays sparse and bounded on large knowledge bases.
+    The candidates are then re-scored with the exact cosine. Afterwards a
+    recommendation is an array lookup.
+    """
+    n_rows = len(df)
+    k = max(0, min(k, n_rows - 1))
+    neighbors = np.full((n_rows, k), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, k), dtype=np.float32)
+    if k == 0:
+        return RelatedIndex(neighbors, scores)
+
+    matrix = tfidf_matrix(df)
+    queries = _candidate_queries(matrix)
+    transposed = matrix.T.tocsc()
+    n_candidates = min(k * CANDIDATE_FACTOR, n_rows - 1)
+    pair_rows, pair_cols = [], []
+    block = max(1, SIMILARITY_BLOCK_CELLS // n_rows)
+    for start in range(0, n_rows, block):
+        sims = (queries[start:start + block] @ transposed).tocsr()
+        rows, cols, _, _ = _top_per_row(sims, n_candidates + 1)
+        rows = rows + start
+        not_self = rows != cols         # never recommend a topic to itself
+        pair_rows.append(rows[not_self])
+        pair_cols.append(cols[not_self])
+    pair_rows = np.concatenate(pair_rows)
+    pair_cols = np.concatenate(pair_cols)
+
+    # Exact cosine for every (row, candidate) pair, then keep the best k per row
+    exact = np.asarray(matrix[pair_rows].multiply(matrix[pair_cols]).sum(axis=1)).ravel()
+    ranked = sparse.csr_matrix((exact, (pair_rows, pair_cols)), shape=(n_rows, n_rows))
+    rows, cols, slot, values = _top_per_row(ranked, k)
+    neighbors[rows, slot] = cols
+    scores[rows, slot] = values
+    neighbors[scores <= 0] = -1
+    scores[scores <= 0] = 0
+    return RelatedIndex(neighbors, scores)
@@ -0,0 +1,272 @@
+"""
+In-process performance metrics for the app.
+
+Tab sections, external calls (Wikipedia, NCBI, translator, RCSB) and shared
+cache lookups are timed into histograms. The histograms are aggregated per
+server process. They can be read in two ways:
+
+* the developer panel in the sidebar (set BIO_DEV_PANEL=1 on the server),
+  which also breaks down session-state memory
+* Prometheus text at `/metrics` or JSON at `/metrics.json` on
+  BIO_METRICS_PORT, when that variable is set (bound to BIO_METRICS_HOST,
+  127.0.0.1 by default)
+"""
+import bisect
+import functools
+import json
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =========================
+# CONFIGURATION
+# =========================
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_PORT = os.environ.get("BIO_METRICS_PORT")
+METRICS_HOST = os.environ.get("BIO_METRICS_HOST", "127.0.0.1")   # 0.0.0.0 exposes it beyond this host
+DEV_PANEL = os.environ.get("BIO_DEV_PANEL") == "1"
+
+DESCRIPTIONS = {
+    "bio_rerun_seconds": "Duration of a full Streamlit script rerun.",
+    "bio_section_seconds": "Time spent rendering one tab or sidebar section.",
+    "bio_external_call_seconds": "Latency of calls to external services.",
+    "bio_cache_lookup_seconds": "Latency of shared-cache lookups.",
+}
+
+
+# =========================
+# HISTOGRAMS
+# =========================
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate from the buckets (linear within a bucket), like histogram_quantile()."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+
+class Registry:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def snapshot(self):
+        """JSON-friendly list of {name, labels, count, sum, mean, p50, p95, max, buckets}."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            rows = []
+            for (name, labels), h in items:
+                rows.append({
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": h.count,
+                    "sum": h.total,
+                    "mean": h.total / h.count if h.count else 0.0,
+                    "p50": h.quantile(0.5),
+                    "p95": h.quantile(0.95),
+                    "max": h.max,
+                    "buckets": dict(zip([str(b) for b in h.buckets] + ["+Inf"], h.counts)),
+                })
+            return rows
+
+    def prometheus_text(self):
+        lines = []
+        described = set()
+        for row in self.snapshot():
+            name = row["name"]
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {DESCRIPTIONS.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in row["labels"].items())
+            cumulative = 0
+            for bound, n in row["buckets"].items():
+                cumulative += n
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{{{label_text + ',' if label_text else ''}{le}}} {cumulative}")
+            suffix = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{name}_sum{suffix} {row['sum']:.6f}")
+            lines.append(f"{name}_count{suffix} {row['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = Registry()
+
+
+# =========================
+# TIMERS
+# =========================
+_rerun = threading.local()   # Streamlit runs each session's script on its own thread
+
+
+def start_rerun():
+    """Mark the start of a script run; section timings below are kept for the dev panel."""
+    # A run cut short by st.rerun()/st.stop() or an exception never reaches
+    # finish_rerun(); Streamlit starts the next run on the same thread, so
+    # record the unfinished one here instead of dropping it
+    finish_rerun()
+    _rerun.start = time.perf_counter()
+    _rerun.sections = []
+
+
+def finish_rerun():
+    start = getattr(_rerun, "start", None)
+    if start is not None:
+        REGISTRY.observe("bio_rerun_seconds", time.perf_counter() - start)
+        _rerun.start = None
+
+
+def last_rerun_sections():
+    """[(section, seconds)] recorded so far in the current script run."""
+    return list(getattr(_rerun, "sections", []))
+
+
+@contextmanager
+def section(name):
+    """Time a tab or sidebar section: `with tabs[3], metrics.section("dna_lab"):`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        REGISTRY.observe("bio_section_seconds", elapsed, section=name)
+        if hasattr(_rerun, "sections"):
+            _rerun.sections.append((name, elapsed))
+
+
+def external(service):
+    """Decorator timing a call to an external service, labelled by outcome."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = func(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                REGISTRY.observe("bio_external_call_seconds", time.perf_counter() - start,
+                                 service=service, outcome=outcome)
+        return wrapper
+    return decorator
+
+
+def observe_cache_lookup(namespace, result, seconds):
+    REGISTRY.observe("bio_cache_lookup_seconds", seconds, namespace=namespace, result=result)
+
+
+# =========================
+# SESSION MEMORY
+# =========================
+def _pickled_size(value):
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+def state_sizes(state):
+    """[(key, type, bytes)] for a session-state dict, largest first (pickled size)."""
+    rows = [(str(key), type(value).__name__, _pickled_size(value)) for key, value in state.items()]
+    return sorted(rows, key=lambda row: row[2], reverse=True)
+
+
+def all_sessions_state_bytes():
+    """Pickled session-state size of every active session, or None outside `streamlit run`."""
+    try:
+        from streamlit import runtime
+        sessions = runtime.get_instance()._session_mgr.list_active_sessions()
+        return [
+            sum(_pickled_size(v) for v in info.session.session_state.filtered_state.values())
+            for info in sessions
+        ]
+    except Exception:
+        return None
+
+
+# =========================
+# EXPORT ENDPOINT
+# =========================
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body, content_type = REGISTRY.prometheus_text(), "text/plain; version=0.0.4"
+        elif self.path.split("?")[0] == "/metrics.json":
+            body, content_type = json.dumps(REGISTRY.snapshot()), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_server(port=None, host=None):
+    """Serve /metrics and /metrics.json on a daemon thread (once per process)."""
+    global _server
+    port = port or METRICS_PORT
+    host = host or METRICS_HOST
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            except OSError:
+                # Another replica on this host already owns the port
+                return None
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
@@ -0,0 +1,264 @@
+"""
+Batch OCR ingest for textbook diagrams.
+
+Images are downsized and binarized, then read by EasyOCR on a pool of worker
+processes (each loads its own model once). Text, confidence and per-stage
+timings are written to a SQLite store that the app's Search tab reads, so new
+diagrams are OCR'd once, offline, instead of inside a user's request.
+
+Usage:
+    python ocr_ingest.py diagrams/ --workers 4
+    python ocr_ingest.py 1.jpg 2.jpg --store ocr_index.sqlite --force
+"""
+import argparse
+import contextlib
+import datetime
+import glob
+import hashlib
+import os
+import sqlite3
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+# =========================
+# CONFIGURATION
+# =========================
+OCR_STORE = os.environ.get("BIO_OCR_STORE", "ocr_index.sqlite")
+# Store keys are paths relative to this directory (where the app resolves the KB's Image column)
+IMAGE_ROOT = os.environ.get("BIO_IMAGE_ROOT", os.path.dirname(os.path.abspath(__file__)))
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+MAX_SIDE = 1600             # px, larger diagrams are downsized before OCR
+DEFAULT_WORKERS = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_results (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    text TEXT NOT NULL,
+    confidence REAL,
+    detections INTEGER,
+    width INTEGER,
+    height INTEGER,
+    preprocess_ms REAL,
+    ocr_ms REAL,
+    processed_at TEXT
+)
+"""
+
+
+# =========================
+# STORE
+# =========================
+def connect(store=None):
+    conn = sqlite3.connect(store or OCR_STORE, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(SCHEMA)
+    return conn
+
+
+def connect_readonly(store=None):
+    """Read-only connection for lookups; the schema and WAL mode are set up by ingest."""
+    url = urllib.request.pathname2url(os.path.abspath(store or OCR_STORE))
+    return sqlite3.connect(f"file:{url}?mode=ro", uri=True, timeout=30)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_key(path):
+    """
+    Key of an image in the store: its real path relative to IMAGE_ROOT, so the
+    ingest CLI and the app agree whatever their cwd or spelling of the path.
+    Images outside the root are keyed by their absolute real path.
+    """
+    full = os.path.realpath(path)
+    root = os.path.realpath(IMAGE_ROOT)
+    try:
+        if os.path.commonpath([root, full]) == root:
+            return os.path.relpath(full, root).replace(os.sep, "/")
+    except ValueError:
+        pass   # different drives on Windows
+    return full
+
+
+def lookup_text(path, store=None):
+    """Stored OCR text for an image, or None if missing or the file changed."""
+    store = store or OCR_STORE
+    if not os.path.exists(store) or not os.path.exists(path):
+        return None
+    try:
+        with contextlib.closing(connect_readonly(store)) as conn:
+            row = conn.execute("SELECT sha256, text FROM ocr_results WHERE path = ?",
+                               (store_key(path),)).fetchone()
+    except sqlite3.OperationalError:
+        return None   # not an OCR store (yet)
+    if row is None or row[0] != file_sha256(path):
+        return None
+    return row[1]
+
+
+def save_result(conn, result):
+    conn.execute(
+        "INSERT OR REPLACE INTO ocr_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (result["path"], result["sha256"], result["text"], result["confidence"], result["detections"],
+         result["width"], result["height"], result["preprocess_ms"], result["ocr_ms"],
+         datetime.datetime.now().isoformat(timespec="seconds")),
+    )
+
+
+# =========================
+# PREPROCESSING
+# =========================
+def preprocess(path, max_side=MAX_SIDE):
+    """Grayscale, downsize (area interpolation) and Otsu-binarize an image."""
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"Unreadable image: {path}")
+    scale = max_side / max(image.shape)
+    if scale < 1:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, binary = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
+
+
+# =========================
+# WORKERS
+# =========================
+_reader = None
+
+
+def _init_worker(gpu):
+    # One EasyOCR model per worker process, loaded before the first image
+    global _reader
+    import easyocr
+    _reader = easyocr.Reader(["en"], gpu=gpu)
+
+
+def ocr_image(path, max_side=MAX_SIDE):
+    """Preprocess and OCR one image; runs inside a worker process."""
+    start = time.perf_counter()
+    image = preprocess(path, max_side)
+    preprocessed = time.perf_counter()
+    detections = _reader.readtext(image, detail=1)
+    done = time.perf_counter()
+
+    confidences = [float(conf) for _, _, conf in detections]
+    return {
+        "path": store_key(path),
+        "sha256": file_sha256(path),
+        "text": " ".join(text for _, text, _ in detections).lower(),
+        "confidence": float(np.mean(confidences)) if confidences else None,
+        "detections": len(detections),
+        "width": int(image.shape[1]),
+        "height": int(image.shape[0]),
+        "preprocess_ms": (preprocessed - start) * 1000,
+        "ocr_ms": (done - preprocessed) * 1000,
+    }
+
+
+# =========================
+# BATCH INGEST
+# =========================
+def collect_images(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for ext in IMAGE_EXTENSIONS:
+                paths.extend(glob.glob(os.path.join(item, "**", f"*{ext}"), recursive=True))
+        else:
+            paths.append(item)
+    return sorted(set(paths))
+
+
+def pending_images(paths, conn):
+    """
+    Images that are new or changed since they were last ingested, plus
+    `error` results for paths that could not be read.
+    """
+    stored = dict(conn.execute("SELECT path, sha256 FROM ocr_results").fetchall())
+    pending, failed = [], []
+    for path in paths:
+        try:
+            digest = file_sha256(path)
+        except OSError as e:
+            failed.append({"path": path, "error": str(e)})
+            continue
+        if stored.get(store_key(path)) != digest:
+            pending.append(path)
+    return pending, failed
+
+
+def ingest(paths, store=None, workers=DEFAULT_WORKERS, gpu=False, force=False, max_side=MAX_SIDE, progress=None):
+    """
+    OCR `paths` across `workers` processes and write results to the store.
+
+    Returns a list of per-image results (including failures with an `error` key).
+    """
+    conn = connect(store)
+    # A missing or unreadable file fails on its own instead of aborting the batch
+    todo, results = (list(paths), []) if force else pending_images(paths, conn)
+    total = len(todo) + len(results)
+    if progress:
+        for done, result in enumerate(results, start=1):
+            progress(done, total, result)
+    if not todo:
+        conn.close()
+        return results
+
+    with ProcessPoolExecutor(max_workers=max(1, workers), initializer=_init_worker, initargs=(gpu,)) as pool:
+        futures = {pool.submit(ocr_image, path, max_side): path for path in todo}
+        for done, future in enumerate(as_completed(futures), start=len(results) + 1):
+            try:
+                result = future.result()
+                save_result(conn, result)
+                conn.commit()
+            except Exception as e:
+                result = {"path": futures[future], "error": str(e)}
+            results.append(result)
+            if progress:
+                progress(done, total, result)
+    conn.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch OCR ingest for textbook diagrams.")
+    parser.add_argument("inputs", nargs="+", help="Image files or directories")
+    parser.add_argument("--store", default=OCR_STORE, help="SQLite file for OCR results")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent OCR processes")
+    parser.add_argument("--max-side", type=int, default=MAX_SIDE, help="Downsize images to this many px")
+    parser.add_argument("--gpu", action="store_true", help="Run EasyOCR on the GPU")
+    parser.add_argument("--force", action="store_true", help="Re-OCR images already in the store")
+    args = parser.parse_args(argv)
+
+    paths = collect_images(args.inputs)
+    print(f"Found {len(paths)} images")
+
+    def report(done, total, result):
+        if "error" in result:
+            print(f"[{done}/{total}] {result['path']}: ERROR {result['error']}")
+        else:
+            conf = f"{result['confidence']:.2f}" if result["confidence"] is not None else "-"
+            print(f"[{done}/{total}] {result['path']}: {result['detections']} boxes, "
+                  f"conf {conf}, {result['preprocess_ms']:.0f} + {result['ocr_ms']:.0f} ms")
+
+    start = time.perf_counter()
+    results = ingest(paths, args.store, args.workers, args.gpu, args.force, args.max_side, progress=report)
+    elapsed = time.perf_counter() - start
+    ok = [r for r in results if "error" not in r]
+    print(f"Ingested {len(ok)} images ({len(results) - len(ok)} failed, "
+          f"{len(paths) - len(results)} unchanged) in {elapsed:.1f} s "
+          f"({len(ok) / elapsed if elapsed else 0:.2f} images/s)")
+
+
+if __name__ == "__main__":
+    main()
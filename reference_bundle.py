@@ -0,0 +1,447 @@
+"""
+Offline reference bundle for Global Bio-Search.
+
+A curated subset of Wikipedia summaries and PubMed abstracts (seeded from the
+knowledge-base topics) is kept in a SQLite FTS5 index. The app serves
+searches from it when offline mode is selected, or automatically when the
+live services are slower than BIO_UPSTREAM_TIMEOUT.
+
+Usage:
+    python reference_bundle.py build                  # seed from knowledge_base.csv
+    python reference_bundle.py build --topics extra.txt --pubmed-per-topic 30
+    python reference_bundle.py refresh --max-age-days 30
+    python reference_bundle.py search "dna replication"
+
+Set BIO_BUNDLE_REFRESH_HOURS to also refresh stale topics from a background
+thread of the running app.
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import metrics
+
+# =========================
+# CONFIGURATION
+# =========================
+BUNDLE_PATH = os.environ.get("BIO_REFERENCE_BUNDLE", "reference_bundle.sqlite")
+UPSTREAM_TIMEOUT = float(os.environ.get("BIO_UPSTREAM_TIMEOUT", "3.0"))     # s before falling back
+UPSTREAM_COOLDOWN = float(os.environ.get("BIO_UPSTREAM_COOLDOWN", "300"))   # s to stay on the bundle
+REFRESH_HOURS = float(os.environ.get("BIO_BUNDLE_REFRESH_HOURS", "0"))
+DEFAULT_MAX_AGE_DAYS = 30
+WIKI_RESULTS_PER_TOPIC = 3
+PUBMED_PER_TOPIC = 20
+EUTILS = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+NCBI_DELAY = 0.11 if os.environ.get("NCBI_API_KEY") else 0.34   # NCBI allows 10 (key) / 3 requests per s
+SEARCH_MODES = ("auto", "live", "offline")
+DEFAULT_SEARCH_MODE = os.environ.get("BIO_SEARCH_MODE", "auto")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    key TEXT NOT NULL,
+    title TEXT NOT NULL,
+    body TEXT NOT NULL,
+    url TEXT,
+    seed TEXT,
+    fetched_at REAL,
+    UNIQUE (source, key)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    title, body, content='documents', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts(documents_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN
+    INSERT INTO documents_fts(documents_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    INSERT INTO documents_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+CREATE TABLE IF NOT EXISTS seeds (seed TEXT PRIMARY KEY, fetched_at REAL, error TEXT);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_WORD_RE = re.compile(r"\w+")
+
+
+# =========================
+# STORE
+# =========================
+def connect(path=None):
+    conn = sqlite3.connect(path or BUNDLE_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def fts_query(text, any_term=False):
+    """Quote each word so user input cannot inject FTS5 syntax (AND by default)."""
+    words = _WORD_RE.findall(text.lower())
+    return (" OR " if any_term else " ").join(f'"{w}"' for w in words)
+
+
+class ReferenceBundle:
+    """Read side of the bundle; one read-only connection per thread."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=30, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def stats(self):
+        """{source: document count} plus the time of the newest fetch."""
+        rows = self._conn().execute(
+            "SELECT source, COUNT(*), MAX(fetched_at) FROM documents GROUP BY source"
+        ).fetchall()
+        counts = {source: n for source, n, _ in rows}
+        newest = max((t for _, _, t in rows if t), default=None)
+        return {"documents": counts, "updated": newest}
+
+    def search(self, query, source=None, limit=5):
+        """Best matches as dicts (title, body, url, key, snippet), all words first then any word."""
+        for any_term in (False, True):
+            match = fts_query(query, any_term)
+            if not match:
+                return []
+            sql = (
+                "SELECT d.source, d.key, d.title, d.body, d.url,"
+                " snippet(documents_fts, 1, '**', '**', ' … ', 24)"
+                " FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid"
+                " WHERE documents_fts MATCH ?" + (" AND d.source = ?" if source else "") +
+                " ORDER BY bm25(documents_fts, 10.0, 1.0) LIMIT ?"
+            )
+            params = (match, source, limit) if source else (match, limit)
+            rows = self._conn().execute(sql, params).fetchall()
+            if rows:
+                return [
+                    {"source": s, "key": k, "title": t, "body": b, "url": u, "snippet": snip}
+                    for s, k, t, b, u, snip in rows
+                ]
+        return []
+
+    @metrics.external("reference_bundle")
+    def wikipedia_lookup(self, query):
+        """Same shape as the app's live Wikipedia lookup, or None."""
+        row = self._conn().execute(
+            "SELECT title, body, url FROM documents WHERE source = 'wikipedia' AND key = ? COLLATE NOCASE",
+            (query.strip(),),
+        ).fetchone()
+        if row is None:
+            hits = self.search(query, source="wikipedia", limit=1)
+            if not hits:
+                return None
+            row = (hits[0]["title"], hits[0]["body"], hits[0]["url"])
+        return {"title": row[0], "summary": row[1], "url": row[2]}
+
+    @metrics.external("reference_bundle")
+    def pubmed_search(self, term, limit=5):
+        return self.search(term, source="pubmed", limit=limit)
+
+
+_bundle = None
+_bundle_lock = threading.Lock()
+
+
+def open_bundle(path=None):
+    """Process-wide ReferenceBundle, or None if no bundle has been built."""
+    global _bundle
+    path = path or BUNDLE_PATH
+    with _bundle_lock:
+        if _bundle is None or _bundle.path != path:
+            if not os.path.exists(path):
+                return None
+            _bundle = ReferenceBundle(path)
+        return _bundle
+
+
+# =========================
+# LIVE / OFFLINE FALLBACK
+# =========================
+class UpstreamGuard:
+    """
+    Runs live calls under a latency budget.
+
+    A call slower than `timeout` (or failing) is answered from the bundle when
+    the bundle has a result, and that service stays on the bundle for
+    `cooldown` seconds. The slow call keeps running and still fills the shared
+    cache for later searches.
+    """
+
+    def __init__(self, timeout=UPSTREAM_TIMEOUT, cooldown=UPSTREAM_COOLDOWN):
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="upstream")
+        self._degraded = {}   # service -> (until, reason)
+        self._lock = threading.Lock()
+
+    def _trip(self, service, reason):
+        with self._lock:
+            self._degraded[service] = (time.monotonic() + self.cooldown, reason)
+
+    def degraded(self, service):
+        """Reason the service is on the bundle ('slow' / 'error'), or None."""
+        with self._lock:
+            until, reason = self._degraded.get(service, (0, None))
+            if until <= time.monotonic():
+                self._degraded.pop(service, None)
+                return None
+            return reason
+
+    def call(self, service, live, offline, mode="auto"):
+        """
+        Returns (result, source) with source 'live' or 'offline'.
+
+        `offline` returns None/empty when the bundle has nothing, in which case
+        the live answer is awaited (or its error raised) as before.
+        """
+        if mode == "offline":
+            return offline(), "offline"
+        if mode == "auto" and self.degraded(service):
+            result = offline()
+            if result:
+                return result, "offline"
+        future = self._pool.submit(live)
+        if mode == "live":
+            return future.result(), "live"
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            self._trip(service, "slow")
+            fallback = offline()
+            if fallback:
+                return fallback, "offline"
+            return future.result(), "live"
+        except Exception:
+            self._trip(service, "error")
+            fallback = offline()
+            if fallback:
+                return fallback, "offline"
+            raise
+        with self._lock:
+            self._degraded.pop(service, None)
+        return result, "live"
+
+
+GUARD = UpstreamGuard()
+
+
+# =========================
+# FETCHING (BUILD / REFRESH)
+# =========================
+def fetch_wikipedia(topic, results=WIKI_RESULTS_PER_TOPIC):
+    """[(key, title, summary, url)] for the top Wikipedia hits of a topic."""
+    import wikipedia
+    docs = []
+    for title in wikipedia.search(topic, results=results):
+        try:
+            page = wikipedia.page(title, auto_suggest=False)
+            summary = wikipedia.summary(title, sentences=4, auto_suggest=False)
+        except (wikipedia.exceptions.DisambiguationError, wikipedia.exceptions.PageError):
+            continue
+        docs.append((page.title, page.title, summary, page.url))
+    return docs
+
+
+def _eutils(endpoint, **params):
+    import requests
+    api_key = os.environ.get("NCBI_API_KEY")
+    if api_key:
+        params["api_key"] = api_key
+    time.sleep(NCBI_DELAY)
+    response = requests.get(f"{EUTILS}/{endpoint}", params=params, timeout=30)
+    response.raise_for_status()
+    return response
+
+
+def parse_pubmed_xml(xml_text):
+    """[(pmid, title, abstract, url)] from an efetch PubmedArticleSet."""
+    docs = []
+    for article in ET.fromstring(xml_text).iter("PubmedArticle"):
+        pmid = article.findtext("MedlineCitation/PMID")
+        title_el = article.find(".//ArticleTitle")
+        title = "".join(title_el.itertext()).strip() if title_el is not None else ""
+        abstract = " ".join("".join(el.itertext()).strip() for el in article.findall(".//Abstract/AbstractText"))
+        if pmid and (title or abstract):
+            docs.append((pmid, title or f"PMID {pmid}", abstract, f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/"))
+    return docs
+
+
+def fetch_pubmed(topic, limit=PUBMED_PER_TOPIC):
+    ids = _eutils("esearch.fcgi", db="pubmed", term=topic, retmode="json", retmax=limit).json()
+    ids = ids.get("esearchresult", {}).get("idlist", [])
+    if not ids:
+        return []
+    return parse_pubmed_xml(_eutils("efetch.fcgi", db="pubmed", id=",".join(ids), retmode="xml").text)
+
+
+def update_seed(conn, seed, wiki_results=WIKI_RESULTS_PER_TOPIC, pubmed_limit=PUBMED_PER_TOPIC):
+    """Re-fetch one seed topic and replace its documents; returns the document count."""
+    fetched = [("wikipedia",) + doc for doc in fetch_wikipedia(seed, wiki_results)]
+    fetched += [("pubmed",) + doc for doc in fetch_pubmed(seed, pubmed_limit)]
+    now = time.time()
+    with conn:
+        for source, key, title, body, url in fetched:
+            conn.execute(
+                "INSERT INTO documents (source, key, title, body, url, seed, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (source, key) DO UPDATE SET title = excluded.title, body = excluded.body,"
+                " url = excluded.url, fetched_at = excluded.fetched_at",
+                (source, key, title, body, url, seed, now),
+            )
+        conn.execute("INSERT OR REPLACE INTO seeds VALUES (?, ?, NULL)", (seed, now))
+    return len(fetched)
+
+
+def stale_seeds(conn, max_age_days=DEFAULT_MAX_AGE_DAYS):
+    cutoff = time.time() - max_age_days * 86400
+    rows = conn.execute("SELECT seed FROM seeds WHERE fetched_at IS NULL OR fetched_at < ?", (cutoff,))
+    return [seed for (seed,) in rows]
+
+
+def refresh(path=None, max_age_days=DEFAULT_MAX_AGE_DAYS, progress=None, **fetch_options):
+    """Re-fetch seeds older than `max_age_days` (and never-fetched ones)."""
+    conn = connect(path)
+    todo = stale_seeds(conn, max_age_days)
+    done = 0
+    for i, seed in enumerate(todo, start=1):
+        try:
+            n = update_seed(conn, seed, **fetch_options)
+            done += 1
+        except Exception as e:
+            # Keep the old documents; the seed is retried on the next refresh
+            with conn:
+                conn.execute("UPDATE seeds SET error = ? WHERE seed = ?", (str(e), seed))
+            n = None
+        if progress:
+            progress(i, len(todo), seed, n)
+    conn.close()
+    return done
+
+
+def build(seeds, path=None, progress=None, **fetch_options):
+    """Add seed topics and fetch every one that is new or stale."""
+    conn = connect(path)
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO seeds (seed) VALUES (?)", [(s,) for s in seeds])
+    conn.close()
+    return refresh(path, progress=progress, **fetch_options)
+
+
+def knowledge_base_topics(csv_path="knowledge_base.csv"):
+    import pandas as pd
+    topics = pd.read_csv(csv_path, usecols=["Topic"])["Topic"].dropna().astype(str).str.strip()
+    return sorted(set(topics[topics != ""]))
+
+
+# =========================
+# BACKGROUND REFRESH
+# =========================
+_refresh_thread = None
+
+
+def _claim_refresh(path, interval_s):
+    """Only one replica refreshes per interval: claim it with a timestamp in `meta`."""
+    conn = connect(path)
+    try:
+        with conn:
+            now = time.time()
+            # One statement, so the check and the write are atomic across replicas;
+            # rowcount is 0 when another replica's claim is still fresh
+            cursor = conn.execute(
+                "INSERT INTO meta VALUES ('refresh_claimed', ?) ON CONFLICT (key) DO UPDATE "
+                "SET value = excluded.value WHERE CAST(meta.value AS REAL) <= ?",
+                (str(now), now - interval_s),
+            )
+            return cursor.rowcount == 1
+    finally:
+        conn.close()
+
+
+def start_background_refresh(path=None, hours=None, max_age_days=DEFAULT_MAX_AGE_DAYS):
+    """Refresh stale seeds every `hours` on a daemon thread (once per process)."""
+    global _refresh_thread
+    path = path or BUNDLE_PATH
+    hours = hours or REFRESH_HOURS
+    if not hours or not os.path.exists(path):
+        return None
+    with _bundle_lock:
+        if _refresh_thread is None:
+            def loop():
+                while True:
+                    try:
+                        if _claim_refresh(path, hours * 3600):
+                            refresh(path, max_age_days)
+                    except Exception:
+                        pass   # the network may be down; try again next interval
+                    time.sleep(hours * 3600)
+            _refresh_thread = threading.Thread(target=loop, name="bundle-refresh", daemon=True)
+            _refresh_thread.start()
+        return _refresh_thread
+
+
+# =========================
+# CLI
+# =========================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query the offline reference bundle.")
+    parser.add_argument("--bundle", default=BUNDLE_PATH, help="SQLite file for the bundle")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="Fetch Wikipedia/PubMed documents for seed topics")
+    p_build.add_argument("--knowledge-base", default="knowledge_base.csv", help="CSV whose topics seed the bundle")
+    p_build.add_argument("--topics", help="Extra seed topics, one per line")
+    p_build.add_argument("--wiki-results", type=int, default=WIKI_RESULTS_PER_TOPIC)
+    p_build.add_argument("--pubmed-per-topic", type=int, default=PUBMED_PER_TOPIC)
+
+    p_refresh = sub.add_parser("refresh", help="Re-fetch seeds older than --max-age-days")
+    p_refresh.add_argument("--max-age-days", type=float, default=DEFAULT_MAX_AGE_DAYS)
+
+    p_search = sub.add_parser("search", help="Query the bundle")
+    p_search.add_argument("query")
+    p_search.add_argument("--source", choices=["wikipedia", "pubmed"])
+    args = parser.parse_args(argv)
+
+    def report(done, total, seed, n):
+        status = "failed (kept old documents)" if n is None else f"{n} documents"
+        print(f"[{done}/{total}] {seed}: {status}")
+
+    start = time.perf_counter()
+    if args.command == "build":
+        seeds = knowledge_base_topics(args.knowledge_base) if args.knowledge_base else []
+        if args.topics:
+            with open(args.topics, encoding="utf-8") as handle:
+                seeds += [line.strip() for line in handle if line.strip()]
+        print(f"{len(seeds)} seed topics")
+        done = build(seeds, args.bundle, progress=report,
+                     wiki_results=args.wiki_results, pubmed_limit=args.pubmed_per_topic)
+        print(f"Fetched {done} topics in {time.perf_counter() - start:.1f} s")
+    elif args.command == "refresh":
+        done = refresh(args.bundle, args.max_age_days, progress=report)
+        print(f"Refreshed {done} topics in {time.perf_counter() - start:.1f} s")
+    else:
+        bundle = open_bundle(args.bundle)
+        if bundle is None:
+            parser.error(f"No bundle at {args.bundle}; run `build` first")
+        hits = bundle.search(args.query, source=args.source, limit=10)
+        elapsed = (time.perf_counter() - start) * 1000
+        for hit in hits:
+            print(f"[{hit['source']}] {hit['title']}\n    {hit['snippet']}")
+        print(f"{len(hits)} results in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Local k-mer indexed sequence database (a small, offline BLAST stand-in).
+
+`build` packs a FASTA file (plasmid backbones, vectors, common genes) into a
+directory of .npy arrays that are memory-mapped at query time:
+
+* seq.npy            all records concatenated (uint8), separated by N
+* kmer_offsets.npy   direct-address table: k-mer code -> slice of positions
+* kmer_positions.npy start positions sorted by k-mer code (uint32)
+* records.json       names, descriptions, offsets, k
+
+A query is seeded with its exact k-mer matches on both strands. The seeds
+are grouped into diagonal clusters, and the best clusters are extended
+with a banded Smith-Waterman alignment (alignment.py) around the seeds.
+
+Usage:
+    python sequence_index.py build vectors.fasta -o sequence_db -k 11
+    python sequence_index.py search query.fasta --db sequence_db
+"""
+import argparse
+import json
+import math
+import os
+import time
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+import alignment
+import sequence_tools
+
+# =========================
+# CONFIGURATION
+# =========================
+INDEX_DIR = os.environ.get("BIO_SEQUENCE_DB", "sequence_db")
+DEFAULT_K = 11
+MAX_K = 13                 # 4**13 offsets are already 256 MB
+MAX_OCCURRENCES = 1000     # k-mers more frequent than this (repeats) do not seed
+DIAGONAL_GAP = 64          # seeds on diagonals closer than this join one cluster
+MIN_SEEDS = 2
+MAX_CANDIDATES = 10        # clusters extended with a gapped alignment
+EXTENSION_PAD = 32         # bp of subject flank (and band) around a cluster's diagonals
+EXTENSION_FLANK = 100      # bp of query aligned beyond the first/last seed
+MAX_SEED_HITS = 5_000_000
+MAX_EVALUE = 1e-3
+# Karlin-Altschul parameters for alignment.py's default scoring (+2/-3, gaps 5/2), as in BLASTN
+KARLIN_LAMBDA = 0.625
+KARLIN_K = 0.41
+
+_BASE_CODE = np.full(256, 4, dtype=np.uint8)
+for _i, _b in enumerate("ACGT"):
+    _BASE_CODE[ord(_b)] = _i
+    _BASE_CODE[ord(_b.lower())] = _i
+
+
+@dataclass
+class Hit:
+    record: str
+    description: str
+    strand: str
+    score: int
+    identity: float
+    query_start: int      # 0-based, end exclusive, on the query as given
+    query_end: int
+    subject_start: int    # 0-based, end exclusive, within the record
+    subject_end: int
+    seeds: int
+    query_length: int
+    evalue: float
+    alignment: alignment.Alignment   # coordinates: searched strand of the query, and the record
+
+    @property
+    def coverage(self):
+        """Percentage of the query inside the alignment."""
+        return (self.query_end - self.query_start) / self.query_length * 100 if self.query_length else 0.0
+
+
+# =========================
+# FASTA + K-MERS
+# =========================
+def read_fasta(path):
+    """Yield (name, description, sequence) records."""
+    name, description, chunks = None, "", []
+    with open(path, encoding="utf-8", errors="replace") as handle:
+        for line in handle:
+            line = line.strip()
+            if line.startswith(">"):
+                if name is not None:
+                    yield name, description, "".join(chunks)
+                header = line[1:].split(None, 1)
+                name = header[0] if header else "unnamed"
+                description = header[1] if len(header) > 1 else ""
+                chunks = []
+            elif line:
+                chunks.append(line)
+    if name is not None:
+        yield name, description, "".join(chunks)
+
+
+def kmer_codes(data, k):
+    """(codes, positions) of every k-mer made only of A/C/G/T in a uint8 array."""
+    n = len(data) - k + 1
+    if n <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    base = _BASE_CODE[data]
+    invalid = np.concatenate(([0], np.cumsum(base == 4)))
+    positions = np.flatnonzero(invalid[k:] == invalid[:-k])
+    codes = np.zeros(n, dtype=np.int64)
+    for t in range(k):
+        codes = (codes << 2) | (base[t:t + n] & 3)
+    return codes[positions], positions
+
+
+# =========================
+# BUILD
+# =========================
+def build_index(fasta_path, out_dir=INDEX_DIR, k=DEFAULT_K):
+    """Pack a FASTA file into a memory-mappable k-mer index; returns summary stats."""
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k must be between 1 and {MAX_K}")
+    names, descriptions, starts, lengths, parts = [], [], [], [], []
+    offset = 0
+    for name, description, seq in read_fasta(fasta_path):
+        seq = seq.upper().encode("ascii", "replace")
+        names.append(name)
+        descriptions.append(description)
+        starts.append(offset)
+        lengths.append(len(seq))
+        parts.append(seq + b"N")   # separator, so no k-mer spans two records
+        offset += len(seq) + 1
+    if not names:
+        raise ValueError(f"No FASTA records in {fasta_path}")
+    if offset >= 2 ** 32:
+        raise ValueError("Database too large for 32-bit positions")
+
+    data = np.frombuffer(b"".join(parts), dtype=np.uint8)
+    codes, positions = kmer_codes(data, k)
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes, minlength=4 ** k)
+    offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.uint32)
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "seq.npy"), data)
+    np.save(os.path.join(out_dir, "kmer_offsets.npy"), offsets)
+    np.save(os.path.join(out_dir, "kmer_positions.npy"), positions[order].astype(np.uint32))
+    with open(os.path.join(out_dir, "records.json"), "w", encoding="utf-8") as handle:
+        json.dump({"k": k, "names": names, "descriptions": descriptions,
+                   "starts": starts, "lengths": lengths}, handle)
+    return {"records": len(names), "bases": int(sum(lengths)), "kmers": int(len(positions))}
+
+
+# =========================
+# SEARCH
+# =========================
+class SequenceIndex:
+    """A built index, memory-mapped read-only (pages load on first touch)."""
+
+    def __init__(self, directory=INDEX_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, "records.json"), encoding="utf-8") as handle:
+            meta = json.load(handle)
+        self.k = meta["k"]
+        self.names = meta["names"]
+        self.descriptions = meta["descriptions"]
+        self.starts = np.asarray(meta["starts"], dtype=np.int64)
+        self.lengths = np.asarray(meta["lengths"], dtype=np.int64)
+        self.seq = np.load(os.path.join(directory, "seq.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(directory, "kmer_offsets.npy"), mmap_mode="r")
+        self.positions = np.load(os.path.join(directory, "kmer_positions.npy"), mmap_mode="r")
+
+    @property
+    def total_bases(self):
+        return int(self.lengths.sum())
+
+    def _seed(self, query, max_occurrences):
+        """(query positions, database positions) of exact k-mer matches."""
+        codes, qpos = kmer_codes(np.frombuffer(query.encode("ascii", "replace"), dtype=np.uint8), self.k)
+        starts = self.offsets[codes].astype(np.int64)
+        counts = self.offsets[codes + 1].astype(np.int64) - starts
+        keep = (counts > 0) & (counts <= max_occurrences)
+        qpos, starts, counts = qpos[keep], starts[keep], counts[keep]
+        total = int(counts.sum())
+        if total > MAX_SEED_HITS:
+            raise ValueError("Query has too many seed hits; use a larger k or a shorter query")
+        # CSR gather: for each query k-mer, every stored position of that k-mer
+        first = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        dpos = self.positions[first + np.arange(total)].astype(np.int64)
+        return np.repeat(qpos, counts), dpos
+
+    def _clusters(self, qpos, dpos):
+        """
+        Seed clusters, most seeds first, as (record, first/last diagonal,
+        first/last query position, seed count).
+        """
+        if len(dpos) == 0:
+            return []
+        record = np.searchsorted(self.starts, dpos, side="right") - 1
+        diagonal = dpos - qpos
+        order = np.lexsort((diagonal, record))
+        record, diagonal, qpos = record[order], diagonal[order], qpos[order]
+        new = np.ones(len(order), dtype=bool)
+        new[1:] = (record[1:] != record[:-1]) | (np.diff(diagonal) > DIAGONAL_GAP)
+        bounds = np.flatnonzero(new)
+        seeds = np.diff(np.append(bounds, len(order)))
+        lo_diag = diagonal[bounds]
+        hi_diag = np.maximum.reduceat(diagonal, bounds)
+        lo_q = np.minimum.reduceat(qpos, bounds)
+        hi_q = np.maximum.reduceat(qpos, bounds)
+        ranked = np.argsort(-seeds, kind="stable")
+        return [
+            (int(record[bounds[c]]), int(lo_diag[c]), int(hi_diag[c]), int(lo_q[c]), int(hi_q[c]), int(seeds[c]))
+            for c in ranked
+        ]
+
+    def _extend(self, q, rec, lo_diag, hi_diag, lo_q, hi_q, pad, flank):
+        """Banded local alignment of the seeded query span (+ flank) against the matching record region."""
+        q_start = max(0, lo_q - flank)
+        q_end = min(len(q), hi_q + self.k + flank)
+        rec_start = int(self.starts[rec])
+        rec_end = rec_start + int(self.lengths[rec])
+        w_start = max(rec_start, lo_diag + q_start - pad)
+        w_end = min(rec_end, hi_diag + q_end + pad)
+        segment = q[q_start:q_end]
+        window = self.seq[w_start:w_end].tobytes().decode("ascii")
+        # Seed diagonals in (segment, window) coordinates; the band must cover them plus pad,
+        # also when the query overhangs the start or end of the record
+        d_lo, d_hi = lo_diag + q_start - w_start, hi_diag + q_start - w_start
+        shift = len(window) - len(segment)
+        band = max(pad, min(0, shift) - (d_lo - pad), d_hi + pad - max(0, shift))
+        aln = alignment.align(segment, window, "local", band=band)
+        return replace(
+            aln,
+            start_a=q_start + aln.start_a, end_a=q_start + aln.end_a,
+            start_b=w_start - rec_start + aln.start_b, end_b=w_start - rec_start + aln.end_b,
+        )
+
+    def evalue(self, score, query_length):
+        """Expected number of chance alignments scoring at least `score` (Karlin-Altschul)."""
+        return KARLIN_K * query_length * self.total_bases * math.exp(-KARLIN_LAMBDA * score)
+
+    def search(self, query, max_hits=MAX_CANDIDATES, min_seeds=MIN_SEEDS, max_occurrences=MAX_OCCURRENCES,
+               pad=EXTENSION_PAD, flank=EXTENSION_FLANK, max_evalue=MAX_EVALUE):
+        """Ranked Hits of a DNA query against the database (both strands), up to `max_evalue`."""
+        query = sequence_tools.clean_sequence(query)
+        if len(query) < self.k:
+            return []
+        candidates = []
+        for strand, q in (("+", query), ("-", sequence_tools.complement(query)[::-1])):
+            qpos, dpos = self._seed(q, max_occurrences)
+            candidates += [(cluster[-1], strand, q, cluster[:-1])
+                           for cluster in self._clusters(qpos, dpos) if cluster[-1] >= min_seeds]
+        candidates.sort(key=lambda c: -c[0])
+
+        extended = []
+        for seeds, strand, q, cluster in candidates[:max_hits]:
+            aln = self._extend(q, *cluster, pad, flank)
+            if aln.score > 0:
+                extended.append((aln, seeds, strand, q, cluster))
+        # Nearby clusters often extend into the same HSP: keep the best-scoring
+        # alignment of each subject region per strand
+        extended.sort(key=lambda e: -e[0].score)
+        kept = []
+        for item in extended:
+            aln, _, strand, _, cluster = item
+            if not any(strand == other_strand and cluster[0] == other_cluster[0]
+                       and aln.start_b < other.end_b and other.start_b < aln.end_b
+                       for other, _, other_strand, _, other_cluster in kept):
+                kept.append(item)
+
+        hits = []
+        for aln, seeds, strand, q, cluster in kept:
+            evalue = self.evalue(aln.score, len(q))
+            if evalue > max_evalue:
+                continue
+            if strand == "+":
+                q_start, q_end = aln.start_a, aln.end_a
+            else:
+                q_start, q_end = len(q) - aln.end_a, len(q) - aln.start_a
+            rec = cluster[0]
+            hits.append(Hit(
+                self.names[rec], self.descriptions[rec], strand, aln.score, aln.identity,
+                q_start, q_end, aln.start_b, aln.end_b, seeds, len(q), evalue, aln,
+            ))
+        hits.sort(key=lambda h: -h.score)
+        return hits
+
+
+def index_exists(directory=INDEX_DIR):
+    return os.path.exists(os.path.join(directory, "records.json"))
+
+
+def load_index(directory=INDEX_DIR):
+    """SequenceIndex for `directory`, or None if no index has been built there."""
+    if not index_exists(directory):
+        return None
+    return SequenceIndex(directory)
+
+
+# =========================
+# CLI
+# =========================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the local k-mer sequence database.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="Index a FASTA file")
+    p_build.add_argument("fasta")
+    p_build.add_argument("-o", "--out", default=INDEX_DIR, help="Index directory")
+    p_build.add_argument("-k", type=int, default=DEFAULT_K, help=f"k-mer length (max {MAX_K})")
+
+    p_search = sub.add_parser("search", help="Search FASTA queries against an index")
+    p_search.add_argument("query", help="FASTA file of queries")
+    p_search.add_argument("--db", default=INDEX_DIR, help="Index directory")
+    p_search.add_argument("--max-hits", type=int, default=MAX_CANDIDATES)
+    p_search.add_argument("--evalue", type=float, default=MAX_EVALUE, help="Report hits up to this E-value")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.command == "build":
+        stats = build_index(args.fasta, args.out, args.k)
+        print(f"Indexed {stats['records']} records, {stats['bases']:,} bp, {stats['kmers']:,} {args.k}-mers "
+              f"in {time.perf_counter() - start:.1f} s -> {args.out}")
+        return
+
+    index = load_index(args.db)
+    if index is None:
+        parser.error(f"No index in {args.db}; run `build` first")
+    for name, _, seq in read_fasta(args.query):
+        t = time.perf_counter()
+        hits = index.search(seq, max_hits=args.max_hits, max_evalue=args.evalue)
+        print(f"# {name} ({len(seq)} bp): {len(hits)} hits in {(time.perf_counter() - t) * 1000:.0f} ms")
+        for hit in hits:
+            print(f"{hit.record}\t{hit.strand}\tscore={hit.score}\tidentity={hit.identity:.1f}%\t"
+                  f"query={hit.query_start + 1}-{hit.query_end}\tsubject={hit.subject_start + 1}-{hit.subject_end}\t"
+                  f"evalue={hit.evalue:.2g}\tseeds={hit.seeds}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Sequence helpers for the DNA Lab and the Advanced Molecular Suite.
+
+All operations work on whole strings or NumPy byte arrays (str.translate,
+bytes.count, table lookups) instead of per-character Python loops, so they
+scale from short primers to 100 Mb genomic inputs.
+"""
+import random
+
+import numpy as np
+
+# =========================
+# TABLES
+# =========================
+BASES = "ATGC"
+NUCLEOTIDE_MASS = {"A": 313.2, "T": 304.2, "C": 289.2, "G": 329.2}
+
+CODON_MAP = {
+    'ATA': 'I', 'ATC': 'I', 'ATT': 'I', 'ATG': 'M', 'ACA': 'T', 'ACC': 'T', 'ACG': 'T', 'ACT': 'T',
+    'AAC': 'N', 'AAT': 'N', 'AAA': 'K', 'AAG': 'K', 'AGC': 'S', 'AGT': 'S', 'AGA': 'R', 'AGG': 'R',
+    'CTA': 'L', 'CTC': 'L', 'CTG': 'L', 'CTT': 'L', 'CCA': 'P', 'CCC': 'P', 'CCG': 'P', 'CCT': 'P',
+    'CAC': 'H', 'CAT': 'H', 'CAA': 'Q', 'CAG': 'Q', 'CGA': 'R', 'CGC': 'R', 'CGG': 'R', 'CGT': 'R',
+    'GTA': 'V', 'GTC': 'V', 'GTG': 'V', 'GTT': 'V', 'GCA': 'A', 'GCC': 'A', 'GCG': 'A', 'GCT': 'A',
+    'GAC': 'D', 'GAT': 'D', 'GAA': 'E', 'GAG': 'E', 'GGA': 'G', 'GGC': 'G', 'GGG': 'G', 'GGT': 'G',
+    'TCA': 'S', 'TCC': 'S', 'TCG': 'S', 'TCT': 'S', 'TTC': 'F', 'TTT': 'F', 'TTA': 'L', 'TTG': 'L',
+    'TAC': 'Y', 'TAT': 'Y', 'TAA': '_', 'TAG': '_', 'TGC': 'C', 'TGT': 'C', 'TGA': '_', 'TGG': 'W',
+}
+
+# Byte -> base index (A=0, C=1, G=2, T=3, anything else=4)
+_BASE_INDEX = np.full(256, 4, dtype=np.uint8)
+for _i, _b in enumerate("ACGT"):
+    _BASE_INDEX[ord(_b)] = _i
+# Codon index 16*b1 + 4*b2 + b3 -> amino acid byte, plus a final '?' slot for invalid codons
+_CODON_TABLE = np.frombuffer(
+    "".join(CODON_MAP[a + b + c] for a in "ACGT" for b in "ACGT" for c in "ACGT").encode() + b"?",
+    dtype=np.uint8,
+)
+_NON_BASES = bytes(b for b in range(256) if chr(b) not in "ATGCatgc")
+_NOT_UPPER_BASES = bytes(b for b in range(256) if chr(b) not in "ATGC")
+_COMPLEMENT = bytes.maketrans(b"ATGC" + _NOT_UPPER_BASES, b"TACG" + b"N" * len(_NOT_UPPER_BASES))
+
+
+# =========================
+# OPERATIONS
+# =========================
+def clean_sequence(raw):
+    """Keep only A/T/G/C (any case), upper-cased."""
+    data = raw.encode("ascii", "ignore")
+    return data.translate(None, delete=_NON_BASES).decode("ascii").upper()
+
+
+def transcribe(seq):
+    """DNA -> mRNA (T -> U) of an already-cleaned sequence."""
+    return seq.replace("T", "U")
+
+
+def complement(seq):
+    """Base-pair complement; non-ATGC characters become N."""
+    return seq.encode("ascii", "replace").translate(_COMPLEMENT).decode("ascii")
+
+
+def base_counts(seq):
+    return {b: seq.count(b) for b in BASES}
+
+
+def gc_content(seq):
+    """GC percentage of the full string length (0 for an empty sequence)."""
+    if not seq:
+        return 0.0
+    counts = base_counts(seq)
+    return (counts["G"] + counts["C"]) / len(seq) * 100
+
+
+def molecular_weight(seq):
+    counts = base_counts(seq)
+    return sum(NUCLEOTIDE_MASS[b] * counts[b] for b in BASES)
+
+
+def translate(seq):
+    """Translate whole codons (frame 1); codons with non-ACGT letters give '?'."""
+    n_codons = len(seq) // 3
+    if n_codons == 0:
+        return ""
+    data = np.frombuffer(seq.encode("ascii", "replace"), dtype=np.uint8)[: n_codons * 3]
+    idx = _BASE_INDEX[data].reshape(n_codons, 3).astype(np.uint16)
+    codon = idx[:, 0] * 16 + idx[:, 1] * 4 + idx[:, 2]
+    codon[(idx == 4).any(axis=1)] = 64
+    return _CODON_TABLE[codon].tobytes().decode("ascii")
+
+
+def random_mutation(seq, rng=random):
+    """Substitute one random base; returns (mutated, position, old, new)."""
+    idx = rng.randint(0, len(seq) - 1)
+    old = seq[idx]
+    new = rng.choice([b for b in BASES if b != old])
+    return seq[:idx] + new + seq[idx + 1:], idx, old, new
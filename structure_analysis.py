@@ -0,0 +1,407 @@
+"""
+Geometry and property analysis for structures from the structure store.
+
+Everything works on the NumPy arrays built by structure_store, so whole
+assemblies (e.g. tetrameric hemoglobin or large cryo-EM models) are processed
+with array operations instead of per-residue Python loops.
+"""
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+from structure_store import NUCLEIC_CODES
+
+# =========================
+# CONSTANTS
+# =========================
+BACKBONE_ATOMS = ("N", "CA", "C", "O")
+PEPTIDE_BOND_MAX = 2.5      # Å, longer C(i)-N(i+1) distances are chain breaks
+HBOND_CA_CUTOFF = 9.0       # Å, DSSP only considers residue pairs this close
+HBOND_ENERGY_MAX = -0.5     # kcal/mol, Kabsch-Sander H-bond threshold
+
+# Average residue masses (Da) in a peptide chain; one water is added per chain
+RESIDUE_MASS = {
+    "A": 71.0788, "R": 156.1875, "N": 114.1038, "D": 115.0886, "C": 103.1388,
+    "E": 129.1155, "Q": 128.1307, "G": 57.0519, "H": 137.1411, "I": 113.1594,
+    "L": 113.1594, "K": 128.1741, "M": 131.1926, "F": 147.1766, "P": 97.1167,
+    "S": 87.0782, "T": 101.1051, "W": 186.2132, "Y": 163.1760, "V": 99.1326,
+}
+NUCLEOTIDE_MASS = {"A": 313.2, "T": 304.2, "C": 289.2, "G": 329.2, "U": 290.2}
+WATER_MASS = 18.0153
+
+# pKa values (EMBOSS set) for pI estimation
+PKA_POSITIVE = {"Nterm": 8.6, "K": 10.8, "R": 12.5, "H": 6.5}
+PKA_NEGATIVE = {"Cterm": 3.6, "D": 3.9, "E": 4.1, "C": 8.5, "Y": 10.1}
+
+
+# =========================
+# BACKBONE EXTRACTION
+# =========================
+def protein_residue_mask(structure):
+    """Polymer residues that are amino acids (not nucleotides)."""
+    is_nucleic = np.isin(structure.res_names, list(NUCLEIC_CODES))
+    return structure.res_polymer & ~is_nucleic
+
+
+def backbone_coords(structure):
+    """Return (residue_indices, (n, 4, 3) N/CA/C/O array) for complete protein residues."""
+    n_res = len(structure.res_names)
+    backbone = np.full((n_res, 4, 3), np.nan, dtype=np.float32)
+    for k, name in enumerate(BACKBONE_ATOMS):
+        atom_mask = structure.atom_names == name
+        backbone[structure.atom_residue[atom_mask], k] = structure.coords[atom_mask]
+
+    complete = ~np.isnan(backbone).any(axis=(1, 2)) & protein_residue_mask(structure)
+    residue_indices = np.flatnonzero(complete)
+    return residue_indices, backbone[residue_indices]
+
+
+def chain_breaks(structure, residue_indices, backbone):
+    """Boolean array: True where residue k is NOT bonded to residue k+1."""
+    same_chain = structure.res_chain[residue_indices[:-1]] == structure.res_chain[residue_indices[1:]]
+    peptide = np.linalg.norm(backbone[1:, 0] - backbone[:-1, 2], axis=1)
+    breaks = ~(same_chain & (peptide < PEPTIDE_BOND_MAX))
+    return np.append(breaks, True)
+
+
+# =========================
+# DIHEDRALS
+# =========================
+def dihedral(p0, p1, p2, p3):
+    """Vectorized dihedral angle (degrees) for (n, 3) point arrays."""
+    b0 = p0 - p1
+    b1 = p2 - p1
+    b2 = p3 - p2
+    b1 = b1 / np.linalg.norm(b1, axis=1, keepdims=True)
+    v = b0 - np.sum(b0 * b1, axis=1, keepdims=True) * b1
+    w = b2 - np.sum(b2 * b1, axis=1, keepdims=True) * b1
+    x = np.sum(v * w, axis=1)
+    y = np.sum(np.cross(b1, v) * w, axis=1)
+    return np.degrees(np.arctan2(y, x))
+
+
+def phi_psi(backbone, breaks):
+    """Backbone phi/psi (degrees); NaN where the neighbouring residue is missing."""
+    n = len(backbone)
+    phi = np.full(n, np.nan)
+    psi = np.full(n, np.nan)
+    if n < 2:
+        return phi, psi
+    N, CA, C = backbone[:, 0], backbone[:, 1], backbone[:, 2]
+    bonded = ~breaks[:-1]
+    phi[1:] = np.where(bonded, dihedral(C[:-1], N[1:], CA[1:], C[1:]), np.nan)
+    psi[:-1] = np.where(bonded, dihedral(N[:-1], CA[:-1], C[:-1], N[1:]), np.nan)
+    return phi, psi
+
+
+# =========================
+# DSSP-LIKE ASSIGNMENT
+# =========================
+def backbone_hbonds(backbone, breaks, res_names):
+    """Kabsch-Sander H-bonds as a sorted array of keys acceptor * n + donor."""
+    n = len(backbone)
+    N, CA, C, O = backbone[:, 0], backbone[:, 1], backbone[:, 2], backbone[:, 3]
+
+    # Amide hydrogen placed 1 Å from N, opposite the previous C=O
+    H = np.full_like(N, np.nan)
+    co = C[:-1] - O[:-1]
+    H[1:] = N[1:] + co / np.linalg.norm(co, axis=1, keepdims=True)
+    has_h = np.append(False, ~breaks[:-1]) & (res_names != "PRO")
+
+    pairs = cKDTree(CA).query_pairs(HBOND_CA_CUTOFF, output_type="ndarray")
+    if len(pairs) == 0:
+        return np.empty(0, dtype=np.int64)
+    # Every close pair is tested in both directions (acceptor i, donor j)
+    acc = np.concatenate([pairs[:, 0], pairs[:, 1]])
+    don = np.concatenate([pairs[:, 1], pairs[:, 0]])
+    keep = has_h[don] & (np.abs(acc - don) > 1)
+    acc, don = acc[keep], don[keep]
+
+    r_on = np.linalg.norm(O[acc] - N[don], axis=1)
+    r_ch = np.linalg.norm(C[acc] - H[don], axis=1)
+    r_oh = np.linalg.norm(O[acc] - H[don], axis=1)
+    r_cn = np.linalg.norm(C[acc] - N[don], axis=1)
+    energy = 0.084 * 332 * (1 / r_on + 1 / r_ch - 1 / r_oh - 1 / r_cn)
+
+    bonded = energy < HBOND_ENERGY_MAX
+    return np.sort(acc[bonded].astype(np.int64) * n + don[bonded])
+
+
+def _has_hbond(hbonds, n, acceptor, donor):
+    valid = (acceptor >= 0) & (acceptor < n) & (donor >= 0) & (donor < n)
+    if len(hbonds) == 0:
+        return np.zeros(len(acceptor), dtype=bool)
+    keys = np.where(valid, acceptor.astype(np.int64) * n + donor, -1)
+    pos = np.searchsorted(hbonds, keys).clip(max=len(hbonds) - 1)
+    return valid & (hbonds[pos] == keys)
+
+
+def _segment_ids(breaks):
+    # Residues share a segment id when connected by peptide bonds
+    return np.concatenate([[0], np.cumsum(breaks[:-1])])
+
+
+def assign_secondary_structure(backbone, breaks, res_names):
+    """Simplified DSSP: returns a per-residue array of 'H', 'G', 'I', 'E' or '-'."""
+    n = len(backbone)
+    ss = np.full(n, "-", dtype="U1")
+    if n < 3:
+        return ss
+    hbonds = backbone_hbonds(backbone, breaks, res_names)
+    segment = _segment_ids(breaks)
+    idx = np.arange(n)
+
+    # Helices: two consecutive n-turns at i-1 and i give a minimal helix i..i+n-1
+    for code, turn in (("I", 5), ("G", 3), ("H", 4)):
+        partner = np.minimum(idx + turn, n - 1)
+        is_turn = _has_hbond(hbonds, n, idx, idx + turn) & (segment[partner] == segment)
+        start = np.flatnonzero(is_turn[1:] & is_turn[:-1]) + 1
+        if len(start):
+            members = (start[:, None] + np.arange(turn)[None, :]).ravel()
+            ss[members[members < n]] = code
+
+    # Sheets: parallel and antiparallel bridges between residue pairs close in space
+    pairs = cKDTree(backbone[:, 1]).query_pairs(HBOND_CA_CUTOFF - 2.5, output_type="ndarray")
+    if len(pairs):
+        i, j = pairs[:, 0], pairs[:, 1]
+        far = np.abs(i - j) > 2
+        i, j = i[far], j[far]
+        def hb(acceptor, donor):
+            return _has_hbond(hbonds, n, acceptor, donor)
+
+        parallel = (hb(i - 1, j) & hb(j, i + 1)) | (hb(j - 1, i) & hb(i, j + 1))
+        antiparallel = (hb(i, j) & hb(j, i)) | (hb(i - 1, j + 1) & hb(j - 1, i + 1))
+        bridge = parallel | antiparallel
+        strand = np.zeros(n, dtype=bool)
+        strand[i[bridge]] = True
+        strand[j[bridge]] = True
+        # Helix assignment takes priority, as in DSSP
+        ss[strand & (ss != "H")] = "E"
+    return ss
+
+
+# =========================
+# SEQUENCE PROPERTIES
+# =========================
+def _composition(sequence, alphabet):
+    codes = np.frombuffer(sequence.encode("ascii", "replace"), dtype=np.uint8)
+    counts = np.bincount(codes, minlength=256)
+    return {aa: int(counts[ord(aa)]) for aa in alphabet}
+
+
+def net_charge(composition, n_chains, ph):
+    """Net charge at each pH value in the array `ph`."""
+    ph = np.asarray(ph, dtype=float)
+    positive = n_chains / (1 + 10 ** (ph - PKA_POSITIVE["Nterm"]))
+    negative = n_chains / (1 + 10 ** (PKA_NEGATIVE["Cterm"] - ph))
+    for aa in ("K", "R", "H"):
+        positive = positive + composition.get(aa, 0) / (1 + 10 ** (ph - PKA_POSITIVE[aa]))
+    for aa in ("D", "E", "C", "Y"):
+        negative = negative + composition.get(aa, 0) / (1 + 10 ** (PKA_NEGATIVE[aa] - ph))
+    return positive - negative
+
+
+def isoelectric_point(composition, n_chains):
+    ph = np.linspace(0, 14, 1401)
+    charge = net_charge(composition, n_chains, ph)
+    return round(float(ph[np.argmin(np.abs(charge))]), 2)
+
+
+def sequence_properties(protein_sequences, nucleic_sequences=()):
+    """Molecular weight (Da) of all chains and pI of the protein part (None if no protein)."""
+    protein = "".join(protein_sequences)
+    nucleic = "".join(nucleic_sequences)
+    aa_comp = _composition(protein, RESIDUE_MASS)
+    nt_comp = _composition(nucleic, NUCLEOTIDE_MASS)
+
+    mw = sum(RESIDUE_MASS[aa] * count for aa, count in aa_comp.items())
+    mw += WATER_MASS * len(protein_sequences)
+    mw += sum(NUCLEOTIDE_MASS[nt] * count for nt, count in nt_comp.items())
+    pi = isoelectric_point(aa_comp, len(protein_sequences)) if protein else None
+    return {"mw": mw, "pi": pi}
+
+
+# =========================
+# FULL ANALYSIS
+# =========================
+def analyze_structure(structure):
+    """Secondary structure fractions, dihedrals and sequence properties for one structure."""
+    residue_indices, backbone = backbone_coords(structure)
+    if len(residue_indices):
+        breaks = chain_breaks(structure, residue_indices, backbone)
+        res_names = structure.res_names[residue_indices]
+        phi, psi = phi_psi(backbone, breaks)
+        ss = assign_secondary_structure(backbone, breaks, res_names)
+    else:
+        phi = psi = np.empty(0)
+        ss = np.empty(0, dtype="U1")
+
+    n_protein = int(protein_residue_mask(structure).sum())
+    helix = int(np.isin(ss, ["H", "G", "I"]).sum())
+    sheet = int((ss == "E").sum())
+
+    chain_is_nucleic = {}
+    nucleic_mask = np.isin(structure.res_names, list(NUCLEIC_CODES)) & structure.res_polymer
+    for chain_id in structure.sequences:
+        in_chain = (structure.res_chain == chain_id) & structure.res_polymer
+        chain_is_nucleic[chain_id] = bool(in_chain.any() and nucleic_mask[in_chain].all())
+    props = sequence_properties(
+        [seq for cid, seq in structure.sequences.items() if not chain_is_nucleic[cid]],
+        [seq for cid, seq in structure.sequences.items() if chain_is_nucleic[cid]],
+    )
+
+    return {
+        "residue_indices": residue_indices,
+        "phi": phi,
+        "psi": psi,
+        "ss": ss,
+        "helix": helix / n_protein if n_protein else 0.0,
+        "sheet": sheet / n_protein if n_protein else 0.0,
+        "mw": props["mw"],
+        "pi": props["pi"],
+    }
+
+
+# =========================
+# BINDING POCKETS
+# =========================
+POCKET_GRID_SPACING = 1.0   # Å
+POCKET_ATOM_RADIUS = 1.8    # Å, grid points this close to an atom are protein
+POCKET_PROBE_CLEARANCE = 3.0  # Å, pocket points must be at least this far from any atom
+POCKET_MIN_ENCLOSURE = 5    # of 7 scan lines (3 axes + 4 body diagonals) hitting protein on both sides
+POCKET_MIN_POINTS = 10
+POCKET_LINING_CUTOFF = 4.0  # Å, residues with an atom this close to the pocket line it
+LIGAND_CONTACT_CUTOFF = 5.0  # Å
+LIGAND_MIN_HEAVY_ATOMS = 2   # single heavy atoms are ions
+# Crystallization additives and buffer components, rarely the ligand of interest
+LIGAND_ADDITIVES = (
+    "GOL", "EDO", "PEG", "PGE", "PG4", "1PE", "SO4", "PO4", "ACT", "FMT", "DMS", "MPD",
+    "TRS", "EPE", "MES", "CIT", "IMD", "BME", "NO3", "SCN",
+)
+MAX_GRID_POINTS = 2_000_000
+
+
+def _ligand_residues(structure):
+    """Bound-ligand residue indices, largest (heavy atoms) first; waters, ions and additives dropped."""
+    heavy = ~np.isin(np.char.upper(structure.elements), ("H", "D"))
+    counts = np.bincount(structure.atom_residue[heavy], minlength=len(structure.res_names))
+    candidate = (
+        ~structure.res_polymer & ~structure.res_water
+        & (counts >= LIGAND_MIN_HEAVY_ATOMS)
+        & ~np.isin(structure.res_names, LIGAND_ADDITIVES)
+    )
+    residues = np.flatnonzero(candidate)
+    return residues[np.argsort(-counts[residues], kind="stable")]
+
+
+def _residues_near_polymer(structure, polymer_index, points, cutoff):
+    # Query polymer atoms against a tree of the (few) pocket points
+    dist, _ = cKDTree(points).query(structure.coords[polymer_index], distance_upper_bound=cutoff)
+    return np.unique(structure.atom_residue[polymer_index[np.isfinite(dist)]])
+
+
+def _diagonal_seen(occupied, dy, dz):
+    # Protein seen so far when walking the grid along the (1, dy, dz) diagonal
+    seen = occupied.copy()
+    cur_y, prev_y = (slice(1, None), slice(None, -1)) if dy == 1 else (slice(None, -1), slice(1, None))
+    cur_z, prev_z = (slice(1, None), slice(None, -1)) if dz == 1 else (slice(None, -1), slice(1, None))
+    for i in range(1, seen.shape[0]):
+        seen[i, cur_y, cur_z] |= seen[i - 1, prev_y, prev_z]
+    return seen
+
+
+def enclosure_counts(occupied):
+    """LIGSITE-style count of scan lines with protein on both sides of each grid point."""
+    counts = np.zeros(occupied.shape, dtype=np.int8)
+    for axis in range(3):
+        forward = np.logical_or.accumulate(occupied, axis=axis)
+        backward = np.flip(np.logical_or.accumulate(np.flip(occupied, axis), axis=axis), axis)
+        counts += forward & backward
+    flipped = occupied[::-1, ::-1, ::-1]
+    for dy, dz in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+        forward = _diagonal_seen(occupied, dy, dz)
+        backward = _diagonal_seen(flipped, dy, dz)[::-1, ::-1, ::-1]
+        counts += forward & backward
+    return counts
+
+
+def _grid_pockets(protein_coords, tree):
+    """Enclosed empty grid points grouped into connected clusters, largest first."""
+    lo = protein_coords.min(axis=0)
+    hi = protein_coords.max(axis=0)
+    spacing = POCKET_GRID_SPACING
+    # Coarsen the grid for very large assemblies to keep memory bounded
+    while np.prod(np.ceil((hi - lo) / spacing) + 1) > MAX_GRID_POINTS:
+        spacing *= 1.25
+    axes = [np.arange(lo[k], hi[k] + spacing, spacing) for k in range(3)]
+    shape = tuple(len(a) for a in axes)
+    grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+
+    nearest, _ = tree.query(grid, distance_upper_bound=POCKET_PROBE_CLEARANCE)
+    occupied = (nearest < POCKET_ATOM_RADIUS).reshape(shape)
+    enclosed = enclosure_counts(occupied).ravel() >= POCKET_MIN_ENCLOSURE
+    pocket_points = grid[enclosed & np.isinf(nearest)]
+    if len(pocket_points) < POCKET_MIN_POINTS:
+        return [], spacing
+
+    # Connected components over neighbouring grid points
+    pairs = cKDTree(pocket_points).query_pairs(spacing * 1.01, output_type="ndarray")
+    n_points = len(pocket_points)
+    graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(n_points, n_points))
+    _, labels = connected_components(graph, directed=False)
+    sizes = np.bincount(labels)
+    order = np.argsort(sizes)[::-1]
+    clusters = [pocket_points[labels == label] for label in order if sizes[label] >= POCKET_MIN_POINTS]
+    return clusters, spacing
+
+
+def find_pockets(structure, max_pockets=3):
+    """
+    Active-site candidates as residue selections.
+
+    Residues in contact with bound ligands are reported first; otherwise buried
+    cavities are found on a grid using a KD-tree over protein atoms.
+    """
+    polymer_atoms = structure.res_polymer[structure.atom_residue]
+    if not polymer_atoms.any():
+        return []
+    tree = cKDTree(structure.coords[polymer_atoms])
+    polymer_index = np.flatnonzero(polymer_atoms)
+    pockets = []
+
+    for res in _ligand_residues(structure):
+        if len(pockets) == max_pockets:
+            break
+        points = structure.coords[structure.atom_residue == res]
+        lining = _residues_near_polymer(structure, polymer_index, points, LIGAND_CONTACT_CUTOFF)
+        if len(lining):
+            pockets.append({
+                "source": f"Ligand {structure.res_names[res]} {structure.res_chain[res]}{structure.res_seq[res]}",
+                "center": points.mean(axis=0),
+                "volume": None,
+                "residues": lining,
+            })
+    if not pockets:
+        clusters, spacing = _grid_pockets(structure.coords[polymer_atoms], tree)
+        for points in clusters[:max_pockets]:
+            pockets.append({
+                "source": "Cavity",
+                "center": points.mean(axis=0),
+                "volume": len(points) * spacing ** 3,
+                "residues": _residues_near_polymer(structure, polymer_index, points, POCKET_LINING_CUTOFF),
+            })
+    return pockets
+
+
+def pocket_selections(structure, residues):
+    """py3Dmol selections ({'chain', 'resi'}) for a set of residue indices."""
+    selections = []
+    for chain_id in np.unique(structure.res_chain[residues]):
+        in_chain = residues[structure.res_chain[residues] == chain_id]
+        selections.append({"chain": str(chain_id), "resi": [int(r) for r in structure.res_seq[in_chain]]})
+    return selections
+
+
+def describe_residues(structure, residues):
+    return [f"{structure.res_names[r]}{structure.res_seq[r]}:{structure.res_chain[r]}" for r in residues]
@@ -0,0 +1,161 @@
+"""
+Level-of-detail representations for the Bio-Nexus 3D Viewer.
+
+Large complexes stall the browser (especially on phones) when the full model is
+sent and py3Dmol has to build a VDW surface client-side. These helpers derive
+lighter representations from a parsed Structure on the server: the polymer
+without waters/ligands, a CA/P trace, and a coarse precomputed surface mesh.
+"""
+import os
+
+import numpy as np
+from scipy.ndimage import gaussian_filter
+from skimage.measure import marching_cubes
+
+# =========================
+# PAYLOAD LIMITS
+# =========================
+# Largest model text sent to the browser in automatic mode
+LOD_PAYLOAD_LIMIT = int(os.environ.get("BIO_LOD_PAYLOAD_BYTES", 1_500_000))
+# Hard cap even when the user asks for full detail
+FULL_PAYLOAD_LIMIT = int(os.environ.get("BIO_FULL_PAYLOAD_BYTES", 25_000_000))
+SURFACE_MAX_VERTICES = 4_000
+TRACE_ATOMS = ("CA", "P")
+
+LEVEL_LABELS = {
+    "full": "Full model",
+    "polymer": "Polymer only (waters/ligands stripped)",
+    "trace": "CA trace",
+}
+
+
+# =========================
+# MMCIF WRITER
+# =========================
+# mmCIF has no fixed-width columns: chain IDs of any length and residue/atom
+# numbers past 9999/99999 survive intact, so py3Dmol's {"chain", "resi"}
+# selections (auth_asym_id / auth_seq_id) match the parsed Structure.
+_ATOM_SITE_FIELDS = (
+    "group_PDB", "id", "type_symbol", "label_atom_id", "label_alt_id", "label_comp_id",
+    "label_asym_id", "label_seq_id", "pdbx_PDB_ins_code", "Cartn_x", "Cartn_y", "Cartn_z",
+    "occupancy", "B_iso_or_equiv", "auth_seq_id", "auth_comp_id", "auth_asym_id",
+    "auth_atom_id", "pdbx_PDB_model_num",
+)
+CIF_BYTES_PER_ATOM = 96   # generous size of one _atom_site row, so sizes are known before writing
+
+
+def _cif_token(value):
+    value = str(value)
+    if not value:
+        return "."
+    if "'" in value or " " in value or value[0] in "_#$;\"[":
+        return f'"{value}"'
+    return value
+
+
+def to_cif_text(structure, atom_mask):
+    """Write the selected atoms as an mmCIF _atom_site loop."""
+    idx = np.flatnonzero(atom_mask)
+    res = structure.atom_residue[idx]
+    coords = structure.coords[idx]
+    polymer = structure.res_polymer[res]
+    lines = [f"data_{structure.pdb_id or 'model'}", "loop_"]
+    lines += [f"_atom_site.{field}" for field in _ATOM_SITE_FIELDS]
+    for k, (i, r) in enumerate(zip(idx, res)):
+        name = _cif_token(structure.atom_names[i])
+        res_name = _cif_token(structure.res_names[r])
+        chain = _cif_token(structure.res_chain[r])
+        seq = int(structure.res_seq[r])
+        x, y, z = coords[k]
+        lines.append(
+            f"{'ATOM' if polymer[k] else 'HETATM'} {k + 1} {_cif_token(structure.elements[i])} {name} . "
+            f"{res_name} {chain} {seq} ? {x:.3f} {y:.3f} {z:.3f} 1.00 0.00 {seq} {res_name} {chain} {name} 1"
+        )
+    lines.append("#")
+    return "\n".join(lines)
+
+
+# =========================
+# REPRESENTATIONS
+# =========================
+def polymer_atom_mask(structure):
+    return structure.res_polymer[structure.atom_residue]
+
+
+def trace_atom_mask(structure, stride=1):
+    """CA (protein) / P (nucleic acid) atoms of every `stride`-th polymer residue."""
+    mask = np.isin(structure.atom_names, TRACE_ATOMS) & polymer_atom_mask(structure)
+    if stride > 1:
+        mask &= (structure.atom_residue % stride) == 0
+    return mask
+
+
+def build_representation(structure, full_detail=False):
+    """
+    Pick the most detailed representation that fits the payload budget.
+
+    Returns a dict with the model `text`/`fmt` for py3Dmol plus the chosen
+    `level`, residue `stride` and payload size in `bytes`.
+    """
+    limit = FULL_PAYLOAD_LIMIT if full_detail else LOD_PAYLOAD_LIMIT
+    if len(structure.text) <= limit:
+        return {"level": "full", "text": structure.text, "fmt": structure.fmt,
+                "stride": 1, "bytes": len(structure.text)}
+
+    polymer = polymer_atom_mask(structure)
+    if polymer.sum() * CIF_BYTES_PER_ATOM <= limit:
+        text = to_cif_text(structure, polymer)
+        return {"level": "polymer", "text": text, "fmt": "cif", "stride": 1, "bytes": len(text)}
+
+    stride = 1
+    while trace_atom_mask(structure, stride).sum() * CIF_BYTES_PER_ATOM > limit:
+        stride += 1
+    text = to_cif_text(structure, trace_atom_mask(structure, stride))
+    return {"level": "trace", "text": text, "fmt": "cif", "stride": stride, "bytes": len(text)}
+
+
+def coarse_surface(structure, spacing=2.0, max_vertices=SURFACE_MAX_VERTICES):
+    """
+    Blurred-density isosurface of the polymer, as vertex/normal/face arrays.
+
+    The grid spacing grows until the mesh fits within `max_vertices`.
+    """
+    coords = structure.coords[polymer_atom_mask(structure)].astype(np.float64)
+    if len(coords) == 0:
+        return None
+    while True:
+        padding = 3 * spacing
+        lo = coords.min(axis=0) - padding
+        hi = coords.max(axis=0) + padding
+        bins = [np.arange(lo[k], hi[k] + spacing, spacing) for k in range(3)]
+        density, _ = np.histogramdd(coords, bins=bins)
+        # One-Ångström-ish blur around each atom, expressed in grid cells
+        sigma = max(1.6 / spacing, 0.6)
+        density = gaussian_filter(density, sigma=sigma)
+        single_atom_peak = 1.0 / ((2 * np.pi) ** 1.5 * sigma ** 3)
+        level = min(0.5 * single_atom_peak, 0.5 * density.max())
+        verts, faces, normals, _ = marching_cubes(density, level=level, spacing=(spacing,) * 3)
+        if len(verts) <= max_vertices:
+            break
+        spacing *= 1.4
+    # Histogram bins are cell edges; marching cubes works on cell centres
+    verts = verts + lo + spacing / 2
+    return {
+        "vertices": verts.astype(np.float32),
+        "normals": normals.astype(np.float32),
+        "faces": faces.astype(np.int32),
+        "spacing": spacing,
+    }
+
+
+def surface_shape_spec(surface, color="white", opacity=0.3):
+    """Spec for py3Dmol's addCustom() built from a coarse_surface() mesh."""
+    verts = np.round(surface["vertices"], 1).tolist()
+    normals = np.round(surface["normals"], 2).tolist()
+    return {
+        "vertexArr": [{"x": x, "y": y, "z": z} for x, y, z in verts],
+        "normalArr": [{"x": x, "y": y, "z": z} for x, y, z in normals],
+        "faceArr": surface["faces"].ravel().tolist(),
+        "color": color,
+        "opacity": opacity,
+    }
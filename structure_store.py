@@ -0,0 +1,234 @@
+"""
+Server-side structure store for the Bio-Nexus 3D Viewer.
+
+Structures are read from a local directory of PDB/mmCIF files (or fetched once
+from RCSB into a cache directory), parsed a single time with Biopython and kept
+as compact NumPy arrays next to the raw model text that py3Dmol renders.
+"""
+import gzip
+import io
+import os
+import re
+import tempfile
+from dataclasses import dataclass, field
+
+import numpy as np
+import requests
+from Bio.Data.PDBData import nucleic_letters_3to1_extended, protein_letters_3to1_extended
+from Bio.PDB import MMCIFParser, PDBParser
+from Bio.SeqUtils import seq1
+
+import metrics
+
+# =========================
+# CONFIGURATION
+# =========================
+# Curated structures shipped with the app (e.g. NCBS models) live here
+STRUCTURE_DIR = os.environ.get("BIO_STRUCTURE_DIR", "structures")
+# Structures downloaded from RCSB are kept here so each one is fetched only once
+FETCH_CACHE_DIR = os.environ.get("BIO_STRUCTURE_CACHE", os.path.join(".cache", "pdb"))
+RCSB_URL = "https://files.rcsb.org/download/{pdb_id}.cif"
+
+PDB_ID_PATTERN = re.compile(r"^[0-9][A-Za-z0-9]{3}$")
+FILE_FORMATS = {
+    ".pdb": "pdb", ".ent": "pdb", ".pdb.gz": "pdb", ".ent.gz": "pdb",
+    ".cif": "cif", ".mmcif": "cif", ".cif.gz": "cif",
+}
+NUCLEIC_CODES = {
+    "A": "A", "C": "C", "G": "G", "U": "U", "T": "T", "I": "I",
+    "DA": "A", "DC": "C", "DG": "G", "DT": "T", "DU": "U", "DI": "I",
+}
+# Modified residues (MSE, SEP, PSU...) are written as HETATM inside a chain;
+# they belong to the polymer when their backbone is bonded to a neighbour.
+PEPTIDE_LINK = ("C", "N")        # C(i) - N(i+1)
+PHOSPHODIESTER_LINK = ("O3'", "P")  # O3'(i) - P(i+1)
+BACKBONE_BOND_CUTOFF = 2.0       # Å
+
+
+@dataclass
+class Structure:
+    pdb_id: str
+    fmt: str                # "pdb" or "cif", as understood by py3Dmol.addModel
+    text: str               # raw model text handed to the viewer
+    classification: str
+    # Per-atom arrays (first model only)
+    coords: np.ndarray      # (n_atoms, 3) float32
+    atom_names: np.ndarray  # (n_atoms,) str
+    elements: np.ndarray    # (n_atoms,) str
+    atom_residue: np.ndarray  # (n_atoms,) int32 index into the residue arrays
+    # Per-residue arrays
+    res_names: np.ndarray   # (n_residues,) str
+    res_seq: np.ndarray     # (n_residues,) int32 author residue number
+    res_chain: np.ndarray   # (n_residues,) str
+    res_polymer: np.ndarray  # (n_residues,) bool, False for ligands and water
+    res_water: np.ndarray   # (n_residues,) bool
+    sequences: dict = field(default_factory=dict)  # chain id -> one-letter sequence
+
+    @property
+    def n_atoms(self):
+        return len(self.coords)
+
+    @property
+    def n_chains(self):
+        return len(self.sequences)
+
+    @property
+    def n_residues(self):
+        return int(self.res_polymer.sum())
+
+
+# =========================
+# LOCATING FILES
+# =========================
+def normalize_pdb_id(pdb_id):
+    pdb_id = str(pdb_id).strip().upper()
+    if not PDB_ID_PATTERN.match(pdb_id):
+        raise ValueError(f"'{pdb_id}' is not a valid 4-character PDB ID.")
+    return pdb_id
+
+
+def find_local_file(pdb_id, directories=None):
+    """Return (path, fmt) of a local copy of the structure, or None."""
+    pdb_id = normalize_pdb_id(pdb_id)
+    for directory in directories or [STRUCTURE_DIR, FETCH_CACHE_DIR]:
+        if not os.path.isdir(directory):
+            continue
+        for stem in (pdb_id, pdb_id.lower(), f"pdb{pdb_id.lower()}"):
+            for ext, fmt in FILE_FORMATS.items():
+                path = os.path.join(directory, stem + ext)
+                if os.path.exists(path):
+                    return path, fmt
+    return None
+
+
+@metrics.external("rcsb")
+def fetch_structure_file(pdb_id, cache_dir=None, timeout=30):
+    """Download the mmCIF file from RCSB into the fetch cache and return its path."""
+    pdb_id = normalize_pdb_id(pdb_id)
+    cache_dir = cache_dir or FETCH_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    response = requests.get(RCSB_URL.format(pdb_id=pdb_id), timeout=timeout)
+    response.raise_for_status()
+
+    path = os.path.join(cache_dir, f"{pdb_id}.cif")
+    # Unique temp file + atomic rename, so concurrent sessions (threads of one process
+    # included) never see or publish a half-written file
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+    try:
+        with os.fdopen(fd, "w") as handle:
+            handle.write(response.text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return path
+
+
+def read_model_text(path):
+    if path.endswith(".gz"):
+        with gzip.open(path, "rt") as handle:
+            return handle.read()
+    with open(path) as handle:
+        return handle.read()
+
+
+# =========================
+# PARSING
+# =========================
+def _one_letter(res_name):
+    res_name = res_name.strip()
+    if res_name in NUCLEIC_CODES:
+        return NUCLEIC_CODES[res_name]
+    # The extended tables map modified residues to their parent (MSE -> M)
+    return (protein_letters_3to1_extended.get(res_name)
+            or nucleic_letters_3to1_extended.get(res_name)
+            or seq1(res_name))
+
+
+def _bonded(first, second):
+    """True when `first` is peptide- or phosphodiester-bonded to the following residue `second`."""
+    for left, right in (PEPTIDE_LINK, PHOSPHODIESTER_LINK):
+        if left in first and right in second:
+            if np.linalg.norm(first[left].get_coord() - second[right].get_coord()) <= BACKBONE_BOND_CUTOFF:
+                return True
+    return False
+
+
+def _polymer_flags(residues):
+    """Standard residues, plus HETATM residues bonded into the chain through their backbone."""
+    flags = [residue.id[0] == " " for residue in residues]
+    for i, residue in enumerate(residues):
+        if flags[i] or residue.id[0] == "W":
+            continue
+        flags[i] = ((i > 0 and _bonded(residues[i - 1], residue))
+                    or (i + 1 < len(residues) and _bonded(residue, residues[i + 1])))
+    return flags
+
+
+def parse_structure(pdb_id, text, fmt):
+    """Parse model text into a Structure with NumPy coordinate arrays."""
+    if fmt == "cif":
+        parser = MMCIFParser(QUIET=True)
+    else:
+        parser = PDBParser(QUIET=True)
+    bio_structure = parser.get_structure(pdb_id, io.StringIO(text))
+    model = next(iter(bio_structure))
+
+    coords, atom_names, elements, atom_residue = [], [], [], []
+    res_names, res_seq, res_chain, res_polymer, res_water = [], [], [], [], []
+    sequences = {}
+
+    for chain in model:
+        chain_seq = []
+        residues = list(chain)
+        for residue, in_polymer in zip(residues, _polymer_flags(residues)):
+            res_index = len(res_names)
+            res_names.append(residue.get_resname().strip())
+            res_seq.append(residue.id[1])
+            res_chain.append(chain.id)
+            res_polymer.append(in_polymer)
+            res_water.append(residue.id[0] == "W")
+            if in_polymer:
+                chain_seq.append(_one_letter(residue.get_resname()))
+
+            for atom in residue.get_atoms():
+                # Keep only the first alternate location of disordered atoms
+                coords.append(atom.get_coord())
+                atom_names.append(atom.get_name())
+                elements.append(atom.element or atom.get_name()[:1])
+                atom_residue.append(res_index)
+
+        if chain_seq:
+            sequences[chain.id] = "".join(chain_seq)
+
+    header = getattr(bio_structure, "header", {}) or {}
+    classification = str(header.get("head") or header.get("name") or "Protein").strip().title()
+
+    return Structure(
+        pdb_id=pdb_id,
+        fmt=fmt,
+        text=text,
+        classification=classification or "Protein",
+        coords=np.asarray(coords, dtype=np.float32).reshape(-1, 3),
+        atom_names=np.asarray(atom_names, dtype="U4"),
+        elements=np.asarray(elements, dtype="U2"),
+        atom_residue=np.asarray(atom_residue, dtype=np.int32),
+        res_names=np.asarray(res_names, dtype="U5"),   # CCD codes run to 5 characters
+        res_seq=np.asarray(res_seq, dtype=np.int32),
+        res_chain=np.asarray(res_chain, dtype="U4"),
+        res_polymer=np.asarray(res_polymer, dtype=bool),
+        res_water=np.asarray(res_water, dtype=bool),
+        sequences=sequences,
+    )
+
+
+def load_structure(pdb_id, allow_fetch=True):
+    """Load a structure from the local store, fetching it once if needed."""
+    pdb_id = normalize_pdb_id(pdb_id)
+    found = find_local_file(pdb_id)
+    if found is None:
+        if not allow_fetch:
+            raise FileNotFoundError(f"{pdb_id} is not in the local structure store.")
+        found = (fetch_structure_file(pdb_id), "cif")
+    path, fmt = found
+    return parse_structure(pdb_id, read_model_text(path), fmt)
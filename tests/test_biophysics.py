@@ -0,0 +1,19 @@
+import numpy as np
+
+import biophysics
+
+
+def test_recoil_fit_ignores_pre_cut_samples_and_flags_short_curves():
+    t = np.linspace(-2, 5, 71)
+    curve = np.where(t > 0, 2 * (1 - np.exp(-t / 0.8)), 0.01)
+    times = np.stack([t, np.full_like(t, -1.0), t])
+    values = np.stack([curve, np.zeros_like(t), curve])
+    mask = np.ones(times.shape, dtype=bool)
+    mask[2, t > 0.1] = False   # only t = 0 and one point after the cut
+
+    fits = biophysics.fit_kelvin_voigt_batch(times, values, mask)
+
+    assert list(fits["fitted"]) == [True, False, False]
+    assert np.isclose(fits["tau"][0], 0.8, rtol=1e-3)
+    assert np.isclose(fits["amplitude"][0], 2.0, rtol=1e-3)
+    assert np.isnan(fits["tau"][1:]).all()
@@ -0,0 +1,31 @@
+import numpy as np
+import tifffile
+
+import image_pipeline
+
+TILE = 256
+
+
+def _unevenly_lit_plane():
+    """Two tiles of 4 x 4 cells; the right tile is lit more brightly, background included."""
+    plane = np.zeros((TILE, 2 * TILE), dtype=np.uint8)
+    plane[:, TILE:] = 80
+    for tile in range(2):
+        for row in range(4):
+            for col in range(4):
+                r, c = 20 + row * 60, tile * TILE + 20 + col * 60
+                plane[r:r + 40, c:c + 40] = (150, 250)[tile]
+    return plane
+
+
+def test_per_tile_otsu_separates_cells_on_a_bright_background(tmp_path):
+    path = str(tmp_path / "stack.tif")
+    tifffile.imwrite(path, np.stack([_unevenly_lit_plane()] * 2))
+
+    per_tile = image_pipeline.analyze_stack(path, workers=1, tile_size=TILE)
+    stack_wide = image_pipeline.analyze_stack(path, workers=1, threshold_mode="global", tile_size=TILE)
+
+    assert per_tile["summary"]["Threshold_Mode"] == "Per-tile Otsu"
+    assert per_tile["summary"]["Cell_Count"] == 2 * 32
+    # The stack-wide level sits below the right tile's background, which merges into one region
+    assert stack_wide["summary"]["Cell_Count"] < per_tile["summary"]["Cell_Count"]
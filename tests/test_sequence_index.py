@@ -0,0 +1,24 @@
+import random
+
+import sequence_index
+
+
+def _random_dna(rng, length):
+    return "".join(rng.choice("ACGT") for _ in range(length))
+
+
+def test_overlapping_hits_on_one_subject_region_are_reported_once(tmp_path):
+    rng = random.Random(1)
+    repeat = _random_dna(rng, 300)
+    # The subject holds two copies of the repeat; a query of two copies seeds on
+    # several diagonals whose extensions overlap on the subject
+    subject = _random_dna(rng, 1000) + repeat + _random_dna(rng, 40) + repeat + _random_dna(rng, 1000)
+    fasta = tmp_path / "db.fa"
+    fasta.write_text(f">s1 tandem repeat\n{subject}\n")
+    sequence_index.build_index(str(fasta), str(tmp_path / "db"), k=11)
+    index = sequence_index.load_index(str(tmp_path / "db"))
+
+    hits = index.search(repeat + repeat)
+
+    assert [(h.strand, h.subject_start, h.subject_end) for h in hits] == [("+", 1000, 1640)]
+    assert hits[0].query_start == 0 and hits[0].query_end == 600
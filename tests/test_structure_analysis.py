@@ -0,0 +1,17 @@
+import numpy as np
+
+import structure_analysis
+import structure_lod
+import structure_store
+from test_structure_store import _selenomethionine_chain
+
+
+def test_ligand_candidates_skip_modified_residues_and_keep_long_codes():
+    structure = structure_store.parse_structure("1MSE", _selenomethionine_chain(), "pdb")
+    # Rename the sulfate to a 5-character CCD code, only expressible in mmCIF
+    structure.res_names = np.array(["ALA", "MSE", "GLY", "A1ABC", "HOH"])
+    text = structure_lod.to_cif_text(structure, np.ones(len(structure.coords), dtype=bool))
+    structure = structure_store.parse_structure("1MSE", text, "cif")
+
+    assert structure.res_names[3] == "A1ABC"
+    assert list(structure_analysis._ligand_residues(structure)) == [3]
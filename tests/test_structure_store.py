@@ -0,0 +1,39 @@
+import structure_store
+
+# Backbone atoms of one residue, relative to its N; consecutive residues sit
+# 3.8 Å apart so C(i) - N(i+1) is 1.6 Å, within peptide-bond distance.
+BACKBONE = (("N", "N", 0.0, 0.0), ("CA", "C", 1.45, 0.0), ("C", "C", 2.45, 0.9), ("O", "O", 2.3, 2.1))
+SIDE_CHAINS = {
+    "ALA": (("CB", "C", 1.45, -1.5),),
+    "MSE": (("CB", "C", 1.45, -1.5), ("CG", "C", 1.45, -3.0), ("SE", "SE", 1.45, -4.9), ("CE", "C", 1.45, -6.8)),
+    "GLY": (),
+}
+
+
+def _atom_line(record, serial, name, res_name, chain, res_seq, x, y, z, element):
+    return (f"{record:<6}{serial:>5} {name:<4} {res_name:>3} {chain}{res_seq:>4}    "
+            f"{x:8.3f}{y:8.3f}{z:8.3f}{1.0:6.2f}{0.0:6.2f}          {element:>2}")
+
+
+def _selenomethionine_chain():
+    lines, serial = [], 0
+    for i, (record, res_name) in enumerate((("ATOM", "ALA"), ("HETATM", "MSE"), ("ATOM", "GLY"))):
+        for name, element, dx, dy in BACKBONE + SIDE_CHAINS[res_name]:
+            serial += 1
+            lines.append(_atom_line(record, serial, name, res_name, "A", i + 1, 3.8 * i + dx, dy, 0.0, element))
+    # A free sulfate and a water are not part of the chain
+    for name, element, dx in (("S", "S", 0.0), ("O1", "O", 1.5)):
+        serial += 1
+        lines.append(_atom_line("HETATM", serial, name, "SO4", "A", 101, 20.0 + dx, 0.0, 0.0, element))
+    serial += 1
+    lines.append(_atom_line("HETATM", serial, "O", "HOH", "A", 201, 30.0, 0.0, 0.0, "O"))
+    return "\n".join(lines + ["END"]) + "\n"
+
+
+def test_selenomethionine_stays_in_the_polymer():
+    structure = structure_store.parse_structure("1MSE", _selenomethionine_chain(), "pdb")
+
+    assert structure.sequences == {"A": "AMG"}
+    assert list(structure.res_names) == ["ALA", "MSE", "GLY", "SO4", "HOH"]
+    assert list(structure.res_polymer) == [True, True, True, False, False]
+    assert list(structure.res_water) == [False, False, False, False, True]